@@ -158,7 +158,8 @@ export default function ChatPanel({ onClose }: { onClose?: () => void }) {
         context: countryCode ? { country: countryCode } : undefined,
         conversation_id: conversationId,
         country_code: countryCode || undefined,
-        conversation_history: conversationHistory,
+        // History lives server-side once a conversation exists
+        conversation_history: conversationId ? undefined : conversationHistory,
       };
 
       console.log('Sending chat request:', request);
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import PromptTemplate, AIRequest
+from .models import PromptTemplate, AIRequest, AIUsageRollup, Conversation, ConversationMessage, FAQEntry
 
 
 @admin.register(PromptTemplate)
@@ -14,4 +14,36 @@ class AIRequestAdmin(admin.ModelAdmin):
     list_display = ['user', 'session_id', 'model_used', 'tokens_used', 'created_at']
     list_filter = ['model_used', 'created_at']
     search_fields = ['user__username', 'session_id']
-    readonly_fields = ['user', 'session_id', 'prompt_text', 'response_text', 'created_at']
\ No newline at end of file
+    readonly_fields = ['user', 'session_id', 'prompt', 'response', 'created_at']
+    # Bodies are shown decompressed through the prompt/response properties
+    exclude = ['prompt_blob', 'response_blob', 'prompt_text', 'response_text']
+
+
+class ConversationMessageInline(admin.TabularInline):
+    model = ConversationMessage
+    extra = 0
+    readonly_fields = ['role', 'content', 'countries_detected', 'created_at']
+
+
+@admin.register(Conversation)
+class ConversationAdmin(admin.ModelAdmin):
+    list_display = ['id', 'user', 'session_id', 'tone', 'focused_country', 'message_count', 'updated_at']
+    list_filter = ['tone', 'focused_country']
+    search_fields = ['user__username', 'session_id']
+    inlines = [ConversationMessageInline]
+
+
+@admin.register(AIUsageRollup)
+class AIUsageRollupAdmin(admin.ModelAdmin):
+    list_display = ['hour', 'model_used', 'template', 'mode', 'tone', 'requests', 'tokens_used', 'cost_usd']
+    list_filter = ['model_used', 'mode', 'tone']
+    date_hierarchy = 'hour'
+    readonly_fields = [field.name for field in AIUsageRollup._meta.fields]
+
+
+@admin.register(FAQEntry)
+class FAQEntryAdmin(admin.ModelAdmin):
+    list_display = ['question', 'country_code', 'source', 'is_active', 'updated_at']
+    list_filter = ['is_active', 'country_code']
+    search_fields = ['question', 'answer']
+    list_editable = ['is_active']
@@ -3,4 +3,7 @@ from django.apps import AppConfig
 
 class AiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'ai'
\ No newline at end of file
+    name = 'ai'
+    
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,114 @@
+"""
+Content-addressed storage for AIRequest prompt and response bodies.
+
+Bodies are stored once per SHA-256 in AIBlob, zlib-compressed, and
+AIRequest rows reference them by hash. Hashing and compression happen in
+the request-log writer (ai/request_log.py), not on the request path.
+"""
+import zlib
+import time
+import hashlib
+import statistics
+from datetime import timedelta
+from django.db import connection, DatabaseError
+from django.db.models import Count, Sum
+from django.utils import timezone
+from .models import AIBlob, AIRequest
+
+
+COMPRESSION_LEVEL = 6
+# Blobs used more recently than this are never pruned, so a writer that is
+# about to reference an existing blob cannot lose it to a concurrent prune
+PRUNE_GRACE = timedelta(hours=1)
+
+
+def text_hash(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def make_blob(text, digest=None):
+    data = text.encode('utf-8')
+    return AIBlob(
+        hash=digest or hashlib.sha256(data).hexdigest(),
+        data=zlib.compress(data, COMPRESSION_LEVEL),
+        size=len(data),
+    )
+
+
+def store_bodies(requests):
+    """
+    Move the inline prompt/response text of unsaved AIRequests into blobs.
+    
+    Existing blobs are marked used first (see prune_blobs), then missing ones
+    are inserted with one bulk_create, skipping hashes that already exist;
+    the requests then point at them and their text fields are emptied.
+    """
+    blobs = {}
+    for request in requests:
+        for field in ('prompt', 'response'):
+            text = getattr(request, f'{field}_text')
+            if not text:
+                continue
+            digest = text_hash(text)
+            if digest not in blobs:
+                blobs[digest] = make_blob(text, digest)
+            setattr(request, f'{field}_blob_id', digest)
+            setattr(request, f'{field}_text', '')
+    # Touch before inserting: a prune that already deleted a blob is
+    # repaired by the insert, and one that runs later sees it as recent
+    AIBlob.objects.filter(hash__in=list(blobs)).update(last_used_at=timezone.now())
+    AIBlob.objects.bulk_create(blobs.values(), ignore_conflicts=True)
+    return requests
+
+
+def prune_blobs(grace=PRUNE_GRACE):
+    """
+    Delete blobs no AIRequest references and nothing used within ``grace``;
+    returns the number deleted.
+    """
+    deleted, _ = AIBlob.objects.filter(
+        prompt_requests__isnull=True, response_requests__isnull=True,
+        last_used_at__lt=timezone.now() - grace
+    ).delete()
+    return deleted
+
+
+def table_bytes(model):
+    """On-disk size of a model's table (with indexes on Postgres), or None if unknown."""
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        try:
+            if connection.vendor == 'sqlite':
+                cursor.execute('SELECT SUM(pgsize) FROM dbstat WHERE name = %s', [table])
+            elif connection.vendor == 'postgresql':
+                cursor.execute('SELECT pg_total_relation_size(%s)', [table])
+            else:
+                return None
+        except DatabaseError:
+            # SQLite built without the dbstat virtual table
+            return None
+        return cursor.fetchone()[0] or 0
+
+
+def scan_seconds(runs=5):
+    """Median time of a full-table analytics aggregate over AIRequest."""
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        list(AIRequest.objects.order_by().values('model_used').annotate(
+            requests=Count('id'), tokens=Sum('tokens_used')
+        ))
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def storage_stats():
+    """Row counts, table sizes and scan time for AIRequest and its blobs."""
+    return {
+        'requests': AIRequest.objects.count(),
+        'inline_requests': AIRequest.objects.exclude(prompt_text='', response_text='').count(),
+        'request_bytes': table_bytes(AIRequest),
+        'blobs': AIBlob.objects.count(),
+        'blob_bytes': table_bytes(AIBlob),
+        'scan_seconds': scan_seconds(),
+    }
@@ -0,0 +1,190 @@
+"""
+Shared cache for AI completion results.
+
+Entries live in the ``ai`` cache alias (``settings.CACHES``), which is Redis
+in production so every worker shares hits, and a local in-memory stand-in in
+development and tests. Values are JSON, zlib-compressed above a small size,
+and expire after a per-mode TTL (``settings.AI_CACHE_TTLS``).
+
+``get_or_compute`` adds single-flight protection: the first worker to miss
+takes a short lock and calls the provider; concurrent callers for the same
+key wait for its result instead of issuing duplicate requests.
+"""
+import json
+import time
+import uuid
+import zlib
+import asyncio
+from contextlib import contextmanager
+from django.conf import settings
+from django.core.cache import caches
+
+
+KEY_PREFIX = 'ai:completion:'
+LOCK_PREFIX = 'ai:completion-lock:'
+
+# Values shorter than this are stored uncompressed
+COMPRESS_MIN_BYTES = 512
+RAW_MARKER = b'j'
+ZLIB_MARKER = b'z'
+
+# Polling interval while waiting for another worker's result
+WAIT_INTERVAL = 0.05
+
+
+def encode(result):
+    """Serialize a result dict to bytes, compressing large values."""
+    data = json.dumps(result, separators=(',', ':')).encode('utf-8')
+    if len(data) < COMPRESS_MIN_BYTES:
+        return RAW_MARKER + data
+    return ZLIB_MARKER + zlib.compress(data, 6)
+
+
+def decode(value):
+    """Inverse of encode(); returns None for unreadable values."""
+    if not isinstance(value, (bytes, bytearray)) or not value:
+        return None
+    marker, data = value[:1], value[1:]
+    try:
+        if marker == ZLIB_MARKER:
+            data = zlib.decompress(data)
+        elif marker != RAW_MARKER:
+            return None
+        return json.loads(data)
+    except (zlib.error, ValueError):
+        return None
+
+
+class CompletionCache:
+    """
+    Compressed, TTL-by-mode completion cache with single-flight misses.
+
+    Args:
+        alias: Django cache alias to store entries in
+        lock_timeout: Seconds before an abandoned compute lock expires
+        wait_timeout: Seconds a follower waits for the leader's result
+            before computing the result itself
+    """
+
+    def __init__(self, alias='ai', lock_timeout=120, wait_timeout=90):
+        self.alias = alias
+        self.lock_timeout = lock_timeout
+        self.wait_timeout = wait_timeout
+
+    @property
+    def backend(self):
+        return caches[self.alias]
+
+    def ttl(self, mode):
+        ttls = settings.AI_CACHE_TTLS
+        return ttls.get(mode, ttls['default'])
+
+    def get(self, key):
+        return decode(self.backend.get(KEY_PREFIX + key))
+
+    def set(self, key, result, mode=None):
+        self.backend.set(KEY_PREFIX + key, encode(result), timeout=self.ttl(mode))
+
+    def has(self, key):
+        return self.backend.has_key(KEY_PREFIX + key)
+
+    async def aget(self, key):
+        return decode(await self.backend.aget(KEY_PREFIX + key))
+
+    async def aset(self, key, result, mode=None):
+        await self.backend.aset(KEY_PREFIX + key, encode(result), timeout=self.ttl(mode))
+
+    # Single flight
+
+    def acquire(self, key):
+        """Try to become the leader for ``key``; returns a lock token or None."""
+        token = uuid.uuid4().hex
+        if self.backend.add(LOCK_PREFIX + key, token, timeout=self.lock_timeout):
+            return token
+        return None
+
+    def release(self, key, token):
+        lock_key = LOCK_PREFIX + key
+        # Only drop our own lock (it may have expired and been re-taken)
+        if self.backend.get(lock_key) == token:
+            self.backend.delete(lock_key)
+
+    @contextmanager
+    def lock(self, key):
+        """Context manager yielding True if this caller holds the compute lock."""
+        token = self.acquire(key)
+        try:
+            yield token is not None
+        finally:
+            if token:
+                self.release(key, token)
+
+    def wait(self, key):
+        """Poll for a result another worker is computing; None on timeout."""
+        deadline = time.monotonic() + self.wait_timeout
+        while time.monotonic() < deadline:
+            result = self.get(key)
+            if result is not None:
+                return result
+            if self.backend.get(LOCK_PREFIX + key) is None:
+                # Leader finished without caching (error) or died
+                return self.get(key)
+            time.sleep(WAIT_INTERVAL)
+        return None
+
+    async def await_result(self, key):
+        """Async wait() for ASGI callers."""
+        deadline = time.monotonic() + self.wait_timeout
+        while time.monotonic() < deadline:
+            result = await self.aget(key)
+            if result is not None:
+                return result
+            if await self.backend.aget(LOCK_PREFIX + key) is None:
+                return await self.aget(key)
+            await asyncio.sleep(WAIT_INTERVAL)
+        return None
+
+    def get_or_compute(self, key, compute, mode=None):
+        """
+        Return (result, cached) for ``key``, calling ``compute()`` at most once
+        across workers while a result is being produced.
+
+        Results containing 'error' are returned but not cached.
+        """
+        result = self.get(key)
+        if result is not None:
+            return result, True
+
+        with self.lock(key) as leader:
+            if not leader:
+                result = self.wait(key)
+                if result is not None:
+                    return result, True
+            result = compute()
+            if 'error' not in result:
+                self.set(key, result, mode)
+        return result, False
+
+    async def aget_or_compute(self, key, compute, mode=None):
+        """Async get_or_compute(); ``compute`` is a coroutine function."""
+        result = await self.aget(key)
+        if result is not None:
+            return result, True
+
+        token = uuid.uuid4().hex
+        leader = await self.backend.aadd(LOCK_PREFIX + key, token, timeout=self.lock_timeout)
+        try:
+            if not leader:
+                result = await self.await_result(key)
+                if result is not None:
+                    return result, True
+            result = await compute()
+            if 'error' not in result:
+                await self.aset(key, result, mode)
+        finally:
+            if leader and await self.backend.aget(LOCK_PREFIX + key) == token:
+                await self.backend.adelete(LOCK_PREFIX + key)
+        return result, False
+
+
+completion_cache = CompletionCache()
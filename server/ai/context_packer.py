@@ -0,0 +1,144 @@
+"""
+Token-budgeted context packing for prompts.
+
+Each mode has a total prompt budget (``settings.AI_CONTEXT_TOKEN_BUDGETS``).
+Fixed parts (system prompt, template, question) are paid first; the rest is
+shared by flexible segments (retrieved documents, conversation history):
+
+1. Each segment is guaranteed ``share`` of the flexible budget (if it needs
+   that much), so e.g. history is not squeezed out by documents.
+2. Segments then take what they still need, in priority order (lowest
+   number first); whatever one leaves unused goes to the next.
+
+Segments are lists of items (passages, turns) kept whole in order, best
+first or newest first; the first item that does not fit is cut at a
+sentence boundary and packing of that segment stops there.
+"""
+from django.conf import settings
+from .tokenizer import count_tokens, trim_to_tokens
+
+
+# A trimmed item shorter than this is dropped instead
+MIN_ITEM_TOKENS = 30
+
+
+def context_budget(mode):
+    """Total prompt token budget for a mode."""
+    budgets = settings.AI_CONTEXT_TOKEN_BUDGETS
+    return budgets.get(mode, budgets['default'])
+
+
+class Segment:
+    """
+    A flexible part of the prompt.
+
+    Args:
+        name: Key in the packed result
+        items: Texts in order of importance for 'first', or oldest first
+            for 'last' (history: the newest turns are kept)
+        priority: Lower numbers are filled first
+        share: Fraction of the flexible budget reserved for this segment
+        keep: 'first' or 'last'
+        separator: Text joining the items in the prompt
+    """
+
+    def __init__(self, name, items, priority=1, share=0.0, keep='first', separator='\n\n'):
+        self.name = name
+        self.items = list(items)
+        self.priority = priority
+        self.share = share
+        self.keep = keep
+        self.separator = separator
+        self.item_tokens = [count_tokens(item) for item in self.items]
+        self.separator_tokens = count_tokens(separator)
+        self.need = sum(self.item_tokens) + self.separator_tokens * max(0, len(self.items) - 1)
+
+    def fit(self, limit):
+        """Items that fit in ``limit`` tokens: returns ([(index, text)], tokens used)."""
+        order = range(len(self.items))
+        if self.keep == 'last':
+            order = reversed(order)
+        kept = []
+        used = 0
+        for index in order:
+            cost = self.item_tokens[index] + (self.separator_tokens if kept else 0)
+            if used + cost <= limit:
+                kept.append((index, self.items[index]))
+                used += cost
+                continue
+            room = limit - used - (self.separator_tokens if kept else 0)
+            if room >= MIN_ITEM_TOKENS:
+                text = trim_to_tokens(self.items[index], room)
+                if text:
+                    kept.append((index, text))
+                    used += count_tokens(text) + (self.separator_tokens if len(kept) > 1 else 0)
+            break
+        kept.sort()
+        return kept, used
+
+
+class PackedContext:
+    """Result of pack_context()."""
+
+    def __init__(self, budget, fixed_tokens, segments, kept, used):
+        self.budget = budget
+        self.fixed_tokens = fixed_tokens
+        self._segments = {segment.name: segment for segment in segments}
+        self._kept = kept
+        self._used = used
+        self.tokens = fixed_tokens + sum(used.values())
+
+    def indexes(self, name):
+        """Indexes of the kept items of a segment, in their original order."""
+        return [index for index, _ in self._kept[name]]
+
+    def items(self, name):
+        """Kept (possibly trimmed) texts of a segment, in their original order."""
+        return [text for _, text in self._kept[name]]
+
+    def text(self, name):
+        return self._segments[name].separator.join(self.items(name))
+
+    def report(self):
+        """Token accounting for request metadata."""
+        return {
+            'budget': self.budget,
+            'fixed': self.fixed_tokens,
+            **{
+                name: {'tokens': self._used[name], 'kept': len(self._kept[name]),
+                       'items': len(segment.items)}
+                for name, segment in self._segments.items()
+            },
+        }
+
+
+def pack_context(budget, fixed=(), segments=()):
+    """
+    Pack flexible segments into what ``budget`` leaves after the fixed texts.
+
+    Args:
+        budget: Total prompt tokens
+        fixed: Texts always sent in full (system prompt, template, question)
+        segments: Segment instances
+
+    Returns:
+        PackedContext
+    """
+    fixed_tokens = sum(count_tokens(text) for text in fixed)
+    flexible = max(0, budget - fixed_tokens)
+    ordered = sorted(segments, key=lambda segment: segment.priority)
+
+    reserved = {}
+    left = flexible
+    for segment in ordered:
+        reserved[segment.name] = min(segment.need, int(segment.share * flexible), left)
+        left -= reserved[segment.name]
+
+    kept = {}
+    used = {}
+    for segment in ordered:
+        available = reserved[segment.name] + left
+        kept[segment.name], used[segment.name] = segment.fit(available)
+        left = available - used[segment.name]
+
+    return PackedContext(budget, fixed_tokens, segments, kept, used)
@@ -0,0 +1,159 @@
+"""
+Compiled country-mention matcher for the AI service.
+
+Country names, ISO 3166 codes and common aliases are folded into a single
+regex alternation, so a message is scanned once instead of once per country,
+and code lookups need no database round trips. The matcher is built lazily
+and rebuilt only when the ``countries`` data version changes (bumped by the
+Country save/delete signals).
+"""
+import re
+import threading
+from core.utils import get_data_version
+
+
+# 3-letter words that look like country codes but are almost always English
+EXCLUDED_CODES = {
+    'THE', 'AND', 'FOR', 'ARE', 'CAN', 'NOT', 'YOU', 'HAS', 'HIM', 'HER', 'ITS', 'OUR',
+    'WHO', 'ALL', 'ANY', 'GET', 'SET', 'USE', 'WAY', 'HOW', 'NOW', 'DAY', 'NEW', 'OLD',
+    'TRY', 'TWO', 'MAY', 'SAY', 'SEE', 'ASK', 'LET', 'PUT', 'END', 'TOO', 'OWN', 'RUN',
+    'OUT', 'OFF', 'GOT', 'DID', 'BIG', 'TOP', 'LOW', 'ADD', 'AGO', 'AIR',
+}
+
+# 2-letter codes are only matched as a whole message written in capitals
+# ("DE", "CA?"): inside a sentence they are mostly jargon (BS, MD, HR, PT, LA).
+# Never these, even on their own (English words and migration jargon)
+EXCLUDED_ALPHA2 = {
+    'AI', 'AM', 'AN', 'AS', 'AT', 'BA', 'BE', 'BY', 'CV', 'DO', 'GO', 'HE', 'HI', 'ID',
+    'IF', 'IN', 'IS', 'IT', 'MA', 'ME', 'MS', 'MY', 'NO', 'OF', 'OK', 'ON', 'OR', 'PM',
+    'PR', 'SO', 'ST', 'TO', 'TV', 'UP', 'US', 'WE',
+}
+
+# Common aliases, reported in this order after codes and names
+COUNTRY_ALIASES = [
+    ('uk', 'GBR'),
+    ('united kingdom', 'GBR'),
+    ('britain', 'GBR'),
+    ('england', 'GBR'),
+    ('usa', 'USA'),
+    ('u.s.a', 'USA'),
+    ('u.s.', 'USA'),
+    ('united states', 'USA'),
+    ('america', 'USA'),
+    ('uae', 'ARE'),
+    ('emirates', 'ARE'),
+    ('dubai', 'ARE'),
+    ('nz', 'NZL'),
+    ('new zealand', 'NZL'),
+]
+
+# Match categories, in the order results are reported
+CATEGORY_CODE = 0
+CATEGORY_NAME = 1
+CATEGORY_ALIAS = 2
+
+_WORD_CHAR = re.compile(r'\w')
+_ALPHA2_MESSAGE = re.compile(r'\s*([A-Z]{2})\s*[.!?]*\s*')
+
+
+def _is_word(char):
+    return bool(_WORD_CHAR.match(char))
+
+
+class CountryMatcher:
+    """
+    Single-pass matcher over a snapshot of country rows.
+
+    Results are ordered like the original per-pattern extraction: ISO-3 codes
+    in order of appearance, then names in country name order, then aliases.
+    A capitalised ISO-2 code is only matched when it is the whole message.
+    """
+
+    def __init__(self, countries, version=None):
+        """
+        Args:
+            countries: Iterable of (code, code_alpha2, name) tuples in name order
+            version: Data version the snapshot was taken at
+        """
+        self.version = version
+        self.terms = {}
+        self.alpha2 = {}
+
+        for rank, (code, alpha2, name) in enumerate(countries):
+            if code and code.upper() not in EXCLUDED_CODES:
+                self._add(code.lower(), CATEGORY_CODE, 0, code)
+            if name:
+                self._add(name.lower(), CATEGORY_NAME, rank, code)
+            if alpha2 and alpha2.upper() not in EXCLUDED_ALPHA2:
+                self.alpha2.setdefault(alpha2.upper(), code)
+
+        for rank, (alias, code) in enumerate(COUNTRY_ALIASES):
+            self._add(alias, CATEGORY_ALIAS, rank, code)
+
+        # Shorter terms that also match wherever a longer term matches, e.g.
+        # "guinea" inside "guinea-bissau". The alternation only reports the
+        # longest term per position, so these are expanded after the scan.
+        self.prefixes = {}
+        for term in self.terms:
+            self.prefixes[term] = [
+                other for other in self.terms
+                if len(other) < len(term) and term.startswith(other)
+                and _is_word(other[-1]) != _is_word(term[len(other)])
+            ]
+
+        alternation = '|'.join(
+            re.escape(term) for term in sorted(self.terms, key=len, reverse=True)
+        )
+        # Zero-width lookahead so overlapping mentions are all visited
+        self.pattern = re.compile(r'(?=\b(' + alternation + r')\b)') if alternation else None
+
+    def _add(self, term, category, rank, code):
+        self.terms.setdefault(term, []).append((category, rank, code))
+
+    def match(self, message):
+        """Return the list of country codes mentioned in ``message``."""
+        if not message:
+            return []
+
+        alpha2 = _ALPHA2_MESSAGE.fullmatch(message)
+        if alpha2 and alpha2.group(1) in self.alpha2:
+            return [self.alpha2[alpha2.group(1)]]
+        if self.pattern is None:
+            return []
+
+        text = message.lower()
+        found = {}
+
+        for match in self.pattern.finditer(text):
+            start = match.start(1)
+            term = match.group(1)
+            for candidate in (term, *self.prefixes[term]):
+                for category, rank, code in self.terms[candidate]:
+                    if category == CATEGORY_CODE:
+                        rank = start
+                    key = (category, rank)
+                    if code not in found or key < found[code]:
+                        found[code] = key
+
+        return sorted(found, key=found.get)
+
+
+_matcher = None
+_matcher_lock = threading.Lock()
+
+
+def get_country_matcher():
+    """Return the process-wide matcher, rebuilding it if countries changed."""
+    global _matcher
+    from countries.models import Country
+
+    version = get_data_version('countries')
+    matcher = _matcher
+    if matcher is not None and matcher.version == version:
+        return matcher
+
+    with _matcher_lock:
+        if _matcher is None or _matcher.version != version:
+            rows = Country.objects.order_by('name').values_list('code', 'code_alpha2', 'name')
+            _matcher = CountryMatcher(list(rows), version=version)
+        return _matcher
@@ -0,0 +1,307 @@
+"""
+Priority-aware dispatch of LLM provider calls.
+
+Every call to the provider (chat and compare, roadmap enrichment, offline
+document generation) takes a slot from ``llm_dispatcher`` first:
+
+- Priority classes, highest first: 'interactive', 'roadmap', 'batch'.
+- Per-class concurrency caps (``settings.AI_DISPATCH_CONCURRENCY``), per
+  process.
+- A token bucket (``AI_DISPATCH_RATE_PER_SECOND`` requests/s, bursts of
+  ``AI_DISPATCH_BURST``) shared by every process through Redis when the
+  ``ai`` cache is Redis, or kept in-process otherwise. Lower classes may
+  only take a token while a share of the burst (RESERVES) is left, so
+  batch jobs in another process cannot drain what live chat needs, and
+  within a process they wait while a higher class is being rate limited.
+- Queue-time counters and histograms per class, kept in the ``ai`` cache
+  like the completion cache metrics.
+
+A caller that waits longer than its class's ``AI_DISPATCH_QUEUE_TIMEOUT``
+gets DispatchTimeout.
+"""
+import time
+import asyncio
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager, asynccontextmanager
+from django.conf import settings
+from django.core.cache import caches
+from .usage import histogram_percentile
+
+
+PRIORITIES = ('interactive', 'roadmap', 'batch')
+
+# Share of the burst a class must leave in the bucket, taken of the tokens
+# above the one being granted so every class can be served at any burst
+RESERVES = {'interactive': 0.0, 'roadmap': 0.25, 'batch': 0.5}
+
+# Queue-time histogram bucket upper bounds in seconds
+QUEUE_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30, 60, 300)
+
+# Longest sleep between attempts while waiting for a slot
+POLL_INTERVAL = 0.05
+
+METRICS_PREFIX = 'ai:dispatch:'
+COUNTERS = ('calls', 'queued_ms', 'throttled', 'timeouts')
+BUCKET_KEY = 'ai:dispatch:bucket'
+
+
+class DispatchTimeout(Exception):
+    """No slot became free within the class's queue timeout."""
+
+
+class LocalTokenBucket:
+    """In-process token bucket, for development without a shared Redis."""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def take(self, reserve=0.0):
+        """Take one token, keeping ``reserve`` tokens; returns 0 or seconds to wait."""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens - 1 >= reserve:
+                self.tokens -= 1
+                return 0
+            return (reserve + 1 - self.tokens) / self.rate
+
+
+class RedisTokenBucket:
+    """
+    Token bucket in a Redis hash, shared by every worker.
+
+    Updated in a WATCH/MULTI transaction (no Lua, so fakeredis works too);
+    refill uses the callers' clocks.
+    """
+
+    def __init__(self, rate, burst, alias='ai', key=BUCKET_KEY):
+        self.rate = rate
+        self.burst = burst
+        self.alias = alias
+        self.key = key
+
+    def take(self, reserve=0.0):
+        from django_redis import get_redis_connection
+        from redis.exceptions import WatchError
+
+        client = get_redis_connection(self.alias)
+        while True:
+            with client.pipeline() as pipe:
+                try:
+                    pipe.watch(self.key)
+                    state = pipe.hmget(self.key, 'tokens', 'updated')
+                    now = time.time()
+                    tokens = float(state[0]) if state[0] is not None else self.burst
+                    updated = float(state[1]) if state[1] is not None else now
+                    tokens = min(self.burst, tokens + max(0.0, now - updated) * self.rate)
+                    wait = 0
+                    if tokens - 1 >= reserve:
+                        tokens -= 1
+                    else:
+                        wait = (reserve + 1 - tokens) / self.rate
+                    pipe.multi()
+                    pipe.hset(self.key, mapping={'tokens': tokens, 'updated': now})
+                    pipe.expire(self.key, int(self.burst / self.rate) + 60)
+                    pipe.execute()
+                    return wait
+                except WatchError:
+                    continue
+
+
+class LLMDispatcher:
+    """
+    Grants provider-call slots by priority class.
+
+    Args:
+        concurrency: Dict of class -> max in-flight calls in this process
+        rate: Requests per second across processes (0 disables the bucket)
+        burst: Token bucket size
+        queue_timeouts: Dict of class -> seconds a caller may wait
+        shared: Keep the bucket in Redis (the ``ai`` cache's server)
+    """
+
+    def __init__(self, concurrency, rate=0, burst=0, queue_timeouts=None, shared=False):
+        self.concurrency = concurrency
+        self.queue_timeouts = queue_timeouts or {}
+        self.bucket = None
+        if rate:
+            # Below one token nothing could ever be granted
+            burst = max(burst or rate, 1)
+            self.bucket = RedisTokenBucket(rate, burst) if shared else LocalTokenBucket(rate, burst)
+        self._lock = threading.Lock()
+        self._released = threading.Condition(self._lock)
+        self._active = dict.fromkeys(PRIORITIES, 0)
+        # Callers whose last attempt was refused by the bucket
+        self._rate_limited = dict.fromkeys(PRIORITIES, 0)
+
+    def _check(self, priority):
+        if priority not in PRIORITIES:
+            raise ValueError(f'Unknown priority class: {priority}')
+
+    def _try_acquire(self, priority, was_limited):
+        """
+        Take a slot if one is free.
+
+        Returns (seconds to wait, or 0 once the slot is taken; whether the
+        bucket refused). ``was_limited`` is the caller's previous refusal,
+        so the count of rate-limited callers per class stays accurate.
+        """
+        with self._lock:
+            wait, limited = POLL_INTERVAL, False
+            higher = PRIORITIES[:PRIORITIES.index(priority)]
+            if self._active[priority] >= self.concurrency.get(priority, 1):
+                pass
+            elif any(self._rate_limited[p] for p in higher):
+                # A higher class is waiting for tokens; let it have them
+                pass
+            else:
+                bucket_wait = self.bucket.take(self._reserve(priority)) if self.bucket else 0
+                if bucket_wait:
+                    wait, limited = bucket_wait, True
+                else:
+                    wait = 0
+                    self._active[priority] += 1
+            self._rate_limited[priority] += limited - was_limited
+            return wait, limited
+
+    def _reserve(self, priority):
+        """Tokens a class must leave in the bucket: at most burst - 1, so it can always fill."""
+        return RESERVES[priority] * (self.bucket.burst - 1)
+
+    def _release(self, priority):
+        with self._released:
+            self._active[priority] -= 1
+            self._released.notify_all()
+
+    def _deadline(self, priority):
+        timeout = self.queue_timeouts.get(priority)
+        return time.monotonic() + timeout if timeout else None
+
+    def _acquire_steps(self, priority):
+        """
+        Generator driving one caller's wait: yields seconds to sleep until a
+        slot is taken, then returns. Shared by slot() and aslot().
+        """
+        self._check(priority)
+        start = time.monotonic()
+        deadline = self._deadline(priority)
+        limited = throttled = False
+        try:
+            while True:
+                wait, limited = self._try_acquire(priority, limited)
+                if not wait:
+                    break
+                if limited and not throttled:
+                    incr(priority, 'throttled')
+                    throttled = True
+                if deadline and time.monotonic() + min(wait, POLL_INTERVAL) > deadline:
+                    incr(priority, 'timeouts')
+                    raise DispatchTimeout(f'No {priority} LLM slot within {self.queue_timeouts[priority]}s')
+                yield min(wait, POLL_INTERVAL)
+        finally:
+            if limited:
+                # Gave up while counted as rate limited
+                with self._lock:
+                    self._rate_limited[priority] -= 1
+        record_queue_time(priority, time.monotonic() - start)
+
+    @contextmanager
+    def slot(self, priority='interactive'):
+        """Hold a provider-call slot for ``priority`` (blocking)."""
+        for wait in self._acquire_steps(priority):
+            with self._released:
+                self._released.wait(wait)
+        try:
+            yield
+        finally:
+            self._release(priority)
+
+    @asynccontextmanager
+    async def aslot(self, priority='interactive'):
+        """Async slot(); waits without blocking the event loop."""
+        for wait in self._acquire_steps(priority):
+            await asyncio.sleep(wait)
+        try:
+            yield
+        finally:
+            self._release(priority)
+
+    def active(self):
+        with self._lock:
+            return dict(self._active)
+
+
+# Metrics
+
+def _key(priority, name):
+    return f'{METRICS_PREFIX}{priority}:{name}'
+
+
+def incr(priority, counter, amount=1):
+    backend = caches['ai']
+    key = _key(priority, counter)
+    backend.add(key, 0, timeout=None)
+    try:
+        backend.incr(key, amount)
+    except ValueError:
+        backend.set(key, amount, timeout=None)
+
+
+def record_queue_time(priority, seconds):
+    incr(priority, 'calls')
+    incr(priority, 'queued_ms', int(seconds * 1000))
+    incr(priority, f'histogram:{bisect_left(QUEUE_BUCKETS, seconds)}')
+
+
+def snapshot():
+    """
+    Queue-time metrics per priority class.
+
+    Returns:
+        Dict of class -> calls, throttled, timeouts, avg/p50/p95 queue
+        seconds, and in-flight calls in this process
+    """
+    buckets = range(len(QUEUE_BUCKETS) + 1)
+    keys = [_key(p, name) for p in PRIORITIES for name in COUNTERS]
+    keys += [_key(p, f'histogram:{i}') for p in PRIORITIES for i in buckets]
+    values = caches['ai'].get_many(keys)
+    active = llm_dispatcher.active()
+
+    classes = {}
+    for priority in PRIORITIES:
+        counts = {name: values.get(_key(priority, name), 0) for name in COUNTERS}
+        histogram = [values.get(_key(priority, f'histogram:{i}'), 0) for i in buckets]
+        calls = counts['calls']
+        classes[priority] = {
+            'calls': calls,
+            'throttled': counts['throttled'],
+            'timeouts': counts['timeouts'],
+            'avg_queue_seconds': round(counts['queued_ms'] / calls / 1000, 4) if calls else None,
+            'p50_queue_seconds': histogram_percentile(histogram, 50, QUEUE_BUCKETS),
+            'p95_queue_seconds': histogram_percentile(histogram, 95, QUEUE_BUCKETS),
+            'in_flight': active[priority],
+        }
+    return classes
+
+
+def reset():
+    buckets = range(len(QUEUE_BUCKETS) + 1)
+    caches['ai'].delete_many(
+        [_key(p, name) for p in PRIORITIES for name in COUNTERS]
+        + [_key(p, f'histogram:{i}') for p in PRIORITIES for i in buckets]
+    )
+
+
+llm_dispatcher = LLMDispatcher(
+    concurrency=settings.AI_DISPATCH_CONCURRENCY,
+    rate=settings.AI_DISPATCH_RATE_PER_SECOND,
+    burst=settings.AI_DISPATCH_BURST,
+    queue_timeouts=settings.AI_DISPATCH_QUEUE_TIMEOUT,
+    shared=settings.AI_CACHE_BACKEND in ('redis', 'fakeredis'),
+)
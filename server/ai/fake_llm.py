@@ -0,0 +1,303 @@
+"""
+Local stand-in for the DeepSeek (OpenAI-compatible) chat completions API.
+
+Used for offline development, tests and latency benchmarks. It mimics the
+parts of the ``openai`` client the AI service uses, including streaming with
+``stream_options={'include_usage': True}``, and simulates provider latency.
+
+``AsyncFakeLLMClient`` is the ``openai.AsyncOpenAI`` counterpart.
+
+Enable with ``AI_FAKE_LLM=True``; tune with ``AI_FAKE_LLM_FIRST_TOKEN_LATENCY``
+and ``AI_FAKE_LLM_TOKEN_LATENCY`` (seconds).
+
+Usage reports DeepSeek's ``prompt_cache_hit_tokens`` and
+``prompt_cache_miss_tokens``: PrefixCache emulates its context caching, where
+the longest prompt prefix already sent (in 64-token units) is a cache hit.
+
+Provider faults can be injected with a FaultPlan (``AI_FAKE_LLM_ERROR_RATE``,
+``AI_FAKE_LLM_SLOW_RATE``, ``AI_FAKE_LLM_SLOW_LATENCY``, ``AI_FAKE_LLM_OUTAGE``)
+to exercise ai/resilience.py. Like the real client, a ``timeout`` argument
+makes a call that would take longer raise ``openai.APITimeoutError``.
+"""
+import re
+import json
+import time
+import hashlib
+import random
+import asyncio
+import threading
+from types import SimpleNamespace
+import httpx
+import openai
+
+
+DEFAULT_RESPONSE = (
+    "Based on available data, here is an overview. Processing times are approximate "
+    "and can vary significantly. Visa rules change frequently, so always verify with "
+    "the official embassy or immigration authority before making decisions."
+)
+
+
+STEP_ID_RE = re.compile(r'\(ID: (\d+)\)')
+BRIEF_SOURCES_RE = re.compile(r'SOURCE DOCUMENTS:(.*)END OF SOURCES', re.S)
+BRIEF_WORDS_RE = re.compile(r'At most (\d+) words')
+
+
+def brief_response(sources, max_words):
+    """Extractive stand-in for a condensed brief: first sentence of each prose line."""
+    bullets = []
+    words = 0
+    for line in sources.splitlines():
+        line = line.strip().lstrip('*- ').replace('**', '')
+        if not line or line.startswith(('#', '---')):
+            continue
+        sentence = re.split(r'(?<=[.!?])\s', line, maxsplit=1)[0]
+        count = len(sentence.split())
+        if count < 6:
+            continue
+        if words + count > max_words:
+            break
+        bullets.append(f'- {sentence}')
+        words += count
+    return '\n'.join(bullets) or DEFAULT_RESPONSE
+
+
+def default_response(messages):
+    """
+    DEFAULT_RESPONSE, valid enrichment JSON for roadmap enrichment prompts
+    (which list steps as "Step N (ID: id)"), or an extractive brief for
+    country brief prompts (countries/briefs.py).
+    """
+    prompt = messages[-1].get('content', '') if messages else ''
+    sources = BRIEF_SOURCES_RE.search(prompt)
+    if sources:
+        words = BRIEF_WORDS_RE.search(prompt)
+        return brief_response(sources.group(1), int(words.group(1)) if words else 150)
+    if '"enrichments"' not in prompt:
+        return DEFAULT_RESPONSE
+    return json.dumps({'enrichments': [
+        {
+            'step_id': int(step_id),
+            'advice': 'Start early and keep copies of every document you submit.',
+            'tips': ['Check the official checklist', 'Book appointments early'],
+            'pitfalls': ['Missing translations', 'Expired documents'],
+        }
+        for step_id in STEP_ID_RE.findall(prompt)
+    ]})
+
+
+FAKE_REQUEST = httpx.Request('POST', 'http://fake-llm.local/chat/completions')
+
+
+class FaultPlan:
+    """
+    Faults injected into fake provider calls.
+
+    Args:
+        error_rate: Share of calls failing with a 500
+        slow_rate: Share of calls taking ``slow_latency`` extra seconds
+        slow_latency: Extra seconds for slow calls (a latency tail)
+        outage: Fail every call with a connection error (provider down)
+        seed: Seed for reproducible runs
+    """
+
+    def __init__(self, error_rate=0.0, slow_rate=0.0, slow_latency=5.0, outage=False, seed=None):
+        self.error_rate = error_rate
+        self.slow_rate = slow_rate
+        self.slow_latency = slow_latency
+        self.outage = outage
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+
+    def draw(self):
+        """Fault for one call: returns (exception to raise or None, extra latency)."""
+        if self.outage:
+            return openai.APIConnectionError(request=FAKE_REQUEST), 0.0
+        with self.lock:
+            failed = self.random.random() < self.error_rate
+            slow = self.random.random() < self.slow_rate
+        if failed:
+            response = httpx.Response(500, request=FAKE_REQUEST)
+            return openai.InternalServerError('Injected provider error', response=response, body=None), 0.0
+        return None, self.slow_latency if slow else 0.0
+
+
+def _check_timeout(latency, timeout):
+    """Seconds to sleep, and whether the call times out first."""
+    if timeout is not None and latency > timeout:
+        return timeout, True
+    return latency, False
+
+
+def _count_tokens(text):
+    """Rough token count (~4 characters per token)."""
+    return max(1, len(text) // 4) if text else 0
+
+
+# Provider-side prompt caching granularity, in tokens
+PREFIX_CACHE_UNIT = 64
+
+
+class PrefixCache:
+    """
+    Emulated provider context cache.
+
+    Remembers every PREFIX_CACHE_UNIT-token prefix of the prompts sent; a
+    prompt's cache hit is its longest remembered prefix. Forgets everything
+    once ``max_entries`` prefixes are held.
+    """
+
+    def __init__(self, max_entries=100000):
+        self.max_entries = max_entries
+        self.seen = set()
+        self.lock = threading.Lock()
+
+    def hit_tokens(self, messages):
+        """Cached prompt tokens for ``messages``; remembers their prefixes."""
+        text = ''.join(f"{m.get('role', '')}\n{m.get('content', '')}\n" for m in messages)
+        unit = PREFIX_CACHE_UNIT * 4
+        digest = hashlib.sha1()
+        prefixes = []
+        for end in range(unit, len(text) + 1, unit):
+            digest.update(text[end - unit:end].encode())
+            prefixes.append(digest.digest())
+        hit = 0
+        with self.lock:
+            for units, prefix in enumerate(prefixes, 1):
+                if prefix not in self.seen:
+                    break
+                hit = units * PREFIX_CACHE_UNIT
+            if len(self.seen) + len(prefixes) > self.max_entries:
+                self.seen.clear()
+            self.seen.update(prefixes)
+        return hit
+
+
+def _usage(client, messages, answer):
+    prompt_tokens = sum(_count_tokens(m.get('content', '')) for m in messages)
+    completion_tokens = _count_tokens(answer)
+    hit_tokens = min(prompt_tokens, client.prefix_cache.hit_tokens(messages))
+    return SimpleNamespace(
+        prompt_tokens=prompt_tokens,
+        completion_tokens=completion_tokens,
+        total_tokens=prompt_tokens + completion_tokens,
+        prompt_cache_hit_tokens=hit_tokens,
+        prompt_cache_miss_tokens=prompt_tokens - hit_tokens,
+    )
+
+
+class _Completions:
+    def __init__(self, client):
+        self._client = client
+
+    def create(self, model=None, messages=None, temperature=None, max_tokens=None,
+               stream=False, stream_options=None, timeout=None, **kwargs):
+        client = self._client
+        client.calls += 1
+        error, extra_latency = client.faults.draw()
+        if error:
+            raise error
+        messages = messages or []
+        answer = client.response_for(messages)
+        usage = _usage(client, messages, answer)
+
+        if not stream:
+            pieces = len(re.findall(r'\S+\s*', answer))
+            latency = client.first_token_latency + extra_latency + client.token_latency * pieces
+            latency, timed_out = _check_timeout(latency, timeout)
+            time.sleep(latency)
+            if timed_out:
+                raise openai.APITimeoutError(request=FAKE_REQUEST)
+            return SimpleNamespace(
+                model=model,
+                choices=[SimpleNamespace(message=SimpleNamespace(role='assistant', content=answer))],
+                usage=usage,
+            )
+
+        # The timeout applies to the wait for the first token
+        latency, timed_out = _check_timeout(client.first_token_latency + extra_latency, timeout)
+        if timed_out:
+            time.sleep(latency)
+            raise openai.APITimeoutError(request=FAKE_REQUEST)
+        include_usage = bool((stream_options or {}).get('include_usage'))
+        return self._stream(answer, usage, include_usage, latency)
+
+    def _stream(self, answer, usage, include_usage, first_token_latency):
+        client = self._client
+        time.sleep(first_token_latency)
+        for piece in re.findall(r'\S+\s*', answer):
+            yield SimpleNamespace(
+                choices=[SimpleNamespace(delta=SimpleNamespace(content=piece), finish_reason=None)],
+                usage=None,
+            )
+            time.sleep(client.token_latency)
+        yield SimpleNamespace(
+            choices=[SimpleNamespace(delta=SimpleNamespace(content=None), finish_reason='stop')],
+            usage=None,
+        )
+        if include_usage:
+            yield SimpleNamespace(choices=[], usage=usage)
+
+
+class FakeLLMClient:
+    """
+    Drop-in replacement for ``openai.OpenAI`` limited to chat completions.
+
+    Args:
+        first_token_latency: Seconds before the first token is produced
+        token_latency: Seconds between streamed tokens
+        response: Fixed answer text, or a callable taking the message list
+            (default: default_response)
+        faults: FaultPlan (default: no faults)
+        prefix_cache: PrefixCache for usage's cache-hit tokens (default: a new one)
+    """
+
+    def __init__(self, first_token_latency=0.5, token_latency=0.02, response=None, faults=None,
+                 prefix_cache=None):
+        self.first_token_latency = first_token_latency
+        self.token_latency = token_latency
+        self.response = response or default_response
+        self.faults = faults or FaultPlan()
+        self.prefix_cache = prefix_cache or PrefixCache()
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=_Completions(self))
+
+    def response_for(self, messages):
+        if callable(self.response):
+            return self.response(messages)
+        return self.response
+
+
+class _AsyncCompletions:
+    def __init__(self, client):
+        self._client = client
+
+    async def create(self, model=None, messages=None, temperature=None, max_tokens=None,
+                     timeout=None, **kwargs):
+        client = self._client
+        client.calls += 1
+        error, extra_latency = client.faults.draw()
+        if error:
+            raise error
+        messages = messages or []
+        answer = client.response_for(messages)
+        usage = _usage(client, messages, answer)
+        pieces = len(re.findall(r'\S+\s*', answer))
+        latency = client.first_token_latency + extra_latency + client.token_latency * pieces
+        latency, timed_out = _check_timeout(latency, timeout)
+        await asyncio.sleep(latency)
+        if timed_out:
+            raise openai.APITimeoutError(request=FAKE_REQUEST)
+        return SimpleNamespace(
+            model=model,
+            choices=[SimpleNamespace(message=SimpleNamespace(role='assistant', content=answer))],
+            usage=usage,
+        )
+
+
+class AsyncFakeLLMClient(FakeLLMClient):
+    """Async drop-in for ``openai.AsyncOpenAI`` (non-streaming completions)."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.chat = SimpleNamespace(completions=_AsyncCompletions(self))
@@ -0,0 +1,32 @@
+"""
+Management command to report AIRequest storage size and scan time.
+Usage: python manage.py ai_storage_report
+"""
+from django.core.management.base import BaseCommand
+from ai.blobs import storage_stats
+
+
+def format_bytes(value):
+    if value is None:
+        return 'unknown'
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if value < 1024 or unit == 'GB':
+            return f'{value:.1f} {unit}' if unit != 'B' else f'{value} B'
+        value /= 1024
+
+
+def write_stats(stdout, stats, label=None):
+    """Print storage_stats() output; shared with backfill_ai_blobs."""
+    if label:
+        stdout.write(label)
+    stdout.write(f"  AI requests:   {stats['requests']} ({stats['inline_requests']} with inline bodies)")
+    stdout.write(f"  Request table: {format_bytes(stats['request_bytes'])}")
+    stdout.write(f"  Blobs:         {stats['blobs']} ({format_bytes(stats['blob_bytes'])})")
+    stdout.write(f"  Scan time:     {stats['scan_seconds'] * 1000:.2f} ms (usage by model, full table)")
+
+
+class Command(BaseCommand):
+    help = 'Report AIRequest and AIBlob table sizes and analytics scan time'
+
+    def handle(self, *args, **options):
+        write_stats(self.stdout, storage_stats())
@@ -0,0 +1,72 @@
+"""
+Management command to move inline AIRequest bodies into the blob table.
+Usage: python manage.py backfill_ai_blobs [--batch-size 500] [--prune] [--vacuum]
+"""
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Q
+from ai.models import AIRequest
+from ai.blobs import store_bodies, prune_blobs, storage_stats
+from ai.request_log import PROMPT_ONLY_CONTEXT
+from .ai_storage_report import write_stats
+
+
+class Command(BaseCommand):
+    help = 'Backfill AIRequest prompt/response bodies into compressed, deduplicated blobs'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Rows converted per transaction'
+        )
+        parser.add_argument(
+            '--prune',
+            action='store_true',
+            help='Also delete blobs no request references'
+        )
+        parser.add_argument(
+            '--vacuum',
+            action='store_true',
+            help='Compact the request table afterwards (SQLite: whole database)'
+        )
+
+    def handle(self, *args, **options):
+        write_stats(self.stdout, storage_stats(), 'Before:')
+
+        pending = AIRequest.objects.filter(~Q(prompt_text='') | ~Q(response_text='')).order_by('pk')
+        converted = 0
+        last_pk = 0
+        while True:
+            batch = list(pending.filter(pk__gt=last_pk)[:options['batch_size']])
+            if not batch:
+                break
+            for request in batch:
+                # Context rendered into the prompt was also copied into metadata
+                request.metadata = {
+                    key: value for key, value in request.metadata.items()
+                    if key not in PROMPT_ONLY_CONTEXT
+                }
+            with transaction.atomic():
+                AIRequest.objects.bulk_update(
+                    store_bodies(batch),
+                    ['prompt_blob', 'response_blob', 'prompt_text', 'response_text', 'metadata']
+                )
+            converted += len(batch)
+            last_pk = batch[-1].pk
+            self.stdout.write(f'Converted {converted} requests')
+
+        if options['prune']:
+            self.stdout.write(f'Pruned {prune_blobs()} unreferenced blobs')
+
+        if options['vacuum']:
+            # Shrunk rows leave mostly empty pages until the table is rewritten
+            with connection.cursor() as cursor:
+                if connection.vendor == 'postgresql':
+                    cursor.execute(f'VACUUM FULL {AIRequest._meta.db_table}')
+                elif connection.vendor == 'sqlite':
+                    cursor.execute('VACUUM')
+
+        write_stats(self.stdout, storage_stats(), 'After:')
+        self.stdout.write(self.style.SUCCESS(f'Moved the bodies of {converted} requests into blobs'))
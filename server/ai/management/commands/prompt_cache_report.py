@@ -0,0 +1,29 @@
+"""
+Management command to report the provider prompt-cache hit ratio per mode.
+Usage: python manage.py prompt_cache_report [--hours 24]
+"""
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from ai.usage import update_rollups, usage_summary
+
+
+class Command(BaseCommand):
+    help = 'Report the share of prompt tokens served from the provider context cache, per mode'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=int, default=24, help='Hours to report (default 24)')
+
+    def handle(self, *args, **options):
+        update_rollups()
+        since = timezone.now().replace(minute=0, second=0, microsecond=0) - timedelta(hours=options['hours'] - 1)
+        summary = usage_summary(since, group_by='mode')
+
+        self.stdout.write(f"Prompt-cache hits since {since:%Y-%m-%d %H:00} (requests reporting cache usage)")
+        self.stdout.write(f"  {'mode':<16}{'requests':>10}{'prompt tokens':>15}{'hit tokens':>12}{'hit ratio':>11}")
+        for group in summary['groups'] + [{'mode': 'total', **summary['totals']}]:
+            ratio = group['prompt_cache_hit_ratio']
+            self.stdout.write(
+                f"  {group['mode'] or '-':<16}{group['requests']:>10}{group['prompt_tokens']:>15}"
+                f"{group['prompt_cache_hit_tokens']:>12}{f'{ratio:.0%}' if ratio is not None else '-':>11}"
+            )
@@ -0,0 +1,101 @@
+"""
+Shared counters for the AI completion cache and the chat pre-filter.
+
+Counters live in the ``ai`` cache alias next to the cached completions, so
+with the Redis backend every worker adds to the same totals. Cache counters
+are kept per prompt mode, pre-filter counters per route (ai/prefilter.py);
+they never expire and ``reset()`` clears them.
+"""
+from django.conf import settings
+from django.core.cache import caches
+
+
+METRICS_PREFIX = 'ai:metrics:'
+COUNTERS = ('hits', 'misses', 'near_duplicate_hits', 'saved_tokens')
+# Chat pre-filter routes, counted under ROUTE_MODE
+ROUTES = ('greeting', 'refused', 'off_topic', 'faq', 'llm')
+ROUTE_MODE = 'route'
+
+
+def _key(mode, counter):
+    return f'{METRICS_PREFIX}{mode}:{counter}'
+
+
+def _modes():
+    return list(settings.AI_CACHE_TTLS)
+
+
+def incr(counter, mode=None, amount=1):
+    """Add ``amount`` to a counter for ``mode``."""
+    if not amount:
+        return
+    backend = caches['ai']
+    key = _key(mode if mode in settings.AI_CACHE_TTLS or mode == ROUTE_MODE else 'default', counter)
+    # add() is a no-op if the counter exists, so concurrent first writes are safe
+    backend.add(key, 0, timeout=None)
+    try:
+        backend.incr(key, amount)
+    except ValueError:
+        # Evicted between add() and incr()
+        backend.set(key, amount, timeout=None)
+
+
+def record_lookup(mode, result, cached):
+    """Count a cache lookup; hits also credit the tokens the provider call would have used."""
+    if cached:
+        incr('hits', mode)
+        incr('saved_tokens', mode, result.get('tokens_used') or 0)
+    else:
+        incr('misses', mode)
+
+
+def record_route(route):
+    """Count a chat message routed by the pre-filter ('llm' if it went to the model)."""
+    incr(route, ROUTE_MODE)
+
+
+def snapshot():
+    """
+    Current counters, in total and per mode.
+
+    Returns:
+        Dict with the COUNTERS plus 'requests' and 'hit_rate', a 'modes'
+        dict with the same fields for each mode that has traffic, and a
+        'routes' dict of pre-filter route counts with 'saved_call_rate'
+        (share of chat messages answered without the model).
+    """
+    modes = _modes()
+    values = caches['ai'].get_many(
+        [_key(mode, counter) for mode in modes for counter in COUNTERS]
+        + [_key(ROUTE_MODE, route) for route in ROUTES]
+    )
+
+    def summarize(counts):
+        requests = counts['hits'] + counts['misses']
+        return {
+            **counts,
+            'requests': requests,
+            'hit_rate': round(counts['hits'] / requests, 4) if requests else 0.0,
+        }
+
+    per_mode = {}
+    totals = dict.fromkeys(COUNTERS, 0)
+    for mode in modes:
+        counts = {counter: values.get(_key(mode, counter), 0) for counter in COUNTERS}
+        if any(counts.values()):
+            per_mode[mode] = summarize(counts)
+        for counter in COUNTERS:
+            totals[counter] += counts[counter]
+
+    routes = {route: values.get(_key(ROUTE_MODE, route), 0) for route in ROUTES}
+    routed = sum(routes.values())
+    routes['saved_call_rate'] = round((routed - routes['llm']) / routed, 4) if routed else 0.0
+
+    return {**summarize(totals), 'modes': per_mode, 'routes': routes}
+
+
+def reset():
+    caches['ai'].delete_many(
+        [_key(mode, counter) for mode in _modes() for counter in COUNTERS]
+        + [_key(ROUTE_MODE, route) for route in ROUTES]
+    )
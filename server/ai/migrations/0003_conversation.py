@@ -0,0 +1,55 @@
+# Generated by Django 4.2.7 on 2026-10-16 23:14
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('ai', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Conversation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('session_id', models.CharField(blank=True, db_index=True, help_text='Track anonymous usage', max_length=255)),
+                ('tone', models.CharField(choices=[('helpful', 'Helpful'), ('uncle_japa', 'Uncle Japa'), ('bestie', 'Bestie'), ('strict_officer', 'Strict Officer'), ('hype_man', 'Hype Man'), ('therapist', 'Therapist')], default='helpful', max_length=20)),
+                ('focused_country', models.CharField(blank=True, help_text='Country code the conversation is currently about', max_length=3)),
+                ('message_count', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='ai_conversations', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-updated_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ConversationMessage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('role', models.CharField(choices=[('user', 'User'), ('assistant', 'Assistant')], max_length=10)),
+                ('content', models.TextField()),
+                ('countries_detected', models.JSONField(blank=True, default=list, help_text='Country codes mentioned in this message')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('conversation', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='messages', to='ai.conversation')),
+            ],
+            options={
+                'ordering': ['created_at', 'id'],
+                'indexes': [models.Index(fields=['conversation', '-created_at'], name='ai_conversa_convers_08e62d_idx')],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='conversation',
+            index=models.Index(fields=['session_id'], name='ai_conversa_session_6836e8_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='conversation',
+            index=models.Index(fields=['user'], name='ai_conversa_user_id_7405ad_idx'),
+        ),
+    ]
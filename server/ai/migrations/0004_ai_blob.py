@@ -0,0 +1,43 @@
+# Generated by Django 4.2.7 on 2026-10-16 23:47
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai', '0003_conversation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AIBlob',
+            fields=[
+                ('hash', models.CharField(help_text='SHA-256 of the text', max_length=64, primary_key=True, serialize=False)),
+                ('data', models.BinaryField()),
+                ('size', models.IntegerField(help_text='Uncompressed size in bytes')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='airequest',
+            name='prompt_text',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AlterField(
+            model_name='airequest',
+            name='response_text',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='airequest',
+            name='prompt_blob',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='prompt_requests', to='ai.aiblob'),
+        ),
+        migrations.AddField(
+            model_name='airequest',
+            name='response_blob',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='response_requests', to='ai.aiblob'),
+        ),
+    ]
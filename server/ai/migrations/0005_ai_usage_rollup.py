@@ -0,0 +1,73 @@
+# Generated by Django 4.2.7 on 2026-10-16 23:50
+
+from django.db import migrations, models
+
+
+def fill_mode_and_tone(apps, schema_editor):
+    """Copy mode and tone out of the logged context of existing requests."""
+    AIRequest = apps.get_model('ai', 'AIRequest')
+    requests = AIRequest.objects.select_related('prompt_template').only('metadata', 'prompt_template__mode')
+    batch = []
+    for request in requests.iterator(chunk_size=1000):
+        metadata = request.metadata or {}
+        request.mode = metadata.get('mode') or (request.prompt_template.mode if request.prompt_template else '')
+        request.tone = metadata.get('tone', '')
+        batch.append(request)
+        if len(batch) == 1000:
+            AIRequest.objects.bulk_update(batch, ['mode', 'tone'])
+            batch = []
+    AIRequest.objects.bulk_update(batch, ['mode', 'tone'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai', '0004_ai_blob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AIUsageRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField(help_text='Start of the hour (UTC)')),
+                ('model_used', models.CharField(max_length=50)),
+                ('template', models.CharField(blank=True, help_text='PromptTemplate name, blank for inline prompts', max_length=255)),
+                ('mode', models.CharField(blank=True, max_length=20)),
+                ('tone', models.CharField(blank=True, max_length=20)),
+                ('requests', models.IntegerField(default=0)),
+                ('tokens_used', models.BigIntegerField(default=0)),
+                ('cost_usd', models.DecimalField(decimal_places=6, default=0, max_digits=14)),
+                ('duration_seconds', models.FloatField(default=0, help_text='Sum of request durations')),
+                ('latency_histogram', models.JSONField(default=list, help_text='Request counts per ai.usage.LATENCY_BUCKETS bucket')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['-hour'],
+            },
+        ),
+        migrations.AddField(
+            model_name='airequest',
+            name='mode',
+            field=models.CharField(blank=True, max_length=20),
+        ),
+        migrations.AddField(
+            model_name='airequest',
+            name='rolled_up',
+            field=models.BooleanField(default=False, help_text='Counted in AIUsageRollup (see ai/usage.py)'),
+        ),
+        migrations.AddField(
+            model_name='airequest',
+            name='tone',
+            field=models.CharField(blank=True, max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='airequest',
+            index=models.Index(condition=models.Q(('rolled_up', False)), fields=['id'], name='ai_request_pending_rollup'),
+        ),
+        migrations.AddConstraint(
+            model_name='aiusagerollup',
+            constraint=models.UniqueConstraint(fields=('hour', 'model_used', 'template', 'mode', 'tone'), name='unique_ai_usage_rollup'),
+        ),
+        migrations.RunPython(fill_mode_and_tone, migrations.RunPython.noop),
+    ]
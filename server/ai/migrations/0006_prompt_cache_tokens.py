@@ -0,0 +1,33 @@
+# Generated by Django 4.2.7 on 2026-10-17 00:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai', '0005_ai_usage_rollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='airequest',
+            name='prompt_cache_hit_tokens',
+            field=models.IntegerField(blank=True, help_text="Prompt tokens served from the provider's context cache", null=True),
+        ),
+        migrations.AddField(
+            model_name='airequest',
+            name='prompt_tokens',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='aiusagerollup',
+            name='prompt_cache_hit_tokens',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='aiusagerollup',
+            name='prompt_tokens',
+            field=models.BigIntegerField(default=0, help_text='Prompt tokens of requests reporting cache hits'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-17 00:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai', '0006_prompt_cache_tokens'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='airequest',
+            name='packed_tokens',
+            field=models.IntegerField(blank=True, help_text='Prompt tokens as counted locally (ai.tokenizer) after context packing', null=True),
+        ),
+    ]
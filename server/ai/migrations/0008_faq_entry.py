@@ -0,0 +1,32 @@
+# Generated by Django 4.2.7 on 2026-10-17 00:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai', '0007_airequest_packed_tokens'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FAQEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('question', models.CharField(max_length=255)),
+                ('variants', models.JSONField(blank=True, default=list, help_text='Other phrasings of the question, matched like the question itself')),
+                ('answer', models.TextField()),
+                ('country_code', models.CharField(blank=True, db_index=True, help_text='Country the answer is about; empty for general questions', max_length=3)),
+                ('source', models.CharField(blank=True, help_text='Where the answer comes from (shown as the response source)', max_length=255)),
+                ('is_active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'FAQ entry',
+                'verbose_name_plural': 'FAQ entries',
+                'ordering': ['country_code', 'question'],
+            },
+        ),
+    ]
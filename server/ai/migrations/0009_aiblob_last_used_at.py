@@ -0,0 +1,19 @@
+# Generated by Django 4.2.7 on 2026-10-17 00:46
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai', '0008_faq_entry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='aiblob',
+            name='last_used_at',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now, help_text='Last time a request was written with this body; recent blobs are never pruned'),
+        ),
+    ]
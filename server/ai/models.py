@@ -1,4 +1,6 @@
+import zlib
 from django.db import models
+from django.utils import timezone
 from django.conf import settings
 
 
@@ -44,6 +46,31 @@ class PromptTemplate(models.Model):
         return f"{self.name} ({self.mode})"
 
 
+class AIBlob(models.Model):
+    """
+    Content-addressed, zlib-compressed prompt or response body.
+    
+    Identical bodies (repeated prompts, cached answers) are stored once;
+    see ai/blobs.py.
+    """
+    hash = models.CharField(max_length=64, primary_key=True, help_text="SHA-256 of the text")
+    data = models.BinaryField()
+    size = models.IntegerField(help_text="Uncompressed size in bytes")
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(
+        default=timezone.now,
+        db_index=True,
+        help_text="Last time a request was written with this body; recent blobs are never pruned"
+    )
+    
+    def __str__(self):
+        return f"{self.hash[:12]} ({self.size} bytes)"
+    
+    @property
+    def text(self):
+        return zlib.decompress(self.data).decode('utf-8')
+
+
 class AIRequest(models.Model):
     """
     Log all AI requests for debugging and analytics.
@@ -68,10 +95,38 @@ class AIRequest(models.Model):
         blank=True,
         on_delete=models.SET_NULL
     )
-    prompt_text = models.TextField()
-    response_text = models.TextField()
+    prompt_blob = models.ForeignKey(
+        AIBlob,
+        null=True,
+        blank=True,
+        on_delete=models.PROTECT,
+        related_name='prompt_requests'
+    )
+    response_blob = models.ForeignKey(
+        AIBlob,
+        null=True,
+        blank=True,
+        on_delete=models.PROTECT,
+        related_name='response_requests'
+    )
+    # Inline bodies of rows written before blobs (emptied by backfill_ai_blobs)
+    prompt_text = models.TextField(blank=True)
+    response_text = models.TextField(blank=True)
     model_used = models.CharField(max_length=50, default='gpt-4o-mini')
+    mode = models.CharField(max_length=20, blank=True)
+    tone = models.CharField(max_length=20, blank=True)
     tokens_used = models.IntegerField(null=True, blank=True)
+    prompt_tokens = models.IntegerField(null=True, blank=True)
+    prompt_cache_hit_tokens = models.IntegerField(
+        null=True,
+        blank=True,
+        help_text="Prompt tokens served from the provider's context cache"
+    )
+    packed_tokens = models.IntegerField(
+        null=True,
+        blank=True,
+        help_text="Prompt tokens as counted locally (ai.tokenizer) after context packing"
+    )
     cost_usd = models.DecimalField(
         max_digits=10, 
         decimal_places=6, 
@@ -80,6 +135,10 @@ class AIRequest(models.Model):
     )
     duration_seconds = models.FloatField(null=True, blank=True)
     metadata = models.JSONField(default=dict, blank=True)
+    rolled_up = models.BooleanField(
+        default=False,
+        help_text="Counted in AIUsageRollup (see ai/usage.py)"
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     
     class Meta:
@@ -87,8 +146,171 @@ class AIRequest(models.Model):
         indexes = [
             models.Index(fields=['session_id']),
             models.Index(fields=['user']),
+            # Only rows still waiting for the rollup job
+            models.Index(fields=['id'], condition=models.Q(rolled_up=False), name='ai_request_pending_rollup'),
         ]
     
     def __str__(self):
         user_id = self.user.username if self.user else self.session_id[:8]
-        return f"AI Request by {user_id} at {self.created_at}"
\ No newline at end of file
+        return f"AI Request by {user_id} at {self.created_at}"
+    
+    @property
+    def prompt(self):
+        return self.prompt_blob.text if self.prompt_blob_id else self.prompt_text
+    
+    @property
+    def response(self):
+        return self.response_blob.text if self.response_blob_id else self.response_text
+
+class Conversation(models.Model):
+    """
+    Server-side state for an AI chat conversation.
+    
+    Caches the countries discussed and the focused country so each turn
+    only has to process the new message.
+    """
+    session_id = models.CharField(
+        max_length=255,
+        blank=True,
+        db_index=True,
+        help_text="Track anonymous usage"
+    )
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        null=True,
+        blank=True,
+        on_delete=models.CASCADE,
+        related_name='ai_conversations'
+    )
+    tone = models.CharField(max_length=20, choices=TONE_CHOICES, default='helpful')
+    focused_country = models.CharField(
+        max_length=3,
+        blank=True,
+        help_text="Country code the conversation is currently about"
+    )
+    message_count = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['-updated_at']
+        indexes = [
+            models.Index(fields=['session_id']),
+            models.Index(fields=['user']),
+        ]
+    
+    def __str__(self):
+        owner = self.user.username if self.user else self.session_id[:8]
+        return f"Conversation {self.id} by {owner}"
+    
+    def recent_messages(self, limit=6):
+        """Return the last ``limit`` messages, oldest first, in one query."""
+        messages = list(self.messages.order_by('-created_at', '-id')[:limit])
+        messages.reverse()
+        return messages
+
+
+class ConversationMessage(models.Model):
+    """
+    A single turn in a conversation, with the countries detected in it.
+    """
+    ROLE_CHOICES = [
+        ('user', 'User'),
+        ('assistant', 'Assistant'),
+    ]
+    
+    conversation = models.ForeignKey(
+        Conversation,
+        on_delete=models.CASCADE,
+        related_name='messages'
+    )
+    role = models.CharField(max_length=10, choices=ROLE_CHOICES)
+    content = models.TextField()
+    countries_detected = models.JSONField(
+        default=list,
+        blank=True,
+        help_text="Country codes mentioned in this message"
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['created_at', 'id']
+        indexes = [
+            models.Index(fields=['conversation', '-created_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.role} in conversation {self.conversation_id}: {self.content[:50]}"
+
+
+class FAQEntry(models.Model):
+    """
+    Curated answer the chat pre-filter (ai.prefilter) serves without an LLM
+    call when a question matches it closely.
+    """
+    question = models.CharField(max_length=255)
+    variants = models.JSONField(
+        default=list,
+        blank=True,
+        help_text="Other phrasings of the question, matched like the question itself"
+    )
+    answer = models.TextField()
+    country_code = models.CharField(
+        max_length=3,
+        blank=True,
+        db_index=True,
+        help_text="Country the answer is about; empty for general questions"
+    )
+    source = models.CharField(
+        max_length=255,
+        blank=True,
+        help_text="Where the answer comes from (shown as the response source)"
+    )
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['country_code', 'question']
+        verbose_name = 'FAQ entry'
+        verbose_name_plural = 'FAQ entries'
+    
+    def __str__(self):
+        return f"{self.country_code or 'general'}: {self.question}"
+
+
+class AIUsageRollup(models.Model):
+    """
+    Hourly usage totals per model, template, mode and tone.
+    
+    Maintained incrementally from AIRequest rows by ai.usage.update_rollups,
+    so dashboards read a few rows per hour instead of scanning requests.
+    """
+    hour = models.DateTimeField(help_text="Start of the hour (UTC)")
+    model_used = models.CharField(max_length=50)
+    template = models.CharField(max_length=255, blank=True, help_text="PromptTemplate name, blank for inline prompts")
+    mode = models.CharField(max_length=20, blank=True)
+    tone = models.CharField(max_length=20, blank=True)
+    requests = models.IntegerField(default=0)
+    tokens_used = models.BigIntegerField(default=0)
+    prompt_tokens = models.BigIntegerField(default=0, help_text="Prompt tokens of requests reporting cache hits")
+    prompt_cache_hit_tokens = models.BigIntegerField(default=0)
+    cost_usd = models.DecimalField(max_digits=14, decimal_places=6, default=0)
+    duration_seconds = models.FloatField(default=0, help_text="Sum of request durations")
+    latency_histogram = models.JSONField(
+        default=list,
+        help_text="Request counts per ai.usage.LATENCY_BUCKETS bucket"
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['-hour']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['hour', 'model_used', 'template', 'mode', 'tone'], name='unique_ai_usage_rollup'
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.hour:%Y-%m-%d %H:00} {self.model_used} {self.mode or self.template} ({self.requests})"
+
@@ -0,0 +1,238 @@
+"""
+Local pre-filter for chat messages: answers or rejects what needs no LLM.
+
+Each message is classified from cheap local features before retrieval and
+the provider call:
+
+- greeting: small talk (hello, thanks, bye) gets a templated reply in the
+  persona's voice (PERSONALITY_INTROS)
+- refused: requests for illegal routes, fake documents or for getting
+  around requirements, which SAFETY_RULES says to refuse
+- off_topic: clearly unrelated requests (recipes, sports, code, ...) with
+  no migration vocabulary and no country mentioned
+- faq: a close TF-IDF match to a curated FAQEntry question about the same
+  country (or a general one when no country is mentioned), answered with
+  the curated text; questions asking for detail (fees, timelines,
+  requirements) always go to the model
+- llm: everything else goes to the model
+
+The rules err towards 'llm': a message is only answered locally when the
+features are unambiguous.
+"""
+import math
+import re
+import threading
+from collections import Counter
+from django.conf import settings
+from core.utils import get_data_version
+from .metrics import ROUTES
+from .semantic_cache import normalize_question
+
+
+WORD_RE = re.compile(r"[a-z]+")
+# Small talk is at most this many words: courtesy phrases plus SMALL_TALK_WORDS
+SMALL_TALK_MAX_WORDS = 8
+GREETING_WORDS = {
+    'hi', 'hii', 'hello', 'hey', 'heyy', 'heyyy', 'hiya', 'howdy', 'yo', 'sup',
+    'morning', 'afternoon', 'evening', 'greetings',
+}
+CLOSING_WORDS = {
+    'thanks', 'thank', 'thx', 'ty', 'appreciate', 'appreciated', 'bye', 'goodbye', 'cheers', 'night',
+}
+# Greetings, closings and filler only: question words and pronouns appear
+# solely inside the fixed phrases below, so "hi how much is it" is not small talk
+SMALL_TALK_WORDS = GREETING_WORDS | CLOSING_WORDS | {
+    'a', 'again', 'ah', 'all', 'and', 'bestie', 'bot', 'cool', 'day', 'dear', 'everyone', 'fine',
+    'friend', 'good', 'great', 'guys', 'japabot', 'later', 'lot', 'ma', 'man', 'mate', 'nice',
+    'o', 'oh', 'ok', 'okay', 'please', 'sir', 'so', 'there', 'uncle', 'very', 'well', 'ya',
+}
+GREETING_PHRASE_RE = re.compile(
+    r'\b(?:how (?:are|r) (?:you|u|things)(?: doing)?|how (?:is|s) it going|hows (?:it going|you|things)'
+    r'|whats up|wassup|how far|how you dey|(?:i am|im) (?:fine|good|ok|okay|well))\b'
+)
+CLOSING_PHRASE_RE = re.compile(
+    r'\b(?:(?:thank (?:you|u)|thanks)(?: (?:so|very) much)?|see (?:you|u)(?: later| again| soon)?'
+    r'|have a (?:good|nice|great) (?:day|night|one))\b'
+)
+
+# SAFETY_RULES red flags: illegal routes and circumventing requirements.
+# Fake documents are only refused when asked for, not when a victim or
+# someone checking an offer mentions them.
+REFUSE_RE = re.compile(
+    r'\b(?:make|making|get|getting|buy|buying|use|using|submit|forge|create|print|arrange|need|want)\s+'
+    r'(?:(?:me|us|an?|some|the|my)\s+){0,2}(?:fake|forged?|counterfeit|false)\s+(?:\w+\s+)?'
+    r'(?:passports?|documents?|papers|visas?|certificates?|bank statements?|marriage|job offers?|degrees?)\b'
+    r'|\bbrib(?:e|es|ed|ing)\b|\bsmuggl\w*|\bsneak(?:ing)?\s+(?:in|into|across)\b'
+    r'|\b(?:cross|enter|get in|get into|stay|work|live)\b[\w\s]{0,20}\billegally\b'
+    r'|\billegal(?:ly)?\s+(?:routes?|ways?|entry)\b|\bwithout (?:being|getting) caught\b'
+    r'|\b(?:lie|lying)\s+(?:on|in|to)\s+(?:my|the|an?)?\s*(?:\w+\s+)?(?:application|embassy|visa officer|immigration)\b'
+    r'|\bbuy\s+(?:an?\s+)?(?:\w+\s+)?(?:visas?|passports?|work permits?|ielts|residency)\b'
+    r'|\b(?:bypass|get around|circumvent|cheat)\s+(?:the\s+)?'
+    r'(?:requirements?|rules|ielts|test|exam|system|lmia|immigration|border)\b',
+    re.IGNORECASE
+)
+
+# Migration vocabulary: any of these sends a message to the model
+DOMAIN_RE = re.compile(
+    r'\b(?:visas?|immigra\w*|migra\w*|emigra\w*|relocat\w*|move|moving|abroad|overseas|japa'
+    r'|countr(?:y|ies)|work\w*|jobs?|career|employ\w*|salar(?:y|ies)|stud(?:y|ying|ent|ents)'
+    r'|schools?|universit(?:y|ies)|college|scholarships?|tuition|degree|masters|phd|permits?'
+    r'|residen\w*|citizen\w*|passports?|embassy|consulate|famil(?:y|ies)|spouse|wife|husband'
+    r'|children|kids|partner|cost|rent|living|tax(?:es)?|healthcare|insurance|language|ielts'
+    r'|toefl|sponsor\w*|lmia|asylum|refugees?|settle\w*|roadmap|nurs\w*|doctors?|engineers?)\b',
+    re.IGNORECASE
+)
+
+OFF_TOPIC_RE = re.compile(
+    r'\b(?:recipes?|cook(?:ing)?|bake|baking|football|soccer|premier league|champions league'
+    r'|basketball|movies?|films?|netflix|series|songs?|lyrics|music|jokes?|poems?|riddles?'
+    r'|horoscope|zodiac|bitcoin|crypto\w*|stocks?|forex|betting|lottery|celebrit(?:y|ies)'
+    r'|girlfriend|boyfriend|dating|homework|equations?|python|javascript|coding|video games?'
+    r'|anime)\b',
+    re.IGNORECASE
+)
+
+GREETING_REPLY = (
+    "{intro} I can help you explore visas, work, study and family routes and the cost "
+    "of moving abroad. Which country are you thinking about?"
+)
+CLOSING_REPLY = "You're welcome! Come back anytime you have more questions about your move."
+OFF_TOPIC_REPLY = (
+    "{intro} I can only help with moving abroad: visas, work, study, family routes, costs "
+    "and settling in. What would you like to know about your move?"
+)
+REFUSAL_REPLY = (
+    "I can't help with illegal immigration routes or with getting around visa requirements; "
+    "they can lead to bans, deportation or prosecution. I'm happy to help you find a legal "
+    "pathway instead: tell me where you'd like to go and a bit about your background."
+)
+
+
+def faq_terms(text):
+    """normalize_question() terms, or every word for questions made only of stopwords."""
+    return normalize_question(text) or sorted(set(WORD_RE.findall(text.lower().replace("'", ''))))
+
+
+class FAQIndex:
+    """
+    TF-IDF vectors (binary term frequency, smoothed IDF) of the active FAQ
+    questions and their variants.
+
+    Args:
+        entries: FAQEntry value dicts (id, question, variants, answer,
+            country_code, source)
+        version: Data version the snapshot was taken at
+    """
+
+    def __init__(self, entries, version=None):
+        self.version = version
+        phrasings = [
+            (entry, terms)
+            for entry in entries
+            for terms in (faq_terms(text) for text in [entry['question'], *entry['variants']])
+            if terms
+        ]
+        counts = Counter(term for _, terms in phrasings for term in terms)
+        total = len(phrasings)
+        self.idf = {term: math.log((total + 1) / (count + 1)) + 1 for term, count in counts.items()}
+        # Terms no FAQ uses weigh the most, pulling unrelated questions' scores down
+        self.unseen_idf = math.log(total + 1) + 1
+        self.vectors = [(entry, self._vector(terms)) for entry, terms in phrasings]
+
+    def _vector(self, terms):
+        weights = {term: self.idf.get(term, self.unseen_idf) for term in terms}
+        norm = math.sqrt(sum(weight * weight for weight in weights.values())) or 1.0
+        return {term: weight / norm for term, weight in weights.items()}
+
+    def match(self, question, countries=()):
+        """
+        Closest entry for a question: (entry, cosine score), or (None, 0.0).
+
+        Only entries about the question's country are considered, or
+        general entries when it names none.
+        """
+        vector = self._vector(faq_terms(question))
+        allowed = set(countries) if countries else {''}
+        best, best_score = None, 0.0
+        for entry, other in self.vectors:
+            if entry['country_code'] not in allowed:
+                continue
+            score = sum(weight * other.get(term, 0.0) for term, weight in vector.items())
+            if score > best_score:
+                best, best_score = entry, score
+        return best, best_score
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_faq_index():
+    """Return the process-wide FAQ index, rebuilding it if entries changed."""
+    global _index
+    from .models import FAQEntry
+
+    version = get_data_version('faq')
+    index = _index
+    if index is not None and index.version == version:
+        return index
+
+    with _index_lock:
+        if _index is None or _index.version != version:
+            entries = FAQEntry.objects.filter(is_active=True).values(
+                'id', 'question', 'variants', 'answer', 'country_code', 'source'
+            )
+            _index = FAQIndex(list(entries), version=version)
+        return _index
+
+
+def _small_talk(message):
+    """'greeting', 'closing' or None."""
+    text = ' '.join(WORD_RE.findall(message.lower().replace("'", '')))
+    if not text or len(text.split()) > SMALL_TALK_MAX_WORDS:
+        return None
+    closing = CLOSING_PHRASE_RE.search(text)
+    text = CLOSING_PHRASE_RE.sub(' ', text)
+    greeting = GREETING_PHRASE_RE.search(text)
+    words = set(GREETING_PHRASE_RE.sub(' ', text).split())
+    if not words <= SMALL_TALK_WORDS:
+        return None
+    if closing or CLOSING_WORDS & words:
+        return 'closing'
+    if greeting or GREETING_WORDS & words:
+        return 'greeting'
+    return None
+
+
+def route_message(message, intro='', countries=()):
+    """
+    Classify a chat message and build the local answer, if any.
+
+    Args:
+        message: The user's message
+        intro: Persona intro (PERSONALITY_INTROS) for templated replies
+        countries: Country codes the message is about
+
+    Returns:
+        Dict with 'route' (one of ROUTES) and 'answer' (None for 'llm');
+        'faq' routes also carry the matched entry as 'faq' and its 'score'
+    """
+    if REFUSE_RE.search(message):
+        return {'route': 'refused', 'answer': REFUSAL_REPLY}
+
+    small_talk = _small_talk(message)
+    if small_talk == 'greeting':
+        return {'route': 'greeting', 'answer': GREETING_REPLY.format(intro=intro).strip()}
+    if small_talk == 'closing':
+        return {'route': 'greeting', 'answer': CLOSING_REPLY}
+
+    if not countries and OFF_TOPIC_RE.search(message) and not DOMAIN_RE.search(message):
+        return {'route': 'off_topic', 'answer': OFF_TOPIC_REPLY.format(intro=intro).strip()}
+
+    from countries.briefs import needs_detail
+    if len(countries) <= 1 and not needs_detail(message):
+        entry, score = get_faq_index().match(message, countries)
+        if entry and score >= settings.AI_PREFILTER_FAQ_THRESHOLD:
+            return {'route': 'faq', 'answer': entry['answer'], 'faq': entry, 'score': round(score, 3)}
+
+    return {'route': 'llm', 'answer': None}
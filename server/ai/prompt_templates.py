@@ -6,6 +6,17 @@ This module contains system prompts and templates that enforce:
 - Clear uncertainty language
 - Source-aware responses
 - Appropriate disclaimers for critical information
+
+Prompts are laid out for provider-side prefix caching (DeepSeek bills and
+serves a prompt prefix it has already seen at a fraction of the cost), most
+stable segment first:
+
+1. System prompt and safety rules - fixed per context type
+2. Country block - country guidance and retrieved documents, shared by
+   every user asking about the same country
+3. Per-user tail - personality, tone, profile, conversation and question
+
+Anything that varies per user or per request must stay out of 1 and 2.
 """
 
 # =============================================================================
@@ -63,7 +74,7 @@ Your role is to help users explore migration options, understand visa requiremen
 - Keep responses focused and scannable
 """
 
-SYSTEM_PROMPT_COUNTRY_INFO = """You are Japabot, helping a user learn about {country_name} as a migration destination.
+SYSTEM_PROMPT_COUNTRY_INFO = """You are Japabot, helping a user learn about a country as a migration destination.
 
 {safety_rules}
 
@@ -72,13 +83,9 @@ SYSTEM_PROMPT_COUNTRY_INFO = """You are Japabot, helping a user learn about {cou
 - Highlight both opportunities and challenges
 - Be honest about difficulty and requirements
 - Reference official resources when available
-
-## DATA CONFIDENCE
-Our data for {country_name} is marked as: {data_confidence}
-{confidence_guidance}
 """
 
-SYSTEM_PROMPT_VISA_GUIDANCE = """You are Japabot, helping a user understand visa options for {country_name}.
+SYSTEM_PROMPT_VISA_GUIDANCE = """You are Japabot, helping a user understand visa options for a destination country.
 
 {safety_rules}
 
@@ -91,10 +98,10 @@ SYSTEM_PROMPT_VISA_GUIDANCE = """You are Japabot, helping a user understand visa
 
 ## CRITICAL DISCLAIMER
 Include this in responses about visa requirements:
-"⚠️ Visa requirements change frequently. This information is for guidance only. Always verify current requirements with the official embassy or immigration authority of {country_name}."
+"⚠️ Visa requirements change frequently. This information is for guidance only. Always verify current requirements with the official embassy or immigration authority of the destination country."
 """
 
-SYSTEM_PROMPT_COST_ESTIMATION = """You are Japabot, helping a user estimate costs for relocating to {country_name}.
+SYSTEM_PROMPT_COST_ESTIMATION = """You are Japabot, helping a user estimate costs for relocating to a destination country.
 
 {safety_rules}
 
@@ -110,7 +117,7 @@ Include this in cost-related responses:
 "💰 These are rough estimates based on available data. Actual costs vary significantly based on lifestyle, location within the country, timing, and personal circumstances. Use these figures for planning purposes only."
 """
 
-SYSTEM_PROMPT_ROADMAP = """You are Japabot, helping a user plan their migration journey to {country_name}.
+SYSTEM_PROMPT_ROADMAP = """You are Japabot, helping a user plan their migration journey to a destination country.
 
 {safety_rules}
 
@@ -127,6 +134,14 @@ SYSTEM_PROMPT_ROADMAP = """You are Japabot, helping a user plan their migration
 - Celebrate progress while preparing users for challenges
 """
 
+# =============================================================================
+# COUNTRY BLOCK - after the system prompt, before anything per-user
+# =============================================================================
+
+COUNTRY_PROMPT = """## DESTINATION: {country_name}
+Our data for {country_name} is marked as: {data_confidence}
+{confidence_guidance}"""
+
 # =============================================================================
 # CONFIDENCE GUIDANCE TEMPLATES
 # =============================================================================
@@ -159,18 +174,20 @@ This country has limited or outdated data. You MUST:
 # =============================================================================
 
 TEMPLATE_COUNTRY_OVERVIEW = """
-{personality_intro}
-
-The user wants to learn about {country_name} as a potential migration destination.
+{safety_rules}
 
-Available data:
+Available data for {country_name}:
 - Region: {region}
 - Data Confidence: {data_confidence}
 - Cost of Living Index: {cost_index}
 - Key Visa Types: {visa_types}
 
+{personality_intro}
+
 {tone_instructions}
 
+The user wants to learn about {country_name} as a potential migration destination.
+
 User's question: {message}
 
 Provide a helpful overview that:
@@ -178,20 +195,21 @@ Provide a helpful overview that:
 2. Mentions key challenges or considerations
 3. Gives a sense of the visa landscape
 4. Suggests next steps for learning more
-
-{safety_rules}
 """
 
 TEMPLATE_VISA_QUESTION = """
+{safety_rules}
+
+Known visa types for {country_name}: {visa_types}
+
 {personality_intro}
 
+{tone_instructions}
+
 The user has a question about visas for {country_name}.
 
-Known visa types: {visa_types}
 User's profile: {user_profile}
 
-{tone_instructions}
-
 User's question: {message}
 
 Provide guidance that:
@@ -201,24 +219,24 @@ Provide guidance that:
 4. Suggests related visa types they might consider
 
 Include the visa disclaimer.
-
-{safety_rules}
 """
 
 TEMPLATE_COST_QUESTION = """
-{personality_intro}
-
-The user wants to understand costs for {country_name}.
+{safety_rules}
 
-Available cost data:
+Available cost data for {country_name}:
 - Cost of Living Index: {cost_index}
 - Average Rent (monthly): {avg_rent}
 - Average Meal Cost: {avg_meal}
 - Healthcare (monthly): {healthcare_monthly}
 - Currency: {currency}
 
+{personality_intro}
+
 {tone_instructions}
 
+The user wants to understand costs for {country_name}.
+
 User's question: {message}
 
 Provide cost guidance that:
@@ -228,11 +246,11 @@ Provide cost guidance that:
 4. Recommends building a buffer
 
 Include the cost disclaimer.
-
-{safety_rules}
 """
 
 TEMPLATE_GENERAL_CHAT = """
+{safety_rules}
+
 {personality_intro}
 
 {tone_instructions}
@@ -244,21 +262,21 @@ Provide a helpful, conversational response that:
 2. Stays within the scope of migration guidance
 3. Recommends next steps if relevant
 4. Maintains appropriate uncertainty for any factual claims
-
-{safety_rules}
 """
 
 # =============================================================================
 # HELPER FUNCTIONS
 # =============================================================================
 
-def get_system_prompt(context_type: str, **kwargs) -> str:
+def get_system_prompt(context_type: str) -> str:
     """
     Get the appropriate system prompt with safety rules injected.
     
+    The result is the same for every request of a context type, so it is
+    always a cached prefix; country details go in get_country_prompt().
+    
     Args:
         context_type: One of 'base', 'country', 'visa', 'cost', 'roadmap'
-        **kwargs: Context variables like country_name, data_confidence
     
     Returns:
         Formatted system prompt string
@@ -272,13 +290,20 @@ def get_system_prompt(context_type: str, **kwargs) -> str:
     }
     
     template = prompts.get(context_type, SYSTEM_PROMPT_BASE)
+    return template.format(safety_rules=SAFETY_RULES)
+
+
+def get_country_prompt(country_name: str, data_confidence: str = 'low') -> str:
+    """
+    Get the country block: destination and data-confidence guidance.
     
-    # Add confidence guidance if applicable
-    data_confidence = kwargs.get('data_confidence', 'low')
-    kwargs['confidence_guidance'] = CONFIDENCE_GUIDANCE.get(data_confidence, CONFIDENCE_GUIDANCE['low'])
-    kwargs['safety_rules'] = SAFETY_RULES
-    
-    return template.format(**kwargs)
+    Goes right after the system prompt, ahead of anything per-user.
+    """
+    return COUNTRY_PROMPT.format(
+        country_name=country_name,
+        data_confidence=data_confidence,
+        confidence_guidance=CONFIDENCE_GUIDANCE.get(data_confidence, CONFIDENCE_GUIDANCE['low']),
+    )
 
 
 def get_template(template_name: str) -> str:
@@ -0,0 +1,193 @@
+"""
+Write-behind logging of AIRequest rows.
+
+Completions hand their log row to an in-process buffer instead of inserting
+it before returning. A background thread drains the buffer with
+``bulk_create`` every ``AI_REQUEST_LOG_BATCH_SIZE`` rows or
+``AI_REQUEST_LOG_FLUSH_INTERVAL`` seconds, or (``AI_REQUEST_LOG_MODE =
+'celery'``) hands each batch to a Celery task so web workers do no log I/O
+at all. ``'sync'`` keeps the old insert-per-request behaviour. Either way
+prompt and response bodies go to the content-addressed blob table
+(ai/blobs.py).
+
+The buffer is bounded: when the database falls behind, new rows are dropped
+and counted rather than growing memory or blocking requests. Remaining rows
+are flushed at interpreter exit and Celery worker shutdown. ``created_at``
+is the time a row is written, at most a flush interval (or task delay)
+after the completion.
+"""
+import os
+import queue
+import atexit
+import threading
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from celery.signals import worker_process_shutdown, worker_shutdown
+from .models import AIRequest
+from .blobs import store_bodies
+from .usage import update_rollups
+
+
+# Context keys already rendered into prompt_text; not repeated in metadata
+PROMPT_ONLY_CONTEXT = {
+    'retrieved_documents', 'conversation_context', 'country_blocks',
+    'personality_intro', 'tone_instructions',
+}
+
+
+def request_row(**fields):
+    """
+    Build an unsaved AIRequest, trimming metadata to what prompt_text lacks.
+
+    ``metadata`` is copied so later changes to the caller's context dict do
+    not leak into a row that has not been written yet.
+    """
+    metadata = {
+        key: value for key, value in (fields.pop('metadata', None) or {}).items()
+        if key not in PROMPT_ONLY_CONTEXT
+    }
+    return AIRequest(metadata=metadata, **fields)
+
+
+def write_requests(rows):
+    """Insert unsaved AIRequests, with their bodies moved into blobs."""
+    with transaction.atomic():
+        AIRequest.objects.bulk_create(store_bodies(rows))
+
+
+def serialize_row(row):
+    """JSON-safe dict of an unsaved AIRequest for a Celery task."""
+    return {
+        'session_id': row.session_id,
+        'user_id': row.user_id,
+        'prompt_template_id': row.prompt_template_id,
+        'prompt_text': row.prompt_text,
+        'response_text': row.response_text,
+        'model_used': row.model_used,
+        'mode': row.mode,
+        'tone': row.tone,
+        'tokens_used': row.tokens_used,
+        'prompt_tokens': row.prompt_tokens,
+        'prompt_cache_hit_tokens': row.prompt_cache_hit_tokens,
+        'packed_tokens': row.packed_tokens,
+        'cost_usd': str(row.cost_usd) if row.cost_usd is not None else None,
+        'duration_seconds': row.duration_seconds,
+        'metadata': row.metadata,
+    }
+
+
+class RequestLogBuffer:
+    """
+    Bounded queue of AIRequest rows written in batches by a daemon thread.
+
+    Args:
+        batch_size: Rows per bulk_create (a full batch flushes immediately)
+        flush_interval: Seconds a row may wait for its batch to fill
+        max_size: Rows held before new ones are dropped
+        mode: 'buffer' (bulk_create here) or 'celery' (hand batches to a task)
+    """
+
+    def __init__(self, batch_size=100, flush_interval=2.0, max_size=10000, mode='buffer'):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_size = max_size
+        self.mode = mode
+        self.dropped = 0
+        self._pid = None
+        self._queue = None
+        self._wake = None
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+
+    def _ensure_started(self):
+        # Forked workers inherit neither the thread nor a usable queue
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            self._queue = queue.Queue(maxsize=self.max_size)
+            self._wake = threading.Event()
+            self._thread = threading.Thread(target=self._run, name='ai-request-log', daemon=True)
+            self._pid = os.getpid()
+            self._thread.start()
+
+    def log(self, row):
+        """Queue an unsaved AIRequest; returns False if it was shed."""
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            self.dropped += 1
+            if self.dropped % 1000 == 1:
+                print(f"AI request log full ({self.max_size} rows), {self.dropped} rows dropped so far")
+            return False
+        if self._queue.qsize() >= self.batch_size:
+            self._wake.set()
+        return True
+
+    def pending(self):
+        return self._queue.qsize() if self._pid == os.getpid() else 0
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def flush(self):
+        """Write everything queued so far from the calling thread."""
+        if self._pid != os.getpid():
+            return
+        # Rows stay queued until taken under the lock, so a flush at shutdown
+        # never misses a batch the background thread is still assembling
+        with self._write_lock:
+            while True:
+                rows = []
+                while len(rows) < self.batch_size:
+                    try:
+                        rows.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                if not rows:
+                    return
+                self._write(rows)
+
+    def _write(self, rows):
+        try:
+            if self.mode == 'celery':
+                from .tasks import write_ai_requests
+                write_ai_requests.delay([serialize_row(row) for row in rows])
+            else:
+                close_old_connections()
+                write_requests(rows)
+                update_rollups()
+        except Exception as e:
+            print(f"Error writing {len(rows)} AI request log rows: {e}")
+
+
+request_log = RequestLogBuffer(
+    batch_size=settings.AI_REQUEST_LOG_BATCH_SIZE,
+    flush_interval=settings.AI_REQUEST_LOG_FLUSH_INTERVAL,
+    max_size=settings.AI_REQUEST_LOG_MAX_SIZE,
+    mode=settings.AI_REQUEST_LOG_MODE,
+)
+
+
+def log_request(**fields):
+    """Record a completion; see AIRequest for the fields."""
+    row = request_row(**fields)
+    if request_log.mode == 'sync':
+        write_requests([row])
+    else:
+        request_log.log(row)
+
+
+def flush_request_log(**kwargs):
+    request_log.flush()
+
+
+atexit.register(flush_request_log)
+worker_shutdown.connect(flush_request_log, weak=False)
+worker_process_shutdown.connect(flush_request_log, weak=False)
@@ -0,0 +1,297 @@
+"""
+Resilient LLM provider calls: deadlines, retries, hedging and a circuit breaker.
+
+``provider.call(attempt, mode)`` runs ``attempt(deadline)`` (one provider
+request; ``deadline`` is a time.monotonic() value to derive the request
+timeout from with ``time_left``) under the policy for ``mode``:
+
+- A per-mode deadline (``settings.AI_PROVIDER_DEADLINES``) bounds the whole
+  call, retries included; DeadlineExceeded once it has passed.
+- Timeouts, connection errors, 429s and 5xx are retried up to
+  ``AI_PROVIDER_MAX_RETRIES`` times with jittered exponential backoff.
+  Other errors (bad request, auth) are raised at once.
+- A second, hedged request is sent if the first has not answered after the
+  mode's recent p95 latency; the first answer wins. Hedging starts once
+  HEDGE_MIN_SAMPLES latencies have been seen for the mode; only calls that
+  may be hedged are sampled, so stream openings and background jobs do not
+  skew a mode's threshold.
+- A circuit breaker opens after ``AI_CIRCUIT_FAILURE_THRESHOLD`` consecutive
+  retryable failures and fails calls with ProviderUnavailable for
+  ``AI_CIRCUIT_RESET_SECONDS``, then lets one probe request through.
+
+State (breaker, latency samples, counters) is per process.
+"""
+import time
+import random
+import asyncio
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import openai
+from django.conf import settings
+
+
+RETRYABLE_ERRORS = (
+    openai.APIConnectionError,  # Includes APITimeoutError
+    openai.RateLimitError,
+    openai.InternalServerError,
+    TimeoutError,
+)
+
+# Latency samples kept per mode, and how many are needed before hedging
+LATENCY_WINDOW = 200
+HEDGE_MIN_SAMPLES = 20
+
+# Never hedge sooner than this (seconds)
+HEDGE_MIN_DELAY = 0.5
+
+BACKOFF_MAX = 8.0
+
+# Threads running first attempts while a hedge is in flight
+HEDGE_WORKERS = 32
+
+
+class ProviderUnavailable(Exception):
+    """The circuit breaker is open."""
+
+
+class DeadlineExceeded(Exception):
+    """The mode's deadline passed before the provider answered."""
+
+
+def is_retryable(exc):
+    return isinstance(exc, RETRYABLE_ERRORS)
+
+
+def time_left(deadline):
+    """Seconds until ``deadline`` (at least a millisecond, for client timeouts)."""
+    return max(0.001, deadline - time.monotonic())
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker.
+
+    closed -> open after ``failure_threshold`` failures in a row; open ->
+    half_open after ``reset_timeout`` seconds, letting a single probe
+    through; the probe's outcome closes or re-opens it. A probe that never
+    reports back is replaced after another ``reset_timeout``.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = None
+        self.lock = threading.Lock()
+
+    def allow(self):
+        """Whether a request may be sent now."""
+        with self.lock:
+            if self.state == 'closed':
+                return True
+            if time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = 'half_open'
+                self.opened_at = time.monotonic()
+                return True
+            return False
+
+    def record_success(self):
+        with self.lock:
+            self.state = 'closed'
+            self.failures = 0
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.state == 'half_open' or self.failures >= self.failure_threshold:
+                self.state = 'open'
+                self.opened_at = time.monotonic()
+
+    def snapshot(self):
+        with self.lock:
+            return {'state': self.state, 'consecutive_failures': self.failures}
+
+
+class ResilientProvider:
+    """
+    Applies the deadline, retry, hedging and breaker policy to provider calls.
+
+    Args:
+        breaker: CircuitBreaker shared by all modes
+        deadlines: Dict of mode -> seconds ('default' for the rest)
+        max_retries: Retries after the first attempt
+        backoff: Base backoff in seconds (doubled per retry, full jitter)
+        hedge: Send hedged requests at all
+    """
+
+    def __init__(self, breaker, deadlines, max_retries=2, backoff=0.5, hedge=True):
+        self.breaker = breaker
+        self.deadlines = deadlines
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.hedge = hedge
+        self.latencies = {}
+        self.counters = dict.fromkeys(
+            ('calls', 'retries', 'hedges', 'hedge_wins', 'rejected', 'deadline_exceeded', 'failed'), 0
+        )
+        self.lock = threading.Lock()
+        self._executor = None
+
+    def _count(self, name):
+        with self.lock:
+            self.counters[name] += 1
+
+    def deadline(self, mode):
+        return self.deadlines.get(mode, self.deadlines['default'])
+
+    def record_latency(self, mode, seconds):
+        with self.lock:
+            self.latencies.setdefault(mode, deque(maxlen=LATENCY_WINDOW)).append(seconds)
+
+    def p95(self, mode):
+        with self.lock:
+            samples = sorted(self.latencies.get(mode, ()))
+        if len(samples) < HEDGE_MIN_SAMPLES:
+            return None
+        return samples[int(0.95 * (len(samples) - 1))]
+
+    def hedge_delay(self, mode, hedge):
+        if not (hedge and self.hedge):
+            return None
+        p95 = self.p95(mode)
+        return max(p95, HEDGE_MIN_DELAY) if p95 is not None else None
+
+    def _backoff(self, retry, deadline):
+        delay = random.uniform(0, min(BACKOFF_MAX, self.backoff * 2 ** retry))
+        if time.monotonic() + delay >= deadline:
+            return None
+        return delay
+
+    def _start(self, mode):
+        self._count('calls')
+        if not self.breaker.allow():
+            self._count('rejected')
+            raise ProviderUnavailable('AI provider circuit is open')
+        return time.monotonic() + self.deadline(mode)
+
+    def _failed(self, exc, retry, deadline):
+        """Record a failed attempt; returns the backoff delay, or raises if done."""
+        if not is_retryable(exc):
+            if isinstance(exc, openai.APIStatusError):
+                # The provider answered (bad request, auth): it is up
+                self.breaker.record_success()
+            raise exc
+        self.breaker.record_failure()
+        if time.monotonic() >= deadline:
+            self._count('deadline_exceeded')
+            raise DeadlineExceeded(f'Provider did not answer before the deadline ({exc})') from exc
+        delay = self._backoff(retry, deadline) if retry < self.max_retries else None
+        if delay is None or self.breaker.snapshot()['state'] != 'closed':
+            self._count('failed')
+            raise exc
+        self._count('retries')
+        return delay
+
+    def call(self, attempt, mode='default', hedge=True):
+        """Run ``attempt(deadline)`` under the policy for ``mode``; returns its result."""
+        deadline = self._start(mode)
+        for retry in range(self.max_retries + 1):
+            try:
+                start = time.monotonic()
+                result = self._hedged(attempt, deadline, self.hedge_delay(mode, hedge))
+            except Exception as exc:
+                time.sleep(self._failed(exc, retry, deadline))
+                continue
+            if hedge:
+                self.record_latency(mode, time.monotonic() - start)
+            self.breaker.record_success()
+            return result
+
+    def _hedged(self, attempt, deadline, hedge_after):
+        if hedge_after is None or time.monotonic() + hedge_after >= deadline:
+            return attempt(deadline)
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=HEDGE_WORKERS, thread_name_prefix='llm-hedge')
+        first = self._executor.submit(attempt, deadline)
+        done, _ = wait({first}, timeout=hedge_after)
+        if done:
+            return first.result()
+        self._count('hedges')
+        hedge = self._executor.submit(attempt, deadline)
+        pending = {first, hedge}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is hedge:
+                        self._count('hedge_wins')
+                    # The loser finishes in the background; its answer is dropped
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    async def acall(self, attempt, mode='default', hedge=True):
+        """Async call(); ``attempt(deadline)`` is a coroutine function."""
+        deadline = self._start(mode)
+        for retry in range(self.max_retries + 1):
+            try:
+                start = time.monotonic()
+                result = await self._ahedged(attempt, deadline, self.hedge_delay(mode, hedge))
+            except Exception as exc:
+                await asyncio.sleep(self._failed(exc, retry, deadline))
+                continue
+            if hedge:
+                self.record_latency(mode, time.monotonic() - start)
+            self.breaker.record_success()
+            return result
+
+    async def _ahedged(self, attempt, deadline, hedge_after):
+        if hedge_after is None or time.monotonic() + hedge_after >= deadline:
+            return await attempt(deadline)
+        first = asyncio.ensure_future(attempt(deadline))
+        done, _ = await asyncio.wait({first}, timeout=hedge_after)
+        if done:
+            return first.result()
+        self._count('hedges')
+        hedge = asyncio.ensure_future(attempt(deadline))
+        pending = {first, hedge}
+        error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            self._count('hedge_wins')
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def snapshot(self):
+        """Counters, breaker state and hedge thresholds for this process."""
+        with self.lock:
+            counters = dict(self.counters)
+            modes = list(self.latencies)
+        return {
+            **counters,
+            'breaker': self.breaker.snapshot(),
+            'p95_seconds': {mode: self.p95(mode) for mode in modes},
+        }
+
+
+provider = ResilientProvider(
+    breaker=CircuitBreaker(
+        failure_threshold=settings.AI_CIRCUIT_FAILURE_THRESHOLD,
+        reset_timeout=settings.AI_CIRCUIT_RESET_SECONDS,
+    ),
+    deadlines=settings.AI_PROVIDER_DEADLINES,
+    max_retries=settings.AI_PROVIDER_MAX_RETRIES,
+    backoff=settings.AI_PROVIDER_BACKOFF,
+    hedge=settings.AI_PROVIDER_HEDGE,
+)
@@ -0,0 +1,104 @@
+"""
+Canonical cache keys for AI completions.
+
+Hashing the rendered prompt misses whenever wording, history or passage
+order changes, even though the answer would be the same. Instead, a chat
+turn is keyed by its normalized intent: the prompt mode, focused country,
+doc types, the identity and version of every retrieved chunk, tone, and the
+question reduced to a sorted set of content terms. Editing a document
+changes its chunk hashes, so stale answers are never served.
+
+Optionally (``settings.AI_CACHE_NEAR_DUPLICATES``), a question that misses
+can reuse the cached answer of an earlier question with the same intent
+whose terms overlap above ``settings.AI_CACHE_NEAR_DUPLICATE_THRESHOLD``
+(Jaccard similarity).
+"""
+import hashlib
+import json
+from django.conf import settings
+from django.core.cache import caches
+from countries.search import query_terms
+from . import metrics
+from .completion_cache import completion_cache
+
+
+NEAR_DUPLICATE_PREFIX = 'ai:neardup:'
+# Questions remembered per intent bucket for near-duplicate matching
+NEAR_DUPLICATE_ENTRIES = 50
+
+
+def normalize_question(text):
+    """Sorted, de-duplicated content terms, with simple plurals folded."""
+    terms = set()
+    for term in query_terms(text):
+        if len(term) > 3 and term.endswith('s') and not term.endswith('ss'):
+            term = term[:-1]
+        terms.add(term)
+    return sorted(terms)
+
+
+def _hash(value):
+    return hashlib.md5(json.dumps(value, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def jaccard(a, b):
+    a, b = set(a), set(b)
+    return len(a & b) / len(a | b) if a or b else 1.0
+
+
+def canonical_key(mode, question='', **intent):
+    """
+    Cache key for a completion from its normalized intent.
+
+    Args:
+        mode: Prompt mode (selects the TTL as well)
+        question: Free-text question, normalized with normalize_question()
+        **intent: Everything else the answer depends on (country, doc
+            types, chunk keys, tone, ...); lists are order-insensitive
+
+    Returns:
+        Hex digest (completion_cache adds its prefix)
+    """
+    return _hash([_bucket(mode, intent), normalize_question(question)])
+
+
+def _bucket(mode, intent):
+    """Hash of everything but the question; near duplicates must share it."""
+    normalized = {
+        name: sorted(value) if isinstance(value, (list, tuple, set)) else value
+        for name, value in intent.items()
+    }
+    return _hash([mode, normalized])
+
+
+def resolve_key(mode, question='', **intent):
+    """
+    canonical_key(), or the key of a cached near-duplicate question.
+
+    With near-duplicate matching enabled, the question is also remembered
+    under its intent bucket so later paraphrases can find it.
+    """
+    terms = normalize_question(question)
+    bucket = _bucket(mode, intent)
+    key = _hash([bucket, terms])
+    if not settings.AI_CACHE_NEAR_DUPLICATES or not terms or completion_cache.has(key):
+        return key
+
+    backend = caches[completion_cache.alias]
+    entries = backend.get(NEAR_DUPLICATE_PREFIX + bucket) or []
+    threshold = settings.AI_CACHE_NEAR_DUPLICATE_THRESHOLD
+    for similarity, other_terms, other_key in sorted(
+        ((jaccard(terms, t), t, k) for t, k in entries), reverse=True
+    ):
+        if similarity < threshold:
+            break
+        if completion_cache.has(other_key):
+            metrics.incr('near_duplicate_hits', mode)
+            return other_key
+
+    entries = [(t, k) for t, k in entries if k != key] + [(terms, key)]
+    backend.set(
+        NEAR_DUPLICATE_PREFIX + bucket, entries[-NEAR_DUPLICATE_ENTRIES:],
+        timeout=completion_cache.ttl(mode)
+    )
+    return key
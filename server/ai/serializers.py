@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from .models import PromptTemplate, AIRequest
+from .services import MAX_COMPARE_COUNTRIES
 
 
 class PromptTemplateSerializer(serializers.ModelSerializer):
@@ -26,18 +27,39 @@ class AIChatRequestSerializer(serializers.Serializer):
         child=serializers.DictField(),
         required=False,
         default=list,
-        help_text="Previous messages in the conversation for context"
+        help_text="Previous messages, only used to seed a new conversation"
+    )
+    conversation_id = serializers.IntegerField(
+        required=False,
+        allow_null=True,
+        help_text="Stored conversation to continue; history is loaded server-side"
     )
-    conversation_id = serializers.IntegerField(required=False, allow_null=True)
 
 
 class AICompareRequestSerializer(serializers.Serializer):
-    """Serializer for country comparison requests."""
-    left = serializers.CharField(required=True, help_text="Country code")
-    right = serializers.CharField(required=True, help_text="Country code")
+    """Serializer for country comparison requests (2-5 countries)."""
+    countries = serializers.ListField(
+        child=serializers.CharField(),
+        required=False,
+        min_length=2,
+        max_length=MAX_COMPARE_COUNTRIES,
+        help_text="Country codes"
+    )
+    left = serializers.CharField(required=False, help_text="Country code (two-country form)")
+    right = serializers.CharField(required=False, help_text="Country code (two-country form)")
     metrics = serializers.ListField(
         child=serializers.CharField(),
         required=False,
         default=['cost', 'pr_time', 'job_market', 'quality_of_life']
     )
-    user_profile = serializers.JSONField(required=False, default=dict)
\ No newline at end of file
+    user_profile = serializers.JSONField(required=False, default=dict)
+    
+    def validate(self, data):
+        codes = data.get('countries') or [data[side] for side in ('left', 'right') if data.get(side)]
+        codes = list(dict.fromkeys(code.upper() for code in codes))
+        if not 2 <= len(codes) <= MAX_COMPARE_COUNTRIES:
+            raise serializers.ValidationError(
+                f"Provide 2 to {MAX_COMPARE_COUNTRIES} different countries (or left and right)."
+            )
+        data['countries'] = codes
+        return data
\ No newline at end of file
@@ -5,14 +5,29 @@ import hashlib
 import json
 import re
 import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from decimal import Decimal
 from jinja2 import Template
 from django.conf import settings
-from django.core.cache import cache
+from django.db import connection
 from django.db.models import Q
-from openai import OpenAI  # DeepSeek uses OpenAI-compatible API
-from .models import PromptTemplate, AIRequest
-from .prompt_templates import get_system_prompt, SAFETY_RULES
+from asgiref.sync import sync_to_async
+from openai import OpenAI, AsyncOpenAI  # DeepSeek uses OpenAI-compatible API
+from .models import PromptTemplate, ConversationMessage
+from .prompt_templates import get_system_prompt, get_country_prompt
+from .country_matcher import get_country_matcher
+from .fake_llm import FakeLLMClient, AsyncFakeLLMClient, FaultPlan
+from .completion_cache import completion_cache
+from .semantic_cache import resolve_key
+from .request_log import log_request
+from .dispatcher import llm_dispatcher
+from .context_packer import Segment, pack_context, context_budget
+from .tokenizer import count_tokens
+from .resilience import provider, time_left, ProviderUnavailable
+from .prefilter import route_message
+from core.utils import get_data_version
+from . import metrics
 
 
 # Personality definitions
@@ -35,6 +50,118 @@ TONE_INSTRUCTIONS = {
 }
 
 
+PROVIDER_ERROR_ANSWER = 'Sorry, I encountered an error processing your request.'
+PROVIDER_DOWN_ANSWER = 'The AI service is temporarily unavailable. Please try again in a minute.'
+
+
+def prompt_cache_hit_tokens(usage):
+    """
+    Prompt tokens the provider served from its context cache, or None if
+    the usage does not say (DeepSeek: prompt_cache_hit_tokens; OpenAI:
+    prompt_tokens_details.cached_tokens).
+    """
+    if usage is None:
+        return None
+    hit = getattr(usage, 'prompt_cache_hit_tokens', None)
+    if hit is None:
+        details = getattr(usage, 'prompt_tokens_details', None)
+        hit = getattr(details, 'cached_tokens', None)
+    return hit
+
+
+def _provider_error(e):
+    """Result dict for a failed provider call."""
+    return {
+        'error': str(e),
+        'answer': PROVIDER_DOWN_ANSWER if isinstance(e, ProviderUnavailable) else PROVIDER_ERROR_ANSWER,
+        'cached': False
+    }
+
+
+# Default retrieved-context budget (tokens) for retrieve_documents(); chat
+# and compare size theirs from the mode's prompt budget (context_packer)
+RAG_TOKEN_BUDGET = 1200
+
+# Conversation turns offered to the context packer
+HISTORY_TURNS = 6
+# Share of the flexible chat budget kept for history
+HISTORY_SHARE = 0.25
+
+# RAG-enhanced chat template: the country's documents first (shared by
+# everyone asking about it), then the per-user tail
+CHAT_TEMPLATE = """{% if has_context %}
+I have access to the following official immigration information to help answer the question:
+
+{{retrieved_documents}}
+
+---
+{% endif %}
+
+{{personality_intro}}
+
+{{tone_instructions}}
+
+{% if has_conversation_context %}
+Previous conversation context:
+{{conversation_context}}
+
+---
+{% endif %}
+
+{% if focused_country %}
+The user is asking about: {{focused_country}}
+{% endif %}
+
+User's current question: {{message}}
+
+{% if has_context %}
+Based on the official information above and our conversation, provide a helpful response. Be specific and focus on the country we've been discussing ({{focused_country}}). If the documents don't fully answer the question, acknowledge what's known and what requires further research.
+{% else %}
+Provide general guidance, but remind the user that for specific country information, they should specify which country they're interested in. Be helpful but acknowledge uncertainty without specific data.
+{% endif %}
+
+Response:"""
+
+# Countries per comparison, and the longest fact sheet extracted for each
+MAX_COMPARE_COUNTRIES = 5
+FACT_SHEET_MAX_TOKENS = 400
+FACT_SHEET_QUERY = "general overview work study immigration"
+
+# Map step of a comparison: one country's documents condensed to the
+# requested metrics. Not user-specific, so every comparison including the
+# country with the same metrics shares it.
+FACT_SHEET_TEMPLATE = """Extract an immigration fact sheet for {{country}} from the documents below.
+
+Cover, as short bullet points under a bold label each: {{metrics|join(', ')}}.
+Use only facts stated in the documents and write "Not covered" for a topic they do not address. Do not make recommendations.
+
+{{retrieved_documents}}
+
+---
+
+Fact sheet for {{country}}:"""
+
+# Reduce step: instructions, then the fact sheets in code order (so every
+# ordering of the same countries renders the same prompt), then the request
+COMPARE_TEMPLATE = """You are comparing {{countries|length}} countries for immigration purposes.
+
+Provide a balanced, structured comparison with:
+1. Key pros and cons for each country
+2. Which is better for different scenarios (career, family, cost, lifestyle)
+3. A summary recommendation
+
+Base the comparison on the fact sheets below and cite them where relevant.
+
+{% for code, sheet in country_blocks %}
+**Fact sheet for {{code}}:**
+{{sheet}}
+
+{% endfor %}
+---
+
+Compare {{countries|join(' vs ')}} focusing on: {{metrics|join(', ')}}."""
+
+
 class AIService:
     """
     Service class for AI operations with caching and personality support.
@@ -42,10 +169,39 @@ class AIService:
     
     def __init__(self):
         # DeepSeek uses OpenAI-compatible API
-        self.client = OpenAI(
-            api_key=settings.DEEPSEEK_API_KEY,
-            base_url=settings.DEEPSEEK_BASE_URL
-        ) if settings.DEEPSEEK_API_KEY else None
+        if settings.AI_FAKE_LLM:
+            faults = FaultPlan(
+                error_rate=settings.AI_FAKE_LLM_ERROR_RATE,
+                slow_rate=settings.AI_FAKE_LLM_SLOW_RATE,
+                slow_latency=settings.AI_FAKE_LLM_SLOW_LATENCY,
+                outage=settings.AI_FAKE_LLM_OUTAGE
+            )
+            self.client = FakeLLMClient(
+                first_token_latency=settings.AI_FAKE_LLM_FIRST_TOKEN_LATENCY,
+                token_latency=settings.AI_FAKE_LLM_TOKEN_LATENCY,
+                faults=faults
+            )
+            self.async_client = AsyncFakeLLMClient(
+                first_token_latency=settings.AI_FAKE_LLM_FIRST_TOKEN_LATENCY,
+                token_latency=settings.AI_FAKE_LLM_TOKEN_LATENCY,
+                faults=faults
+            )
+        elif settings.DEEPSEEK_API_KEY:
+            # Retries and timeouts are handled by ai.resilience, not the client
+            self.client = OpenAI(
+                api_key=settings.DEEPSEEK_API_KEY,
+                base_url=settings.DEEPSEEK_BASE_URL,
+                max_retries=0
+            )
+            # Async client for ASGI views - many in-flight calls per process
+            self.async_client = AsyncOpenAI(
+                api_key=settings.DEEPSEEK_API_KEY,
+                base_url=settings.DEEPSEEK_BASE_URL,
+                max_retries=0
+            )
+        else:
+            self.client = None
+            self.async_client = None
         self.model = settings.DEEPSEEK_MODEL
     
     def _render_prompt(self, template_text, context):
@@ -54,40 +210,23 @@ class AIService:
         return template.render(**context)
     
     def _get_cache_key(self, prompt_text):
-        """Generate cache key from prompt text."""
-        prompt_hash = hashlib.md5(prompt_text.encode()).hexdigest()
-        return f"ai:completion:{prompt_hash}"
+        """Generate cache key from prompt text (completion_cache adds the prefix)."""
+        return hashlib.md5(prompt_text.encode()).hexdigest()
     
-    def _calculate_cost(self, tokens_used):
+    def _calculate_cost(self, tokens_used, cache_hit_tokens=0):
         """Calculate approximate cost based on tokens (DeepSeek pricing)."""
         # DeepSeek: ~$0.14 per 1M input tokens, ~$0.28 per 1M output tokens
         # Simplified: average ~$0.21 per 1M tokens (much cheaper than OpenAI!)
-        return Decimal(tokens_used * 0.00000021)
+        # Prompt-cache hits are billed at ~$0.014 per 1M instead of $0.14
+        return Decimal(tokens_used * 0.00000021 - cache_hit_tokens * 0.000000126)
     
-    def complete(self, template_name=None, template_text=None, context=None, 
-                 use_cache=True, session_id=None, user=None):
+    def _prepare_completion(self, template_name=None, template_text=None, context=None):
         """
-        Generate AI completion with personality support.
+        Resolve the template, render the prompt and build the API request.
         
-        Args:
-            template_name: Name of PromptTemplate to use
-            template_text: Raw template text (if not using template_name)
-            context: Dictionary of context variables
-            use_cache: Whether to use cached responses
-            session_id: Session ID for anonymous users
-            user: User object for authenticated users
-        
-        Returns:
-            dict with 'answer', 'tokens_used', 'cached', etc.
+        Returns a dict describing the call, or a dict with 'error'.
         """
-        if not self.client:
-            return {
-                'error': 'DeepSeek API key not configured',
-                'answer': 'AI service is currently unavailable.',
-                'cached': False
-            }
-        
-        context = context or {}
+        context = context if context is not None else {}
         
         # Get template if name provided
         prompt_template = None
@@ -111,126 +250,280 @@ class AIService:
         # Render prompt
         prompt_text = self._render_prompt(template_text, context)
         
-        # Check cache
-        cache_key = self._get_cache_key(prompt_text)
-        if use_cache:
-            cached_response = cache.get(cache_key)
-            if cached_response:
-                return {
-                    **cached_response,
-                    'cached': True
-                }
+        # Static system prompt with safety rules, then the country block, so
+        # the provider can serve both from its prefix cache
+        system_prompt = get_system_prompt(context.get('context_type', 'base'))
+        if context.get('country_name'):
+            country_prompt = get_country_prompt(context['country_name'], context.get('data_confidence', 'low'))
+            prompt_text = f"{country_prompt}\n\n{prompt_text}"
         
-        # Make API call
-        start_time = time.time()
-        try:
-            # Build context-aware system prompt with safety rules
-            system_prompt = get_system_prompt(
-                context_type=context.get('context_type', 'base'),
-                country_name=context.get('country_name', 'the destination country'),
-                data_confidence=context.get('data_confidence', 'low')
-            )
-            
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
+        return {
+            'prompt_template': prompt_template,
+            'prompt_text': prompt_text,
+            'packed_tokens': count_tokens(system_prompt) + count_tokens(prompt_text),
+            'mode': prompt_template.mode if prompt_template else context.get('mode', 'general'),
+            # Callers that know the intent supply a canonical key (semantic_cache)
+            'cache_key': context.get('cache_key') or self._get_cache_key(prompt_text),
+            'context': context,
+            'request': {
+                'model': self.model,
+                'messages': [
                     {"role": "system", "content": system_prompt},
                     {"role": "user", "content": prompt_text}
                 ],
-                temperature=temperature,
-                max_tokens=max_tokens
-            )
-            
-            duration = time.time() - start_time
-            answer = response.choices[0].message.content
-            tokens_used = response.usage.total_tokens
-            cost = self._calculate_cost(tokens_used)
-            
+                'temperature': temperature,
+                'max_tokens': max_tokens,
+            },
+        }
+    
+    def _finish_completion(self, call, answer, usage, duration, session_id, user):
+        """Build the result for a finished completion and log the request."""
+        tokens_used = usage.total_tokens if usage else 0
+        prompt_tokens = usage.prompt_tokens if usage else None
+        cache_hit_tokens = prompt_cache_hit_tokens(usage)
+        cost = self._calculate_cost(tokens_used, cache_hit_tokens or 0)
+        
+        result = {
+            'answer': answer,
+            'tokens_used': tokens_used,
+            'prompt_cache_hit_tokens': cache_hit_tokens,
+            'cost_usd': float(cost),
+            'duration_seconds': duration,
+            'cached': False
+        }
+        
+        # Log the request (written in batches off the request path)
+        log_request(
+            session_id=session_id or '',
+            user=user,
+            prompt_template=call['prompt_template'],
+            prompt_text=call['prompt_text'],
+            response_text=answer,
+            model_used=self.model,
+            mode=call['mode'],
+            tone=call['context'].get('tone', ''),
+            tokens_used=tokens_used,
+            prompt_tokens=prompt_tokens,
+            prompt_cache_hit_tokens=cache_hit_tokens,
+            packed_tokens=call['packed_tokens'],
+            cost_usd=cost,
+            duration_seconds=duration,
+            metadata=call['context']
+        )
+        
+        return result
+    
+    def complete(self, template_name=None, template_text=None, context=None, 
+                 use_cache=True, session_id=None, user=None, stream=False,
+                 priority='interactive'):
+        """
+        Generate AI completion with personality support.
+        
+        Args:
+            template_name: Name of PromptTemplate to use
+            template_text: Raw template text (if not using template_name)
+            context: Dictionary of context variables; a 'cache_key' entry
+                replaces the default key (a hash of the rendered prompt)
+            use_cache: Whether to use cached responses
+            session_id: Session ID for anonymous users
+            user: User object for authenticated users
+            stream: Return a generator of events instead of a single result
+            priority: Dispatcher class for the provider call ('interactive',
+                'roadmap' or 'batch'; see ai/dispatcher.py)
+        
+        Returns:
+            dict with 'answer', 'tokens_used', 'cached', etc. When streaming,
+            a generator yielding {'type': 'token', 'content': ...} events and a
+            final {'type': 'done', ...} event carrying the same result dict.
+        """
+        if not self.client:
             result = {
-                'answer': answer,
-                'tokens_used': tokens_used,
-                'cost_usd': float(cost),
-                'duration_seconds': duration,
+                'error': 'DeepSeek API key not configured',
+                'answer': 'AI service is currently unavailable.',
                 'cached': False
             }
-            
-            # Cache the response
+            return self._single_event_stream(result) if stream else result
+        
+        call = self._prepare_completion(template_name, template_text, context)
+        if 'error' in call:
+            return self._single_event_stream(call) if stream else call
+        call['priority'] = priority
+        
+        if stream:
+            # Streams are not single-flighted, so check the cache up front
             if use_cache:
-                cache.set(cache_key, result, timeout=3600)  # 1 hour
-            
-            # Log the request
-            AIRequest.objects.create(
-                session_id=session_id or '',
-                user=user,
-                prompt_template=prompt_template,
-                prompt_text=prompt_text,
-                response_text=answer,
-                model_used=self.model,
-                tokens_used=tokens_used,
-                cost_usd=cost,
-                duration_seconds=duration,
-                metadata=context
+                cached_response = completion_cache.get(call['cache_key'])
+                if cached_response:
+                    metrics.record_lookup(call['mode'], cached_response, True)
+                    return self._single_event_stream({**cached_response, 'cached': True})
+            return self._stream_completion(call, use_cache, session_id, user)
+        
+        if not use_cache:
+            return self._call_provider(call, session_id, user)
+        
+        # Cache check and single flight: concurrent identical prompts share one API call
+        result, cached = completion_cache.get_or_compute(
+            call['cache_key'], lambda: self._call_provider(call, session_id, user), mode=call['mode']
+        )
+        metrics.record_lookup(call['mode'], result, cached)
+        return {**result, 'cached': True} if cached else result
+    
+    def _call_provider(self, call, session_id, user):
+        """
+        Make the API call under the resilience policy for the call's mode
+        (each attempt waits for a dispatcher slot) and log it.
+        """
+        def attempt(deadline):
+            with llm_dispatcher.slot(call['priority']):
+                start_time = time.time()
+                response = self.client.chat.completions.create(
+                    **call['request'], timeout=time_left(deadline)
+                )
+            return response, time.time() - start_time
+        
+        try:
+            # Hedged second requests only where a user is waiting
+            response, duration = provider.call(
+                attempt, call['mode'], hedge=call['priority'] == 'interactive'
             )
+            answer = response.choices[0].message.content
             
-            return result
+            return self._finish_completion(
+                call, answer, response.usage, duration, session_id, user
+            )
             
         except Exception as e:
+            return _provider_error(e)
+    
+    async def acomplete(self, template_name=None, template_text=None, context=None,
+                        use_cache=True, session_id=None, user=None, priority='interactive'):
+        """
+        Async version of complete() using the async provider client.
+        
+        The event loop is only blocked for prompt rendering; database and
+        cache access run in the sync_to_async thread.
+        """
+        if not self.async_client:
             return {
-                'error': str(e),
-                'answer': 'Sorry, I encountered an error processing your request.',
+                'error': 'DeepSeek API key not configured',
+                'answer': 'AI service is currently unavailable.',
                 'cached': False
             }
+        
+        if template_name:
+            call = await sync_to_async(self._prepare_completion)(template_name, template_text, context)
+        else:
+            call = self._prepare_completion(template_text=template_text, context=context)
+        if 'error' in call:
+            return call
+        call['priority'] = priority
+        
+        if not use_cache:
+            return await self._acall_provider(call, session_id, user)
+        
+        # Cache check and single flight, as in complete()
+        result, cached = await completion_cache.aget_or_compute(
+            call['cache_key'], lambda: self._acall_provider(call, session_id, user), mode=call['mode']
+        )
+        await sync_to_async(metrics.record_lookup)(call['mode'], result, cached)
+        return {**result, 'cached': True} if cached else result
+    
+    async def _acall_provider(self, call, session_id, user):
+        """Async _call_provider() using the async client."""
+        async def attempt(deadline):
+            async with llm_dispatcher.aslot(call['priority']):
+                start_time = time.time()
+                response = await self.async_client.chat.completions.create(
+                    **call['request'], timeout=time_left(deadline)
+                )
+            return response, time.time() - start_time
+        
+        try:
+            response, duration = await provider.acall(
+                attempt, call['mode'], hedge=call['priority'] == 'interactive'
+            )
+            answer = response.choices[0].message.content
+            
+            return await sync_to_async(self._finish_completion)(
+                call, answer, response.usage, duration, session_id, user
+            )
+            
+        except Exception as e:
+            return _provider_error(e)
+    
+    def _single_event_stream(self, result):
+        """Stream a result that is already complete (cache hit or error)."""
+        if result.get('answer') and 'error' not in result:
+            yield {'type': 'token', 'content': result['answer']}
+        yield {'type': 'done', **result}
+    
+    def _stream_completion(self, call, use_cache, session_id, user):
+        """
+        Stream tokens from the provider as they arrive.
+        
+        The cache entry and AIRequest log row are produced once the stream ends.
+        If another worker is already generating the same prompt, wait for
+        its cached result instead of making a second call.
+        """
+        token = completion_cache.acquire(call['cache_key']) if use_cache else None
+        if use_cache and token is None:
+            cached_response = completion_cache.wait(call['cache_key'])
+            if cached_response:
+                metrics.record_lookup(call['mode'], cached_response, True)
+                yield from self._single_event_stream({**cached_response, 'cached': True})
+                return
+        if use_cache:
+            metrics.record_lookup(call['mode'], None, False)
+        try:
+            yield from self._stream_provider(call, use_cache, session_id, user)
+        finally:
+            if token:
+                completion_cache.release(call['cache_key'], token)
+    
+    def _stream_provider(self, call, use_cache, session_id, user):
+        parts = []
+        usage = None
+        try:
+            # The slot is held until the stream is fully read
+            with llm_dispatcher.slot(call['priority']):
+                start_time = time.time()
+                # Retried until the stream opens; no retries once tokens were sent
+                response = provider.call(
+                    lambda deadline: self.client.chat.completions.create(
+                        **call['request'],
+                        stream=True,
+                        stream_options={'include_usage': True},
+                        timeout=time_left(deadline)
+                    ),
+                    call['mode'], hedge=False
+                )
+                for chunk in response:
+                    if chunk.usage:
+                        usage = chunk.usage
+                    if not chunk.choices:
+                        continue
+                    delta = chunk.choices[0].delta.content
+                    if delta:
+                        parts.append(delta)
+                        yield {'type': 'token', 'content': delta}
+        except Exception as e:
+            yield {'type': 'done', **_provider_error(e)}
+            return
+        
+        duration = time.time() - start_time
+        result = self._finish_completion(
+            call, ''.join(parts), usage, duration, session_id, user
+        )
+        if use_cache:
+            completion_cache.set(call['cache_key'], result, mode=call['mode'])
+        yield {'type': 'done', **result}
     
     def _extract_countries_from_message(self, message: str) -> list:
         """
         Extract country names or codes from user message.
         Returns list of country codes.
         """
-        from countries.models import Country
-        
-        message_lower = message.lower()
-        found_countries = []
-        
-        # Check for explicit country codes (3-letter) - use word boundaries
-        # Only match standalone codes, not codes within words
-        code_pattern = r'\b([A-Z]{3})\b'
-        codes = re.findall(code_pattern, message.upper())
-        # Filter out common words that look like country codes
-        excluded_codes = {'THE', 'AND', 'FOR', 'ARE', 'CAN', 'NOT', 'YOU', 'HAS', 'HIM', 'HER', 'ITS', 'OUR', 'WHO', 'ALL', 'ANY', 'GET', 'SET', 'USE', 'WAY', 'HOW', 'NOW', 'DAY', 'NEW', 'OLD', 'TRY', 'TWO', 'MAY', 'SAY', 'SEE', 'ASK', 'LET', 'PUT', 'END', 'TOO', 'OWN', 'RUN', 'OUT', 'OFF', 'GOT', 'DID', 'BIG', 'TOP', 'LOW', 'ADD', 'AGO', 'AIR'}
-        for code in codes:
-            if code not in excluded_codes and Country.objects.filter(code=code).exists():
-                found_countries.append(code)
-        
-        # Check for country names using word boundaries
-        countries = Country.objects.all()
-        for country in countries:
-            # Use word boundary to avoid matching "canada" in "canadian"
-            pattern = r'\b' + re.escape(country.name.lower()) + r'\b'
-            if re.search(pattern, message_lower):
-                if country.code not in found_countries:
-                    found_countries.append(country.code)
-        
-        # Common aliases with word boundary checks
-        aliases = {
-            r'\buk\b': 'GBR', 
-            r'\bunited kingdom\b': 'GBR', 
-            r'\bbritain\b': 'GBR', 
-            r'\bengland\b': 'GBR',
-            r'\busa\b': 'USA', 
-            r'\bu\.s\.a?\b': 'USA',
-            r'\bunited states\b': 'USA', 
-            r'\bamerica\b': 'USA',
-            r'\buae\b': 'ARE', 
-            r'\bemirates\b': 'ARE', 
-            r'\bdubai\b': 'ARE',
-            r'\bnz\b': 'NZL', 
-            r'\bnew zealand\b': 'NZL',
-        }
-        for pattern, code in aliases.items():
-            if re.search(pattern, message_lower) and code not in found_countries:
-                found_countries.append(code)
-        
-        return found_countries
+        return get_country_matcher().match(message)
     
     def _extract_doc_types_from_message(self, message: str) -> list:
         """
@@ -256,62 +549,189 @@ class AIService:
                         doc_types.append(doc_type)
                     break
         
-        # Default to overview if no specific type detected
+        # No keyword: infer from the closest chunks semantically (catches
+        # paraphrases like "can my wife come with me"). Only types backed by
+        # several neighbours count, so greetings and noise use the default.
+        if not doc_types:
+            from countries.vectors import search_vectors
+            hits = [hit['doc_type'] for hit in search_vectors(message, limit=5)]
+            doc_types = [t for t in dict.fromkeys(hits) if hits.count(t) >= 2]
+        
         if not doc_types:
             doc_types = ['overview', 'work', 'study']
         
         return doc_types
     
-    def retrieve_documents(self, message: str, country_code: str = None, max_docs: int = 5) -> list:
+    def retrieve_documents(self, message: str, country_code: str = None, max_docs: int = None,
+                           token_budget: int = RAG_TOKEN_BUDGET, doc_types: list = None) -> list:
         """
         Retrieve relevant documents for RAG based on user message.
         
+        Document chunks are ranked by fused full-text (BM25) and semantic
+        similarity to the message, restricted to the requested or mentioned
+        countries, and packed into a token budget. Falls back to the leading
+        chunk of the most trusted documents when nothing matches (chunked on
+        the fly for documents not yet chunked by rebuild_search_index).
+        
         Args:
             message: User's question/message
             country_code: Optional specific country code
-            max_docs: Maximum documents to retrieve
+            max_docs: Optional cap on the number of passages
+            token_budget: Maximum total tokens of retrieved content
+            doc_types: Doc types for the fallback, if the caller already
+                extracted them from the message
             
         Returns:
             List of document dicts with content and metadata
         """
-        from countries.models import CountryDocument
+        from countries.models import CountryDocumentChunk
+        from countries.retrieval import hybrid_search, pack_passages, document_prior
         
-        # Extract countries and doc types from message
+        # Extract countries from message
         country_codes = [country_code] if country_code else self._extract_countries_from_message(message)
-        doc_types = self._extract_doc_types_from_message(message)
         
-        # Build query - include all documents, prioritize reviewed ones
+        passages = hybrid_search(
+            message, country_codes=country_codes, token_budget=token_budget, max_passages=max_docs
+        )
+        if passages:
+            return [self._format_passage(p) for p in passages]
+        
+        # No match: use the old type-based selection
+        if doc_types is None:
+            doc_types = self._extract_doc_types_from_message(message)
+        
+        # Build query - include all documents
         query = Q()
         
         if country_codes:
-            query &= Q(country__code__in=country_codes)
+            query &= Q(document__country__code__in=country_codes)
         
         if doc_types:
-            query &= Q(doc_type__in=doc_types)
+            query &= Q(document__doc_type__in=doc_types)
         
-        # Retrieve documents - order by reviewed first, then by confidence
-        documents = CountryDocument.objects.filter(query).select_related(
-            'country', 'source'
-        ).order_by('needs_review', '-data_confidence', '-updated_at')[:max_docs]
+        # Leading chunk of each document, most trusted first
+        chunks = list(CountryDocumentChunk.objects.filter(query, chunk_index=0).select_related(
+            'document__country', 'document__source'
+        ).order_by('-document__updated_at')[:20])
+        if not chunks:
+            chunks = self._unindexed_leading_chunks(country_codes, doc_types)
+        scored = sorted(
+            ((document_prior(c.document), c) for c in chunks), key=lambda pair: pair[0], reverse=True
+        )
         
         # Format for context injection
-        retrieved = []
-        for doc in documents:
-            retrieved.append({
-                'country_code': doc.country.code,
-                'country_name': doc.country.name,
-                'doc_type': doc.doc_type,
-                'title': doc.title,
-                'content': doc.content[:3000],  # Limit content size
-                'confidence': doc.data_confidence,
-                'source': doc.source.name if doc.source else 'Unknown',
-                'last_updated': doc.updated_at.isoformat() if doc.updated_at else None,
-            })
+        return [
+            self._format_passage(p)
+            for p in pack_passages(scored, token_budget=token_budget, max_passages=max_docs)
+        ]
+    
+    def _unindexed_leading_chunks(self, country_codes, doc_types):
+        """
+        Leading chunk of documents that have not been chunked yet, chunked in
+        memory, so RAG keeps working until rebuild_search_index has run.
+        """
+        from countries.models import CountryDocument, CountryDocumentChunk
+        from countries.chunking import chunk_text
+        
+        documents = CountryDocument.objects.filter(chunks__isnull=True)
+        if country_codes:
+            documents = documents.filter(country__code__in=country_codes)
+        if doc_types:
+            documents = documents.filter(doc_type__in=doc_types)
+        documents = documents.select_related('country', 'source').order_by('-updated_at')[:20]
+        return [
+            CountryDocumentChunk(document=document, **chunks[0])
+            for document in documents
+            for chunks in [chunk_text(document.content)] if chunks
+        ]
+    
+    def retrieve_tiered(self, message: str, country_code: str = None,
+                        token_budget: int = RAG_TOKEN_BUDGET, doc_types: list = None) -> tuple:
+        """
+        Retrieve condensed country briefs first, and full document chunks
+        only when the question needs detail (see countries.briefs).
+        
+        ``doc_types`` are extracted from the message when not given; callers
+        that need them too pass them in so the extraction (which may run a
+        vector search) happens once per turn.
+        
+        Returns:
+            (documents, tier): documents in retrieve_documents() format,
+            briefs first; tier is 'brief', 'brief+chunks' or 'chunks'
+        """
+        from countries.briefs import get_briefs, needs_detail
         
-        return retrieved
+        briefs = []
+        if settings.AI_RAG_BRIEFS and country_code:
+            if doc_types is None:
+                doc_types = self._extract_doc_types_from_message(message)
+            briefs = [self._format_brief(brief) for brief in get_briefs(country_code, doc_types)]
+        if briefs and not needs_detail(message):
+            return briefs, 'brief'
+        
+        chunks = self.retrieve_documents(
+            message=message,
+            country_code=country_code,
+            token_budget=max(token_budget - sum(brief['tokens'] for brief in briefs), 0),
+            doc_types=doc_types
+        )
+        return briefs + chunks, 'brief+chunks' if briefs else 'chunks'
+    
+    def _format_brief(self, brief):
+        """Format a CountryBrief like a retrieved passage."""
+        from countries.chunking import content_hash
+        from countries.models import CountryDocument
+        topic = dict(CountryDocument.DOC_TYPE_CHOICES).get(brief.doc_type, 'Immigration')
+        return {
+            'country_code': brief.country.code,
+            'country_name': brief.country.name,
+            'doc_type': brief.doc_type,
+            'title': f"{topic} Brief",
+            'section': '',
+            'content': brief.content,
+            'tokens': brief.token_count,
+            'confidence': brief.data_confidence,
+            'source': brief.sources or 'Unknown',
+            'last_updated': brief.updated_at.isoformat() if brief.updated_at else None,
+            'score': None,
+            # Changes whenever the brief is regenerated
+            'chunk_keys': [f'brief:{brief.pk}:{content_hash(brief.content)[:12]}'],
+        }
+    
+    def _doc_heading(self, doc):
+        """Document title, plus the section the chunk came from."""
+        return f"{doc['title']} - {doc['section']}" if doc.get('section') else doc['title']
+    
+    def _sources(self, docs):
+        """Unique source entries for retrieved documents, in rank order."""
+        sources = {}
+        for d in docs:
+            sources.setdefault((d['country_name'], d['title']), {
+                'country': d['country_name'], 'title': d['title'], 'source': d['source']
+            })
+        return list(sources.values())
+    
+    def _format_passage(self, passage):
+        """Format a retrieved passage for context injection."""
+        doc = passage['document']
+        return {
+            'country_code': doc.country.code,
+            'country_name': doc.country.name,
+            'doc_type': doc.doc_type,
+            'title': doc.title,
+            'section': passage['heading'],
+            'content': passage['content'],
+            'tokens': passage['tokens'],
+            'confidence': doc.data_confidence,
+            'source': doc.source.name if doc.source else 'Unknown',
+            'last_updated': doc.updated_at.isoformat() if doc.updated_at else None,
+            'score': passage['score'],
+            'chunk_keys': passage['chunk_keys'],
+        }
     
     def chat(self, message, tone='helpful', context=None, session_id=None, user=None, 
-             country_code=None, use_rag=True, conversation_history=None):
+             country_code=None, use_rag=True, conversation_history=None, conversation=None,
+             stream=False):
         """
         Chat interface with RAG support and conversation context.
         
@@ -324,73 +744,200 @@ class AIService:
             country_code: Specific country to focus on
             use_rag: Whether to use RAG for context
             conversation_history: List of previous messages for context
+                (ignored when a stored conversation is given)
+            conversation: Stored Conversation to read history from and append this turn to
+            stream: Return a generator of events (see complete()); the final
+                'done' event carries sources and countries_detected
+        
+        Greetings, off-topic or refused requests and close FAQ matches are
+        answered locally without a provider call (see ai/prefilter.py); their
+        result carries the 'route' taken.
+        """
+        routed = self._prefilter(message, tone, country_code, conversation)
+        if routed is not None:
+            return self._single_event_stream(routed) if stream else routed
+        
+        template_text, context, chat_meta, message_countries = self._build_chat(
+            message, tone, context, country_code, use_rag, conversation_history, conversation
+        )
+        
+        result = self.complete(
+            template_text=template_text,
+            context=context,
+            session_id=session_id,
+            user=user,
+            stream=stream
+        )
+        
+        if stream:
+            return self._stream_chat(result, chat_meta, conversation, message, message_countries)
+        
+        result.update(chat_meta)
+        if conversation is not None and 'error' not in result:
+            self._record_turn(
+                conversation, message, message_countries, result['answer'], chat_meta['focused_country']
+            )
+        
+        return result
+    
+    async def achat(self, message, tone='helpful', context=None, session_id=None, user=None,
+                    country_code=None, use_rag=True, conversation_history=None, conversation=None):
+        """Async version of chat() for ASGI views (no streaming)."""
+        routed = await sync_to_async(self._prefilter)(message, tone, country_code, conversation)
+        if routed is not None:
+            return routed
+        
+        template_text, context, chat_meta, message_countries = await sync_to_async(self._build_chat)(
+            message, tone, context, country_code, use_rag, conversation_history, conversation
+        )
+        
+        result = await self.acomplete(
+            template_text=template_text,
+            context=context,
+            session_id=session_id,
+            user=user
+        )
+        
+        result.update(chat_meta)
+        if conversation is not None and 'error' not in result:
+            await sync_to_async(self._record_turn)(
+                conversation, message, message_countries, result['answer'], chat_meta['focused_country']
+            )
+        
+        return result
+    
+    def _prefilter(self, message, tone, country_code, conversation):
+        """
+        Answer a chat message locally if the pre-filter routes it away from
+        the model, recording the route either way.
+        
+        Returns the result dict, or None if the message needs the model.
+        """
+        if not settings.AI_PREFILTER:
+            return None
+        
+        message_countries = self._extract_countries_from_message(message)
+        routed = route_message(
+            message,
+            intro=PERSONALITY_INTROS.get(tone, PERSONALITY_INTROS['helpful']),
+            countries=[country_code] if country_code else message_countries
+        )
+        metrics.record_route(routed['route'])
+        if routed['answer'] is None:
+            return None
+        
+        sources = []
+        faq = routed.get('faq')
+        if faq and faq['source']:
+            from countries.models import Country
+            country = Country.objects.filter(code=faq['country_code']).values_list('name', flat=True).first()
+            sources.append({'country': country or '', 'title': faq['question'], 'source': faq['source']})
+        focused_country = country_code or next(iter(message_countries), None) or (
+            conversation.focused_country if conversation is not None else None
+        ) or None
+        result = {
+            'answer': routed['answer'],
+            'tokens_used': 0,
+            'prompt_cache_hit_tokens': 0,
+            'cost_usd': 0.0,
+            'duration_seconds': 0.0,
+            'cached': False,
+            'route': routed['route'],
+            'sources': sources,
+            'countries_detected': message_countries,
+            'focused_country': focused_country,
+        }
+        if conversation is not None:
+            self._record_turn(conversation, message, message_countries, result['answer'], focused_country)
+        return result
+    
+    def _build_chat(self, message, tone, context, country_code, use_rag, conversation_history, conversation):
+        """
+        Gather history, countries and documents for a chat turn.
+        
+        Returns (template_text, context, chat_meta, message_countries).
         """
         context = context or {}
         context['message'] = message
         context['tone'] = tone
-        conversation_history = conversation_history or []
         
-        # Extract countries from conversation history to maintain context
-        conversation_countries = set()
-        if country_code:
-            conversation_countries.add(country_code)
+        # Recent turns as (role, content, countries) - stored turns carry the
+        # countries detected when they were saved, so only new text is scanned
+        if conversation is not None:
+            history = [
+                (msg.role, msg.content, msg.countries_detected)
+                for msg in conversation.recent_messages(HISTORY_TURNS)
+            ]
+        else:
+            history = [
+                (msg.get('role', 'user'), msg.get('content', ''),
+                 self._extract_countries_from_message(msg.get('content', '')))
+                for msg in (conversation_history or [])[-HISTORY_TURNS:]
+            ]
         
-        # Look at recent conversation history to find discussed countries
-        for msg in conversation_history[-6:]:  # Last 6 messages
-            msg_content = msg.get('content', '')
-            if msg_content:
-                countries_in_msg = self._extract_countries_from_message(msg_content)
-                conversation_countries.update(countries_in_msg)
+        # Extract countries from conversation history to maintain context
+        conversation_countries = [country_code] if country_code else []
+        for _, _, countries_in_msg in history:
+            conversation_countries.extend(countries_in_msg)
         
         # Also check current message for countries
         current_msg_countries = self._extract_countries_from_message(message)
-        conversation_countries.update(current_msg_countries)
-        
-        # Build conversation context summary
-        conversation_context = ""
-        if conversation_history:
-            # Get last few exchanges to build context
-            recent_msgs = conversation_history[-4:]  # Last 4 messages
-            conv_parts = []
-            for msg in recent_msgs:
-                role = msg.get('role', 'user')
-                content = msg.get('content', '')[:500]  # Limit each message
-                if content:
-                    conv_parts.append(f"{role.title()}: {content}")
-            if conv_parts:
-                conversation_context = "\n".join(conv_parts)
+        conversation_countries.extend(current_msg_countries)
+        conversation_countries = list(dict.fromkeys(conversation_countries))
         
         # Determine which country to focus on for RAG
-        # Priority: explicit country_code > countries in current message > countries from history
+        # Priority: explicit country_code > countries in current message > conversation focus > history
         rag_country = None
         if country_code:
             rag_country = country_code
         elif current_msg_countries:
             rag_country = current_msg_countries[0]  # Use first mentioned
+        elif conversation is not None and conversation.focused_country:
+            rag_country = conversation.focused_country
         elif conversation_countries:
-            rag_country = list(conversation_countries)[0]  # Use from history
+            rag_country = conversation_countries[0]  # Use from history
         
-        # Retrieve relevant documents for RAG
+        # Once per turn: retrieval and the cache key both use it
+        doc_types = self._extract_doc_types_from_message(message)
+        
+        # Retrieve candidate documents for RAG (briefs, then best chunks
+        # first); the packer decides how many fit next to the history
+        budget = context_budget('general')
         retrieved_docs = []
         if use_rag:
-            retrieved_docs = self.retrieve_documents(
+            retrieved_docs, context['rag_tier'] = self.retrieve_tiered(
                 message=message,
                 country_code=rag_country,
-                max_docs=5
+                token_budget=budget,
+                doc_types=doc_types
             )
         
-        # Build context from retrieved documents
-        if retrieved_docs:
-            doc_context = "\n\n---\n\n".join([
-                f"**{doc['country_name']} - {doc['title']}** (Source: {doc['source']}, Confidence: {doc['confidence']})\n\n{doc['content']}"
+        packed = pack_context(budget, fixed=[
+            get_system_prompt(context.get('context_type', 'base')), CHAT_TEMPLATE, message,
+            PERSONALITY_INTROS.get(tone, ''), TONE_INSTRUCTIONS.get(tone, ''),
+        ], segments=[
+            Segment('documents', [
+                f"**{doc['country_name']} - {self._doc_heading(doc)}** (Source: {doc['source']}, Confidence: {doc['confidence']})\n\n{doc['content']}"
                 for doc in retrieved_docs
-            ])
-            context['retrieved_documents'] = doc_context
+            ], priority=1, separator='\n\n---\n\n'),
+            Segment('history', [
+                f"{role.title()}: {content}" for role, content, _ in history if content
+            ], priority=2, share=HISTORY_SHARE, keep='last', separator='\n'),
+        ])
+        retrieved_docs = [retrieved_docs[i] for i in packed.indexes('documents')]
+        conversation_context = packed.text('history')
+        context['context_packing'] = packed.report()
+        
+        # Documents in document order rather than score order, so questions
+        # retrieving the same chunks share a prompt prefix
+        if retrieved_docs:
+            doc_order = sorted(
+                zip(retrieved_docs, packed.items('documents')),
+                key=lambda pair: (pair[0]['country_name'], pair[0]['chunk_keys'])
+            )
+            context['retrieved_documents'] = "\n\n---\n\n".join(text for _, text in doc_order)
             context['has_context'] = True
-            context['sources_used'] = [
-                {'country': d['country_name'], 'title': d['title'], 'source': d['source']}
-                for d in retrieved_docs
-            ]
+            context['sources_used'] = self._sources(retrieved_docs)
         else:
             context['retrieved_documents'] = ''
             context['has_context'] = False
@@ -400,54 +947,258 @@ class AIService:
         context['conversation_context'] = conversation_context
         context['has_conversation_context'] = bool(conversation_context)
         context['focused_country'] = rag_country
+        context['mode'] = 'general'
         
-        # RAG-enhanced chat template with conversation context
-        template_text = """{{personality_intro}}
-
-{% if has_conversation_context %}
-Previous conversation context:
-{{conversation_context}}
-
----
-{% endif %}
-
-{% if focused_country %}
-The user is asking about: {{focused_country}}
-{% endif %}
-
-{% if has_context %}
-I have access to the following official immigration information to help answer your question:
-
-{{retrieved_documents}}
-
----
-{% endif %}
-
-User's current question: {{message}}
-
-{{tone_instructions}}
-
-{% if has_context %}
-Based on the official information above and our conversation, provide a helpful response. Be specific and focus on the country we've been discussing ({{focused_country}}). If the documents don't fully answer the question, acknowledge what's known and what requires further research.
-{% else %}
-Provide general guidance, but remind the user that for specific country information, they should specify which country they're interested in. Be helpful but acknowledge uncertainty without specific data.
-{% endif %}
+        # Key the answer by intent rather than prompt text, so paraphrases
+        # and differing history share it while document edits invalidate it
+        context['cache_key'] = resolve_key(
+            'general', message,
+            country=rag_country,
+            doc_types=doc_types,
+            chunks=[key for doc in retrieved_docs for key in doc['chunk_keys']],
+            tone=tone,
+            model=self.model,
+            temperature=context.get('temperature'),
+            max_tokens=context.get('max_tokens'),
+        )
+        
+        template_text = CHAT_TEMPLATE
+        
+        # Sources and context to add to the result
+        chat_meta = {
+            'sources': context.get('sources_used', []),
+            'countries_detected': conversation_countries,
+            'focused_country': rag_country,
+        }
+        
+        return template_text, context, chat_meta, current_msg_countries
+    
+    def _stream_chat(self, events, chat_meta, conversation, message, message_countries):
+        """Pass completion events through, finishing the turn on the 'done' event."""
+        for event in events:
+            if event['type'] == 'done':
+                event.update(chat_meta)
+                if conversation is not None and 'error' not in event:
+                    self._record_turn(
+                        conversation, message, message_countries,
+                        event['answer'], chat_meta['focused_country']
+                    )
+            yield event
+    
+    def _record_turn(self, conversation, message, message_countries, answer, focused_country):
+        """Append a user/assistant exchange to a stored conversation."""
+        ConversationMessage.objects.bulk_create([
+            ConversationMessage(
+                conversation=conversation, role='user',
+                content=message, countries_detected=message_countries
+            ),
+            ConversationMessage(
+                conversation=conversation, role='assistant',
+                content=answer, countries_detected=self._extract_countries_from_message(answer)
+            ),
+        ])
+        conversation.focused_country = focused_country or ''
+        conversation.message_count += 2
+        conversation.save(update_fields=['focused_country', 'message_count', 'updated_at'])
 
-Response:"""
+    
+    def compare_countries(self, country_codes, metrics=None, user_profile=None,
+                          session_id=None, user=None, stream=False):
+        """
+        Compare 2-5 countries with AI using RAG.
+        
+        A fact sheet is extracted for each country in parallel and cached on
+        its own (per country, metrics and data version), then a short reduce
+        prompt compares the sheets. Country order does not matter: every
+        ordering shares the same cache entries.
+        
+        Returns the completion result (or event generator when streaming)
+        with 'countries', 'fact_sheets' and 'sources' added.
+        """
+        codes, metrics = self._compare_args(country_codes, metrics)
+        with ThreadPoolExecutor(max_workers=len(codes)) as pool:
+            sheets = list(pool.map(
+                lambda code: self._fact_sheet(code, metrics, session_id, user), codes
+            ))
+        
+        template_text, context, compare_meta = self._build_compare(
+            codes, sheets, metrics, user_profile
+        )
         
         result = self.complete(
             template_text=template_text,
             context=context,
             session_id=session_id,
-            user=user
+            user=user,
+            stream=stream
+        )
+        
+        if stream:
+            return stream_with_meta(result, compare_meta)
+        
+        result.update(compare_meta)
+        return result
+    
+    async def acompare_countries(self, country_codes, metrics=None, user_profile=None,
+                                 session_id=None, user=None):
+        """Async version of compare_countries() for ASGI views (no streaming)."""
+        codes, metrics = self._compare_args(country_codes, metrics)
+        sheets = await asyncio.gather(*(
+            self._afact_sheet(code, metrics, session_id, user) for code in codes
+        ))
+        
+        template_text, context, compare_meta = await sync_to_async(self._build_compare)(
+            codes, list(sheets), metrics, user_profile
         )
         
-        # Add sources and context to result
-        result['sources'] = context.get('sources_used', [])
-        result['countries_detected'] = list(conversation_countries) if conversation_countries else current_msg_countries
-        result['focused_country'] = rag_country
+        result = await self.acomplete(
+            template_text=template_text,
+            context=context,
+            session_id=session_id,
+            user=user
+        )
         
+        result.update(compare_meta)
         return result
+    
+    def _compare_args(self, country_codes, metrics):
+        """
+        Distinct codes and metrics in sorted order, so every ordering of a
+        request renders the same prompts and shares their cache entries.
+        """
+        codes = sorted({code.upper() for code in country_codes})
+        if not 2 <= len(codes) <= MAX_COMPARE_COUNTRIES:
+            raise ValueError(f"Compare between 2 and {MAX_COMPARE_COUNTRIES} countries, got {len(codes)}")
+        return codes, sorted(set(metrics or []))
+    
+    def _fact_sheet(self, code, metrics, session_id, user):
+        """Run the map step for one country (in a worker thread)."""
+        try:
+            template_text, context, docs = self._build_fact_sheet(code, metrics)
+            result = self.complete(
+                template_text=template_text,
+                context=context,
+                session_id=session_id,
+                user=user
+            )
+        finally:
+            connection.close()
+        return self._sheet_entry(code, context, docs, result)
+    
+    async def _afact_sheet(self, code, metrics, session_id, user):
+        template_text, context, docs = await sync_to_async(self._build_fact_sheet)(code, metrics)
+        result = await self.acomplete(
+            template_text=template_text,
+            context=context,
+            session_id=session_id,
+            user=user
+        )
+        return self._sheet_entry(code, context, docs, result)
+    
+    def _sheet_entry(self, code, context, docs, result):
+        return {
+            'code': code,
+            'sheet': None if result.get('error') else result.get('answer'),
+            'docs': docs,
+            'cache_key': context['cache_key'],
+        }
+    
+    def _build_fact_sheet(self, code, metrics):
+        """
+        Retrieve one country's documents and build its fact sheet prompt.
+        
+        Returns (template_text, context, docs).
+        """
+        from countries.models import Country
+        
+        budget = context_budget('compare_facts')
+        query = ' '.join([FACT_SHEET_QUERY, *metrics]).replace('_', ' ')
+        docs, tier = self.retrieve_tiered(query, country_code=code, token_budget=budget)
+        
+        packed = pack_context(budget, fixed=[
+            get_system_prompt('base'), FACT_SHEET_TEMPLATE, ', '.join(metrics),
+        ], segments=[
+            Segment('documents', [f"**{self._doc_heading(d)}** ({d['source']})\n{d['content']}" for d in docs]),
+        ])
+        docs = [docs[i] for i in packed.indexes('documents')]
+        
+        context = {
+            'country': Country.objects.filter(code=code).values_list('name', flat=True).first() or code,
+            'country_code': code,
+            'metrics': metrics,
+            'retrieved_documents': packed.text('documents') or "No detailed information available.",
+            'mode': 'compare_facts',
+            'rag_tier': tier,
+            'context_packing': packed.report(),
+            'temperature': 0.2,
+            'max_tokens': FACT_SHEET_MAX_TOKENS,
+        }
+        # Chunk keys version the documents; the data version covers country rows
+        context['cache_key'] = resolve_key(
+            'compare_facts',
+            country=code,
+            metrics=metrics,
+            chunks=[key for doc in docs for key in doc['chunk_keys']],
+            data_version=get_data_version('countries'),
+            model=self.model,
+        )
+        return FACT_SHEET_TEMPLATE, context, docs
+    
+    def _build_compare(self, codes, sheets, metrics, user_profile):
+        """
+        Build the reduce prompt comparing the countries' fact sheets.
+        
+        Returns (template_text, context, compare_meta).
+        """
+        budget = context_budget('compare')
+        packed = pack_context(budget, fixed=[
+            get_system_prompt('base'), COMPARE_TEMPLATE, ' vs '.join(codes), ', '.join(metrics),
+        ], segments=[
+            Segment(sheet['code'], [sheet['sheet']] if sheet['sheet'] else [], share=1 / len(sheets))
+            for sheet in sheets
+        ])
+        
+        context = {
+            'countries': codes,
+            'country_blocks': [
+                (sheet['code'], packed.text(sheet['code']) or "No fact sheet available.")
+                for sheet in sheets
+            ],
+            'metrics': metrics,
+            'user_profile': user_profile or {},
+            'tone': 'helpful',
+            'mode': 'compare',
+            'context_packing': packed.report(),
+        }
+        # Lists are order-insensitive in the key; a failed sheet changes it,
+        # so a comparison made without one is not served once it recovers
+        context['cache_key'] = resolve_key(
+            'compare',
+            countries=codes,
+            metrics=metrics,
+            user_profile=context['user_profile'],
+            fact_sheets=[sheet['cache_key'] for sheet in sheets if sheet['sheet']],
+            tone=context['tone'],
+            model=self.model,
+        )
+        
+        # Added to the result
+        compare_meta = {
+            'countries': codes,
+            'fact_sheets': {sheet['code']: sheet['sheet'] for sheet in sheets},
+            'sources': self._sources([doc for sheet in sheets for doc in sheet['docs']]),
+        }
+        
+        return COMPARE_TEMPLATE, context, compare_meta
+
+
+
+def stream_with_meta(events, meta):
+    """Pass completion events through, adding ``meta`` to the 'done' event."""
+    for event in events:
+        if event['type'] == 'done':
+            event.update(meta)
+        yield event
 
 
 # Singleton instance
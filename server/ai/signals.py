@@ -0,0 +1,14 @@
+"""
+Signal handlers for the ai app.
+"""
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from core.utils import bump_data_version
+from .models import FAQEntry
+
+
+@receiver(post_save, sender=FAQEntry)
+@receiver(post_delete, sender=FAQEntry)
+def bump_faq_version(sender, **kwargs):
+    """Invalidate in-process FAQ indexes (ai.prefilter)."""
+    bump_data_version('faq')
@@ -0,0 +1,35 @@
+"""
+Celery tasks for ai app.
+"""
+from decimal import Decimal
+from celery import shared_task
+from .models import AIRequest
+from .request_log import write_requests
+from .usage import update_rollups
+
+
+@shared_task(ignore_result=True)
+def write_ai_requests(rows):
+    """
+    Insert a batch of AIRequest rows handed off by ai.request_log.
+    
+    Args:
+        rows: Dicts from request_log.serialize_row()
+    """
+    write_requests([
+        AIRequest(**dict(row, cost_usd=Decimal(row['cost_usd']) if row['cost_usd'] is not None else None))
+        for row in rows
+    ])
+    update_rollups()
+    return len(rows)
+
+
+@shared_task(ignore_result=True)
+def rollup_ai_usage():
+    """
+    Fold AIRequest rows not yet counted into AIUsageRollup.
+    
+    Runs every minute via Celery beat, covering rows logged synchronously
+    or left behind by a worker that stopped before rolling up.
+    """
+    return update_rollups()
@@ -0,0 +1,35 @@
+from unittest.mock import patch
+from django.test import SimpleTestCase
+from .dispatcher import LLMDispatcher, PRIORITIES
+
+
+class TokenBucketReserveTests(SimpleTestCase):
+    """Every priority class is eventually granted a token, whatever the rate and burst."""
+
+    def _seconds_to_grant(self, dispatcher, priority):
+        """Simulated seconds until an emptied bucket grants ``priority`` a token."""
+        bucket = dispatcher.bucket
+        bucket.tokens = 0
+        start = bucket.updated
+        clock = [start]
+        with patch('ai.dispatcher.time.monotonic', lambda: clock[0]):
+            for _ in range(10):
+                wait = bucket.take(dispatcher._reserve(priority))
+                if not wait:
+                    return clock[0] - start
+                # A real sleep always lets the clock move on
+                clock[0] += max(wait, 0.001)
+        self.fail(f'{priority} was never granted a token')
+
+    def test_every_class_is_granted(self):
+        for rate, burst in [(0.5, 0), (1, 0), (1, 1), (10, 20)]:
+            dispatcher = LLMDispatcher({p: 1 for p in PRIORITIES}, rate=rate, burst=burst)
+            for priority in PRIORITIES:
+                with self.subTest(rate=rate, burst=burst, priority=priority):
+                    self._seconds_to_grant(dispatcher, priority)
+
+    def test_lower_classes_wait_longer(self):
+        dispatcher = LLMDispatcher({p: 1 for p in PRIORITIES}, rate=10, burst=20)
+        waits = [self._seconds_to_grant(dispatcher, p) for p in PRIORITIES]
+        self.assertEqual(waits, sorted(waits))
+        self.assertLess(waits[0], waits[-1])
@@ -0,0 +1,77 @@
+"""
+Local token counting for prompt budgets.
+
+Approximates the byte-level BPE tokenizers of DeepSeek and OpenAI models
+without their vocabularies: text is split the way those tokenizers
+pre-tokenize it (words with their leading space, digit groups of up to
+three, punctuation runs, whitespace runs), then each piece is costed.
+Common words are one token and long or non-ASCII words several, which
+tracks real counts far better than characters / 4 on prose, markdown and
+numbers. It errs on the high side, so budgets are not overrun.
+
+Pure Python with no Django imports, so it can be used anywhere.
+"""
+import re
+
+
+PRETOKEN_RE = re.compile(
+    r"'(?:[sdmt]|ll|ve|re)"    # English contractions
+    r"| ?[^\W\d_]+"            # Words (any script), with a leading space
+    r"| ?\d{1,3}"              # Digit groups
+    r"| ?[^\s\w]+|_+"          # Punctuation and symbol runs
+    r"|\s+",                   # Whitespace runs
+    re.IGNORECASE
+)
+
+# Sentence ends: after . ! ? (and closing quotes/brackets), or a line break
+SENTENCE_END_RE = re.compile(r'(?<=[.!?])["\')\]]*\s+|\n+')
+
+# ASCII letters that one word token covers
+WORD_TOKEN_CHARS = 8
+
+
+def _piece_tokens(piece):
+    word = piece.lstrip(' ')
+    if not word:
+        return 1
+    first = word[0]
+    if first.isalpha():
+        ascii_chars = sum(1 for ch in word if ch.isascii())
+        # Non-ASCII letters (accents, CJK) are mostly a token each
+        return max(1, -(-ascii_chars // WORD_TOKEN_CHARS)) + (len(word) - ascii_chars)
+    if first.isdigit() or first.isspace():
+        return 1
+    # Punctuation merges in pairs ('**', '##', '.\n'); symbols and emoji cost more
+    return sum(2 if not ch.isascii() else 0 for ch in word) + -(-sum(1 for ch in word if ch.isascii()) // 2)
+
+
+def count_tokens(text):
+    """Approximate model token count of ``text``."""
+    if not text:
+        return 0
+    return sum(_piece_tokens(piece) for piece in PRETOKEN_RE.findall(text))
+
+
+def split_sentences(text):
+    """Split ``text`` into sentences, each keeping its trailing whitespace."""
+    bounds = [0] + [m.end() for m in SENTENCE_END_RE.finditer(text)] + [len(text)]
+    return [text[start:end] for start, end in zip(bounds, bounds[1:]) if start < end]
+
+
+def trim_to_tokens(text, max_tokens):
+    """
+    Leading whole sentences of ``text`` within ``max_tokens``.
+
+    Returns '' if not even the first sentence fits.
+    """
+    if count_tokens(text) <= max_tokens:
+        return text
+    kept = []
+    used = 0
+    for sentence in split_sentences(text):
+        tokens = count_tokens(sentence)
+        if used + tokens > max_tokens:
+            break
+        kept.append(sentence)
+        used += tokens
+    return ''.join(kept).rstrip()
@@ -1,7 +1,19 @@
 from django.urls import path
-from .views import chat, compare_countries
+from .views import (
+    chat, chat_stream, chat_async,
+    compare_countries, compare_countries_stream, compare_countries_async,
+    cache_metrics, dispatch_metrics, provider_status, usage
+)
 
 urlpatterns = [
     path('chat/', chat, name='ai-chat'),
+    path('chat/stream/', chat_stream, name='ai-chat-stream'),
+    path('chat/async/', chat_async, name='ai-chat-async'),
     path('compare/', compare_countries, name='ai-compare'),
+    path('compare/stream/', compare_countries_stream, name='ai-compare-stream'),
+    path('compare/async/', compare_countries_async, name='ai-compare-async'),
+    path('cache/metrics/', cache_metrics, name='ai-cache-metrics'),
+    path('dispatch/metrics/', dispatch_metrics, name='ai-dispatch-metrics'),
+    path('provider/status/', provider_status, name='ai-provider-status'),
+    path('usage/', usage, name='ai-usage'),
 ]
\ No newline at end of file
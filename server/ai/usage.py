@@ -0,0 +1,188 @@
+"""
+Hourly AI usage rollups.
+
+AIRequest rows are folded into AIUsageRollup (hour x model x template x
+mode x tone) once, tracked by ``AIRequest.rolled_up``. The request-log
+writer runs ``update_rollups()`` after each batch and a Celery beat task
+catches anything else (sync logging, crashed writers). Latency is kept as
+a fixed-bucket histogram per rollup so p50/p95 can be read back and merged
+across hours without touching requests.
+"""
+from bisect import bisect_left
+from decimal import Decimal
+from django.db import connection, transaction
+from .models import AIRequest, AIUsageRollup
+
+
+# Histogram bucket upper bounds in seconds; one extra bucket holds the rest
+LATENCY_BUCKETS = (0.25, 0.5, 1, 2, 3, 5, 8, 13, 20, 30, 45, 60, 90, 120)
+ROLLUP_BATCH_SIZE = 1000
+GROUP_FIELDS = ('hour', 'model_used', 'template', 'mode', 'tone')
+
+
+class _Claimed(Exception):
+    """Another worker rolled up part of the batch first."""
+
+
+def empty_histogram():
+    return [0] * (len(LATENCY_BUCKETS) + 1)
+
+
+def merge_histograms(into, other):
+    for i, count in enumerate(other):
+        into[i] += count
+    return into
+
+
+def histogram_percentile(histogram, pct, buckets=LATENCY_BUCKETS):
+    """
+    Approximate latency percentile from bucket counts.
+
+    Interpolates linearly inside the bucket holding the percentile; values
+    in the overflow bucket report the last bound.
+    """
+    total = sum(histogram)
+    if not total:
+        return None
+    rank = pct / 100 * total
+    seen = 0
+    for i, count in enumerate(histogram):
+        if count and seen + count >= rank:
+            if i == len(buckets):
+                return float(buckets[-1])
+            lower = buckets[i - 1] if i else 0.0
+            return round(lower + (buckets[i] - lower) * (rank - seen) / count, 3)
+        seen += count
+    return float(buckets[-1])
+
+
+def _pending_batch(batch_size):
+    pending = AIRequest.objects.filter(rolled_up=False).order_by('id')
+    if connection.features.has_select_for_update_skip_locked:
+        pending = pending.select_for_update(skip_locked=True, of=('self',))
+    return list(pending.values_list(
+        'id', 'created_at', 'model_used', 'prompt_template__name', 'mode', 'tone',
+        'tokens_used', 'cost_usd', 'duration_seconds', 'prompt_tokens', 'prompt_cache_hit_tokens'
+    )[:batch_size])
+
+
+def _apply_batch(rows):
+    ids = [row[0] for row in rows]
+    # Claiming first makes a concurrent worker's overlapping batch fail
+    # (SQLite has no SELECT ... FOR UPDATE)
+    if AIRequest.objects.filter(id__in=ids, rolled_up=False).update(rolled_up=True) != len(ids):
+        raise _Claimed
+
+    deltas = {}
+    for _, created_at, model_used, template, mode, tone, tokens, cost, duration, prompt, cache_hit in rows:
+        key = (
+            created_at.replace(minute=0, second=0, microsecond=0),
+            model_used, template or '', mode, tone
+        )
+        delta = deltas.setdefault(key, {
+            'requests': 0, 'tokens_used': 0, 'cost_usd': Decimal(0),
+            'prompt_tokens': 0, 'prompt_cache_hit_tokens': 0,
+            'duration_seconds': 0.0, 'latency_histogram': empty_histogram(),
+        })
+        delta['requests'] += 1
+        delta['tokens_used'] += tokens or 0
+        delta['cost_usd'] += cost or 0
+        # Only requests whose provider reported cache hits count toward the ratio
+        if cache_hit is not None:
+            delta['prompt_tokens'] += prompt or 0
+            delta['prompt_cache_hit_tokens'] += cache_hit
+        if duration is not None:
+            delta['duration_seconds'] += duration
+            delta['latency_histogram'][bisect_left(LATENCY_BUCKETS, duration)] += 1
+
+    for key, delta in deltas.items():
+        rollup, _ = AIUsageRollup.objects.select_for_update().get_or_create(
+            **dict(zip(GROUP_FIELDS, key)), defaults={'latency_histogram': empty_histogram()}
+        )
+        rollup.requests += delta['requests']
+        rollup.tokens_used += delta['tokens_used']
+        rollup.cost_usd += delta['cost_usd']
+        rollup.prompt_tokens += delta['prompt_tokens']
+        rollup.prompt_cache_hit_tokens += delta['prompt_cache_hit_tokens']
+        rollup.duration_seconds += delta['duration_seconds']
+        rollup.latency_histogram = merge_histograms(
+            rollup.latency_histogram or empty_histogram(), delta['latency_histogram']
+        )
+        rollup.save()
+
+
+def update_rollups(batch_size=ROLLUP_BATCH_SIZE):
+    """Fold AIRequest rows not yet counted into the rollups; returns rows processed."""
+    processed = 0
+    while True:
+        try:
+            with transaction.atomic():
+                rows = _pending_batch(batch_size)
+                if rows:
+                    _apply_batch(rows)
+        except _Claimed:
+            continue
+        if not rows:
+            return processed
+        processed += len(rows)
+
+
+def usage_summary(since, until=None, group_by=None):
+    """
+    Usage totals from the rollups, optionally grouped by one rollup field.
+
+    Cost is proportional to the number of rollup rows in the range (hours x
+    distinct model/template/mode/tone), not to the number of requests.
+
+    Returns:
+        Dict with 'totals' and, when grouped, 'groups' (largest first), each
+        with requests, tokens_used, cost_usd, prompt-cache hit tokens and
+        ratio, avg/p50/p95 latency seconds
+    """
+    rollups = AIUsageRollup.objects.filter(hour__gte=since)
+    if until is not None:
+        rollups = rollups.filter(hour__lt=until)
+
+    def new_group():
+        return {
+            'requests': 0, 'tokens_used': 0, 'cost_usd': Decimal(0),
+            'prompt_tokens': 0, 'prompt_cache_hit_tokens': 0,
+            'duration_seconds': 0.0, 'latency_histogram': empty_histogram(),
+        }
+
+    totals = new_group()
+    groups = {}
+    summed = ('requests', 'tokens_used', 'cost_usd', 'prompt_tokens', 'prompt_cache_hit_tokens', 'duration_seconds')
+    for rollup in rollups.values(*GROUP_FIELDS, *summed, 'latency_histogram'):
+        targets = [totals]
+        if group_by:
+            targets.append(groups.setdefault(rollup[group_by], new_group()))
+        for group in targets:
+            for field in summed:
+                group[field] += rollup[field]
+            merge_histograms(group['latency_histogram'], rollup['latency_histogram'])
+
+    def summarize(group):
+        timed = sum(group['latency_histogram'])
+        return {
+            'requests': group['requests'],
+            'tokens_used': group['tokens_used'],
+            'cost_usd': float(group['cost_usd']),
+            'prompt_tokens': group['prompt_tokens'],
+            'prompt_cache_hit_tokens': group['prompt_cache_hit_tokens'],
+            'prompt_cache_hit_ratio': (
+                round(group['prompt_cache_hit_tokens'] / group['prompt_tokens'], 4)
+                if group['prompt_tokens'] else None
+            ),
+            'avg_latency_seconds': round(group['duration_seconds'] / timed, 3) if timed else None,
+            'p50_latency_seconds': histogram_percentile(group['latency_histogram'], 50),
+            'p95_latency_seconds': histogram_percentile(group['latency_histogram'], 95),
+        }
+
+    result = {'totals': summarize(totals)}
+    if group_by:
+        result['groups'] = sorted(
+            ({group_by: key, **summarize(group)} for key, group in groups.items()),
+            key=lambda group: group['requests'], reverse=True
+        )
+    return result
@@ -1,8 +1,58 @@
-from rest_framework.decorators import api_view, permission_classes
+from datetime import timedelta
+from asgiref.sync import sync_to_async
+from django.utils import timezone
+from rest_framework.decorators import api_view, permission_classes, renderer_classes
 from rest_framework.response import Response
-from rest_framework.permissions import AllowAny
+from rest_framework.permissions import AllowAny, IsAdminUser
+from rest_framework.renderers import JSONRenderer
 from .serializers import AIChatRequestSerializer, AICompareRequestSerializer
-from .services import ai_service
+from core.async_views import async_api_view, get_session_id, aget_session_id, json_response
+from core.sse import EventStreamRenderer, sse_response
+from .models import Conversation, ConversationMessage
+from .services import ai_service, stream_with_meta
+from . import metrics, dispatcher
+from .resilience import provider
+from .usage import usage_summary, GROUP_FIELDS
+
+
+def _get_or_create_conversation(data, user, session_id):
+    """
+    Load the caller's stored conversation, or start a new one.
+    
+    A new conversation is seeded from any client-supplied history so legacy
+    clients keep their context; afterwards history is read server-side.
+    """
+    conversation_id = data.get('conversation_id')
+    if conversation_id:
+        owner = {'user': user} if user else {'session_id': session_id, 'user__isnull': True}
+        conversation = Conversation.objects.filter(id=conversation_id, **owner).first()
+        if conversation:
+            return conversation
+    
+    conversation = Conversation.objects.create(
+        user=user, session_id=session_id or '', tone=data.get('tone', 'helpful')
+    )
+    
+    history = [
+        msg for msg in data.get('conversation_history', [])
+        if msg.get('content') and msg.get('role') in ('user', 'assistant')
+    ]
+    # Clients append the current message to the history they send
+    if history and history[-1]['role'] == 'user' and history[-1]['content'] == data['message']:
+        history = history[:-1]
+    history = history[-6:]
+    if history:
+        ConversationMessage.objects.bulk_create([
+            ConversationMessage(
+                conversation=conversation, role=msg['role'], content=msg['content'],
+                countries_detected=ai_service._extract_countries_from_message(msg['content'])
+            )
+            for msg in history
+        ])
+        conversation.message_count = len(history)
+        conversation.save(update_fields=['message_count'])
+    
+    return conversation
 
 
 @api_view(['POST'])
@@ -10,13 +60,18 @@ from .services import ai_service
 def chat(request):
     """
     AI chat endpoint with personality support, RAG, and conversation context.
+    
+    History is stored server-side per conversation_id; clients only need to
+    send the new message once they have a conversation_id.
     """
     serializer = AIChatRequestSerializer(data=request.data)
     serializer.is_valid(raise_exception=True)
     
     data = serializer.validated_data
     user = request.user if request.user.is_authenticated else None
-    session_id = '' if user else request.session.session_key
+    session_id = get_session_id(request, user)
+    
+    conversation = _get_or_create_conversation(data, user, session_id)
     
     result = ai_service.chat(
         message=data['message'],
@@ -26,13 +81,13 @@ def chat(request):
         user=user,
         country_code=data.get('country_code'),
         use_rag=data.get('use_rag', True),
-        conversation_history=data.get('conversation_history', [])
+        conversation=conversation
     )
     
     # Transform response to match frontend ChatResponse interface
     response_data = {
         'response': result.get('answer', 'Sorry, I encountered an error.'),
-        'conversation_id': data.get('conversation_id', 1),
+        'conversation_id': conversation.id,
         'tone': data.get('tone', 'helpful'),
         'sources': result.get('sources', []),
         'countries_detected': result.get('countries_detected', []),
@@ -46,83 +101,211 @@ def chat(request):
 @permission_classes([AllowAny])
 def compare_countries(request):
     """
-    Compare two countries with AI using RAG.
+    Compare 2-5 countries with AI using RAG.
+    
+    Accepts ``countries`` (a list of codes) or ``left`` and ``right``.
     """
     serializer = AICompareRequestSerializer(data=request.data)
     serializer.is_valid(raise_exception=True)
     
     data = serializer.validated_data
     user = request.user if request.user.is_authenticated else None
-    session_id = '' if user else request.session.session_key
+    session_id = get_session_id(request, user)
+    
+    result = ai_service.compare_countries(
+        country_codes=data['countries'],
+        metrics=data.get('metrics', []),
+        user_profile=data.get('user_profile', {}),
+        session_id=session_id,
+        user=user
+    )
+    
+    return Response(result)
+
+
+@api_view(['POST'])
+@permission_classes([AllowAny])
+@renderer_classes([JSONRenderer, EventStreamRenderer])
+def chat_stream(request):
+    """
+    Streaming AI chat endpoint (Server-Sent Events).
+    
+    Emits ``token`` events as the answer is generated and a final ``done``
+    event with the full answer, sources, countries_detected, token usage
+    and conversation_id.
+    """
+    serializer = AIChatRequestSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    
+    data = serializer.validated_data
+    user = request.user if request.user.is_authenticated else None
+    session_id = get_session_id(request, user)
     
-    left_code = data['left']
-    right_code = data['right']
+    conversation = _get_or_create_conversation(data, user, session_id)
     
-    # Retrieve documents for both countries
-    left_docs = ai_service.retrieve_documents(
-        message="general overview work study immigration",
-        country_code=left_code,
-        max_docs=3
+    events = ai_service.chat(
+        message=data['message'],
+        tone=data.get('tone', 'helpful'),
+        context=data.get('context', {}),
+        session_id=session_id,
+        user=user,
+        country_code=data.get('country_code'),
+        use_rag=data.get('use_rag', True),
+        conversation=conversation,
+        stream=True
     )
-    right_docs = ai_service.retrieve_documents(
-        message="general overview work study immigration",
-        country_code=right_code,
-        max_docs=3
+    
+    return sse_response(
+        stream_with_meta(events, {
+            'conversation_id': conversation.id,
+            'tone': data.get('tone', 'helpful'),
+        })
     )
+
+
+@api_view(['POST'])
+@permission_classes([AllowAny])
+@renderer_classes([JSONRenderer, EventStreamRenderer])
+def compare_countries_stream(request):
+    """
+    Streaming country comparison (Server-Sent Events).
+    """
+    serializer = AICompareRequestSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
     
-    # Format document context
-    left_context = "\n\n".join([
-        f"**{d['title']}** ({d['source']})\n{d['content'][:2000]}" 
-        for d in left_docs
-    ]) if left_docs else "No detailed information available."
-    
-    right_context = "\n\n".join([
-        f"**{d['title']}** ({d['source']})\n{d['content'][:2000]}" 
-        for d in right_docs
-    ]) if right_docs else "No detailed information available."
-    
-    # Build comparison context
-    context = {
-        'left_country': left_code,
-        'right_country': right_code,
-        'left_context': left_context,
-        'right_context': right_context,
-        'metrics': data.get('metrics', []),
-        'user_profile': data.get('user_profile', {}),
-        'tone': 'helpful'
-    }
+    data = serializer.validated_data
+    user = request.user if request.user.is_authenticated else None
+    session_id = get_session_id(request, user)
     
-    template_text = """You are comparing {{left_country}} vs {{right_country}} for immigration purposes.
-
-**Information about {{left_country}}:**
-{{left_context}}
+    events = ai_service.compare_countries(
+        country_codes=data['countries'],
+        metrics=data.get('metrics', []),
+        user_profile=data.get('user_profile', {}),
+        session_id=session_id,
+        user=user,
+        stream=True
+    )
+    
+    return sse_response(events)
 
-**Information about {{right_country}}:**
-{{right_context}}
 
----
 
-Based on the information above, compare these two countries focusing on: {{metrics|join(', ')}}.
+@async_api_view
+async def chat_async(request, data, user):
+    """
+    Async AI chat endpoint for the ASGI stack.
+    
+    Same request/response as chat(), but the LLM call is awaited so one
+    worker can hold many in-flight requests.
+    """
+    serializer = AIChatRequestSerializer(data=data)
+    serializer.is_valid(raise_exception=True)
+    
+    data = serializer.validated_data
+    session_id = await aget_session_id(request, user)
+    conversation = await sync_to_async(_get_or_create_conversation)(data, user, session_id)
+    
+    result = await ai_service.achat(
+        message=data['message'],
+        tone=data.get('tone', 'helpful'),
+        context=data.get('context', {}),
+        session_id=session_id,
+        user=user,
+        country_code=data.get('country_code'),
+        use_rag=data.get('use_rag', True),
+        conversation=conversation
+    )
+    
+    return json_response({
+        'response': result.get('answer', 'Sorry, I encountered an error.'),
+        'conversation_id': conversation.id,
+        'tone': data.get('tone', 'helpful'),
+        'sources': result.get('sources', []),
+        'countries_detected': result.get('countries_detected', []),
+        'focused_country': result.get('focused_country'),
+    })
 
-Provide a balanced, structured comparison with:
-1. Key pros and cons for each country
-2. Which is better for different scenarios (career, family, cost, lifestyle)
-3. A summary recommendation
 
-Be specific and cite information from the documents when available."""
+@async_api_view
+async def compare_countries_async(request, data, user):
+    """
+    Async country comparison endpoint for the ASGI stack.
+    """
+    serializer = AICompareRequestSerializer(data=data)
+    serializer.is_valid(raise_exception=True)
     
-    result = ai_service.complete(
-        template_text=template_text,
-        context=context,
+    data = serializer.validated_data
+    session_id = await aget_session_id(request, user)
+    
+    result = await ai_service.acompare_countries(
+        country_codes=data['countries'],
+        metrics=data.get('metrics', []),
+        user_profile=data.get('user_profile', {}),
         session_id=session_id,
         user=user
     )
     
-    # Add sources
-    all_sources = [
-        {'country': d['country_name'], 'title': d['title'], 'source': d['source']}
-        for d in left_docs + right_docs
-    ]
-    result['sources'] = all_sources
+    return json_response(result)
+
+
+@api_view(['GET', 'DELETE'])
+@permission_classes([IsAdminUser])
+def cache_metrics(request):
+    """
+    Completion cache hit rate and saved tokens, in total and per prompt mode.
+    
+    DELETE returns the counters and resets them.
+    """
+    data = metrics.snapshot()
+    if request.method == 'DELETE':
+        metrics.reset()
+    return Response(data)
+
+
+@api_view(['GET', 'DELETE'])
+@permission_classes([IsAdminUser])
+def dispatch_metrics(request):
+    """
+    LLM dispatcher queue times per priority class (interactive, roadmap, batch).
+    
+    DELETE returns the counters and resets them.
+    """
+    data = dispatcher.snapshot()
+    if request.method == 'DELETE':
+        dispatcher.reset()
+    return Response(data)
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def provider_status(request):
+    """
+    Provider resilience state in this process: circuit breaker, retry,
+    hedge and rejection counters, and the hedge threshold per mode.
+    """
+    return Response(provider.snapshot())
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def usage(request):
+    """
+    AI spend and latency from the hourly rollups.
+    
+    Query params: ``hours`` (default 24, max 24 * 90) and ``group_by``
+    (hour, model_used, template, mode or tone).
+    """
+    try:
+        hours = min(max(int(request.query_params.get('hours', 24)), 1), 24 * 90)
+    except ValueError:
+        return Response({'error': 'hours must be an integer'}, status=400)
+    group_by = request.query_params.get('group_by') or None
+    if group_by and group_by not in GROUP_FIELDS:
+        return Response({'error': f"group_by must be one of: {', '.join(GROUP_FIELDS)}"}, status=400)
     
-    return Response(result)
\ No newline at end of file
+    since = timezone.now().replace(minute=0, second=0, microsecond=0) - timedelta(hours=hours - 1)
+    return Response({
+        'since': since,
+        'hours': hours,
+        **usage_summary(since, group_by=group_by),
+    })
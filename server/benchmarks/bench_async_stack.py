@@ -0,0 +1,140 @@
+"""
+Concurrency benchmark: sync (gunicorn WSGI) vs async (gunicorn + uvicorn ASGI) stacks.
+
+Starts the mock LLM server, then each stack in turn, and fires concurrent chat
+requests at /api/v1/ai/chat/ (sync) and /api/v1/ai/chat/async/ (async).
+Reports requests/second, p50/p99 latency and errors. Rows created during the run
+(AI requests, conversations) are deleted afterwards.
+
+Usage:
+    python benchmarks/bench_async_stack.py
+    python benchmarks/bench_async_stack.py --requests 400 --concurrency 200 --latency 1.0 --workers 2
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import statistics
+import subprocess
+from pathlib import Path
+
+import httpx
+
+SERVER_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(SERVER_DIR))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'japaguide.settings')
+
+MOCK_PORT = 8900
+SYNC_PORT = 8901
+ASYNC_PORT = 8902
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Sync vs async stack concurrency benchmark')
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=100)
+    parser.add_argument('--latency', type=float, default=1.0, help='Mock LLM latency in seconds')
+    parser.add_argument('--workers', type=int, default=2, help='Worker processes per stack')
+    return parser.parse_args()
+
+
+def start(cmd, env, port):
+    proc = subprocess.Popen(cmd, cwd=SERVER_DIR, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    for _ in range(100):
+        try:
+            httpx.get(f'http://127.0.0.1:{port}/', timeout=0.5)
+            return proc
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    proc.terminate()
+    raise RuntimeError(f"{cmd[0]} did not start on port {port}")
+
+
+async def load(url, total, concurrency):
+    """Send ``total`` chat requests with at most ``concurrency`` in flight."""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, errors = [], []
+
+    async with httpx.AsyncClient(timeout=300, limits=httpx.Limits(max_connections=concurrency)) as client:
+        async def one(i):
+            async with semaphore:
+                start = time.perf_counter()
+                try:
+                    response = await client.post(
+                        url,
+                        json={'message': f'How do I get a work visa for Canada? (bench {i})', 'tone': 'helpful'},
+                        headers={'X-Session-ID': f'bench-{i}'},
+                    )
+                    if response.status_code != 200:
+                        errors.append(f"HTTP {response.status_code}: {response.text[:200]}")
+                except httpx.HTTPError as e:
+                    errors.append(repr(e))
+                latencies.append(time.perf_counter() - start)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(total)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    return total / elapsed, statistics.median(latencies), p99, errors
+
+
+def main():
+    args = parse_args()
+    env = dict(
+        os.environ,
+        DEEPSEEK_API_KEY='bench',
+        DEEPSEEK_BASE_URL=f'http://127.0.0.1:{MOCK_PORT}',
+        AI_FAKE_LLM='False',
+    )
+
+    import django
+    django.setup()
+    from django.db.models import Max
+    from ai.models import AIRequest, Conversation
+    baseline = {
+        model: model.objects.aggregate(m=Max('id'))['m'] or 0
+        for model in (AIRequest, Conversation)
+    }
+
+    stacks = [
+        ('sync (wsgi)', SYNC_PORT, '/api/v1/ai/chat/',
+         ['gunicorn', 'japaguide.wsgi:application', '--workers', str(args.workers),
+          '--bind', f'127.0.0.1:{SYNC_PORT}', '--timeout', '300']),
+        ('async (asgi)', ASYNC_PORT, '/api/v1/ai/chat/async/',
+         ['gunicorn', 'japaguide.asgi:application', '-k', 'uvicorn.workers.UvicornWorker',
+          '--workers', str(args.workers), '--bind', f'127.0.0.1:{ASYNC_PORT}', '--timeout', '300']),
+    ]
+
+    mock = subprocess.Popen(
+        [sys.executable, 'benchmarks/mock_llm_server.py', '--port', str(MOCK_PORT), '--latency', str(args.latency)],
+        cwd=SERVER_DIR, stdout=subprocess.DEVNULL,
+    )
+    try:
+        time.sleep(0.5)
+        print(f"{args.requests} requests, concurrency {args.concurrency}, "
+              f"{args.workers} workers/stack, mock LLM latency {args.latency}s")
+        print(f"{'stack':<14}{'req/s':>8}{'p50':>9}{'p99':>9}{'errors':>8}")
+        for name, port, path, cmd in stacks:
+            proc = start(cmd, env, port)
+            try:
+                rps, p50, p99, errors = asyncio.run(
+                    load(f'http://127.0.0.1:{port}{path}', args.requests, args.concurrency)
+                )
+                print(f"{name:<14}{rps:>8.1f}{p50:>8.2f}s{p99:>8.2f}s{len(errors):>8}")
+                if errors:
+                    print(f"  first error: {errors[0]}")
+            finally:
+                proc.terminate()
+                proc.wait()
+    finally:
+        mock.terminate()
+        for model, max_id in baseline.items():
+            model.objects.filter(id__gt=max_id).delete()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""
+Chat prompt tokens with and without the condensed country brief tier.
+
+Builds chat prompts for a mix of overview questions (answerable from a
+brief) and detail questions (fees, timelines, requirements) about several
+countries, once with full document chunks only and once with tiered
+retrieval (briefs first, chunks only for detail questions). Reports the
+mean and p90 locally counted prompt tokens and the tier mix. Nothing is
+sent to a model; build the briefs first with
+``AI_FAKE_LLM=True python manage.py build_country_briefs``.
+
+Usage:
+    python benchmarks/bench_briefs.py
+"""
+import os
+import sys
+from pathlib import Path
+from collections import Counter
+from statistics import mean
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'japaguide.settings')
+os.environ['AI_FAKE_LLM'] = 'True'
+
+COUNTRIES = ['CAN', 'GBR', 'DEU', 'AUS', 'USA', 'IRL']
+OVERVIEW_QUESTIONS = [
+    'Which work visas could a nurse get in {country}?',
+    'Can my family come with me to {country}?',
+    'Is {country} a good place to study?',
+    'Tell me about becoming a citizen of {country}',
+    'What is it like to move to {country}?',
+]
+DETAIL_QUESTIONS = [
+    'How much money do I need to relocate to {country} for work?',
+    'What documents are required for a student visa in {country}?',
+    'How long does citizenship take in {country}?',
+]
+
+
+def main():
+    import django
+    django.setup()
+    from django.conf import settings
+    from ai.services import ai_service
+    from ai.tokenizer import count_tokens
+    from ai.prompt_templates import get_system_prompt
+    from countries.models import Country, CountryBrief
+
+    if not CountryBrief.objects.exists():
+        print('No country briefs; run `AI_FAKE_LLM=True python manage.py build_country_briefs` first.')
+        return
+
+    names = dict(Country.objects.filter(code__in=COUNTRIES).values_list('code', 'name'))
+    questions = [
+        (code, question.format(country=names[code]))
+        for code in names
+        for question in OVERVIEW_QUESTIONS + DETAIL_QUESTIONS
+    ]
+
+    print(f"{len(questions)} chat questions over {len(names)} countries "
+          f"({len(OVERVIEW_QUESTIONS)} overview + {len(DETAIL_QUESTIONS)} detail each)")
+    print(f"{'retrieval':<12}{'mean tok':>10}{'p90 tok':>9}  tiers")
+    original = settings.AI_RAG_BRIEFS
+    try:
+        for label, briefs in (('chunks', False), ('tiered', True)):
+            settings.AI_RAG_BRIEFS = briefs
+            sizes = []
+            tiers = Counter()
+            for code, message in questions:
+                template_text, context, _, _ = ai_service._build_chat(
+                    message, 'helpful', {}, code, True, [], None
+                )
+                prompt = ai_service._render_prompt(template_text, context)
+                sizes.append(count_tokens(get_system_prompt('base')) + count_tokens(prompt))
+                tiers[context.get('rag_tier')] += 1
+            sizes.sort()
+            print(f"{label:<12}{mean(sizes):>10.0f}{sizes[int(len(sizes) * 0.9)]:>9}  {dict(tiers)}")
+    finally:
+        settings.AI_RAG_BRIEFS = original
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""
+N-way country comparison: latency and provider calls.
+
+With the fake LLM's per-call latency, first times a cold comparison of 2 to
+5 countries (fact sheets run in parallel, so latency should stay close to
+two calls whatever N is). Then replays a workload of random 2-4 country
+comparisons in random order and counts provider calls per mode: repeated
+country sets in any order hit the comparison cache, and new sets reuse the
+cached fact sheets of countries already seen.
+
+Usage:
+    python benchmarks/bench_compare.py
+    python benchmarks/bench_compare.py --requests 60 --first-token-latency 0.8
+"""
+import os
+import sys
+import time
+import random
+import argparse
+from pathlib import Path
+from collections import Counter
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'japaguide.settings')
+os.environ['AI_FAKE_LLM'] = 'True'
+
+SESSION_ID = 'bench-compare'
+COUNTRIES = ['CAN', 'GBR', 'DEU', 'AUS', 'USA', 'IRL']
+METRICS = ['cost', 'job_market', 'pr_time', 'quality_of_life']
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='N-way comparison latency and provider calls')
+    parser.add_argument('--requests', type=int, default=40)
+    parser.add_argument('--first-token-latency', type=float, default=0.5)
+    parser.add_argument('--seed', type=int, default=7)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    os.environ['AI_FAKE_LLM_FIRST_TOKEN_LATENCY'] = str(args.first_token_latency)
+    os.environ['AI_FAKE_LLM_TOKEN_LATENCY'] = '0'
+
+    import django
+    django.setup()
+    from django.core.cache import caches
+    from django.db import transaction
+    from ai.services import ai_service
+    from ai.request_log import request_log
+    from ai.models import AIRequest
+
+    rng = random.Random(args.seed)
+    calls = Counter()
+    create = ai_service.client.chat.completions.create
+
+    def counting_create(**kwargs):
+        prompt = kwargs['messages'][-1]['content']
+        calls['compare_facts' if prompt.startswith('Extract an immigration fact sheet') else 'compare'] += 1
+        return create(**kwargs)
+
+    ai_service.client.chat.completions.create = counting_create
+    caches['ai'].clear()
+    try:
+        print(f"Cold comparisons (provider call latency {args.first_token_latency}s)")
+        for n in range(2, 6):
+            caches['ai'].clear()
+            start = time.perf_counter()
+            ai_service.compare_countries(COUNTRIES[:n], metrics=METRICS, session_id=SESSION_ID)
+            print(f"  {n} countries: {time.perf_counter() - start:.2f}s")
+
+        caches['ai'].clear()
+        calls.clear()
+        cached = 0
+        start = time.perf_counter()
+        for _ in range(args.requests):
+            codes = rng.sample(COUNTRIES, rng.randint(2, 4))
+            result = ai_service.compare_countries(codes, metrics=METRICS, session_id=SESSION_ID)
+            cached += bool(result.get('cached'))
+        elapsed = time.perf_counter() - start
+    finally:
+        ai_service.client.chat.completions.create = create
+        request_log.flush()
+        with transaction.atomic():
+            AIRequest.objects.filter(session_id=SESSION_ID).delete()
+
+    print(f"\n{args.requests} random 2-4 country comparisons in {elapsed:.1f}s "
+          f"({cached} served from the comparison cache)")
+    print(f"  provider calls: {calls['compare_facts']} fact sheets (of {len(COUNTRIES)} countries), "
+          f"{calls['compare']} comparisons")
+
+
+if __name__ == '__main__':
+    main()
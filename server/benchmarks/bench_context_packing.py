@@ -0,0 +1,87 @@
+"""
+Prompt sizes after token-budgeted context packing.
+
+Builds chat prompts (short to very long conversation histories, with and
+without a country) and comparison fact sheet prompts for a few countries,
+and reports per mode the budget, the p50/max locally counted prompt tokens,
+how often a prompt went over budget, and how many retrieved documents and
+history turns were kept. Nothing is sent to a model.
+
+Usage:
+    python benchmarks/bench_context_packing.py
+"""
+import os
+import sys
+from pathlib import Path
+from collections import defaultdict
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'japaguide.settings')
+os.environ['AI_FAKE_LLM'] = 'True'
+
+COUNTRIES = ['CAN', 'GBR', 'DEU', 'AUS']
+QUESTIONS = [
+    'Which work visas could a nurse get in {country}?',
+    'How much money do I need to relocate to {country}?',
+    'Can my family come with me to {country}?',
+    'How long before I can get permanent residency in {country}?',
+]
+TURN = 'I am a nurse with five years of experience and I want to move with my family. '
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def main():
+    import django
+    django.setup()
+    from ai.services import ai_service
+    from ai.context_packer import context_budget
+    from ai.tokenizer import count_tokens
+    from ai.prompt_templates import get_system_prompt
+    from countries.models import Country
+
+    names = dict(Country.objects.filter(code__in=COUNTRIES).values_list('code', 'name'))
+    sizes = defaultdict(list)
+    kept = defaultdict(lambda: [0, 0])
+
+    def measure(mode, template_text, context):
+        prompt = ai_service._render_prompt(template_text, context)
+        sizes[mode].append(count_tokens(get_system_prompt(context.get('context_type', 'base'))) + count_tokens(prompt))
+        for name, segment in context['context_packing'].items():
+            if isinstance(segment, dict):
+                kept[(mode, name)][0] += segment['kept']
+                kept[(mode, name)][1] += segment['items']
+
+    for code in COUNTRIES + [None]:
+        for question in QUESTIONS:
+            for turns, repeat in ((0, 1), (6, 2), (6, 40)):
+                history = [
+                    {'role': 'user' if i % 2 == 0 else 'assistant', 'content': TURN * repeat}
+                    for i in range(turns)
+                ]
+                message = question.format(country=names.get(code, 'Canada'))
+                template_text, context, _, _ = ai_service._build_chat(
+                    message, 'helpful', {}, code, True, history, None
+                )
+                measure('general', template_text, context)
+
+    for code in COUNTRIES:
+        for metrics in (['cost', 'jobs'], ['visas', 'family', 'healthcare', 'safety']):
+            template_text, context, _ = ai_service._build_fact_sheet(code, metrics)
+            measure('compare_facts', template_text, context)
+
+    print(f"{'mode':<15}{'prompts':>9}{'budget':>8}{'p50':>7}{'max':>7}{'over':>6}")
+    for mode, values in sizes.items():
+        budget = context_budget(mode)
+        over = sum(1 for v in values if v > budget)
+        print(f"{mode:<15}{len(values):>9}{budget:>8}{percentile(values, 0.5):>7}{max(values):>7}{over:>6}")
+    print()
+    for (mode, name), (kept_items, items) in kept.items():
+        print(f"{mode:<15}{name:<12}kept {kept_items}/{items} items")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+"""
+Interactive latency during a batch flood, with and without priority dispatch.
+
+A pool of threads issues 'batch' completions non-stop (like a bulk document
+regeneration) while a trickle of 'interactive' completions arrive, all
+against the fake LLM under a shared request-rate limit. With priorities the
+batch class may only use the bucket above its reserve and yields to
+rate-limited interactive callers; 'flat' runs everything as one class for
+comparison. Prints queue-time percentiles from ai/dispatcher.py's metrics.
+
+Usage:
+    python benchmarks/bench_dispatcher.py
+    python benchmarks/bench_dispatcher.py --rate 10 --batch-threads 16 --seconds 10
+"""
+import os
+import sys
+import time
+import argparse
+import threading
+import statistics
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'japaguide.settings')
+os.environ['AI_FAKE_LLM'] = 'True'
+os.environ['AI_FAKE_LLM_FIRST_TOKEN_LATENCY'] = '0.2'
+os.environ['AI_FAKE_LLM_TOKEN_LATENCY'] = '0'
+
+SESSION_ID = 'bench-dispatcher'
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Priority dispatch under a batch flood')
+    parser.add_argument('--rate', type=float, default=10, help='Shared requests per second')
+    parser.add_argument('--batch-threads', type=int, default=16)
+    parser.add_argument('--interactive-every', type=float, default=0.5, help='Seconds between interactive calls')
+    parser.add_argument('--seconds', type=float, default=8)
+    return parser.parse_args()
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def main():
+    args = parse_args()
+
+    import django
+    django.setup()
+    from django.db import close_old_connections
+    from ai import dispatcher
+    from ai.models import AIRequest
+    from ai.request_log import request_log
+    from ai.services import ai_service
+
+    def run(label, batch_priority):
+        dispatcher.llm_dispatcher = dispatcher.LLMDispatcher(
+            concurrency={'interactive': 32, 'roadmap': 8, 'batch': args.batch_threads},
+            rate=args.rate, burst=args.rate,
+        )
+        # services imported the module-level instance
+        import ai.services
+        ai.services.llm_dispatcher = dispatcher.llm_dispatcher
+        dispatcher.reset()
+
+        stop = time.monotonic() + args.seconds
+        counter = iter(range(10 ** 9))
+
+        def call(priority):
+            start = time.perf_counter()
+            ai_service.complete(
+                template_text='{{message}}', context={'message': f'{label} {next(counter)}'},
+                use_cache=False, session_id=SESSION_ID, priority=priority
+            )
+            close_old_connections()
+            return time.perf_counter() - start
+
+        def batch_worker():
+            while time.monotonic() < stop:
+                call(batch_priority)
+
+        workers = [threading.Thread(target=batch_worker) for _ in range(args.batch_threads)]
+        for worker in workers:
+            worker.start()
+        interactive = []
+        while time.monotonic() < stop:
+            interactive.append(call('interactive'))
+            time.sleep(args.interactive_every)
+        for worker in workers:
+            worker.join()
+
+        stats = dispatcher.snapshot()
+        batch = stats[batch_priority]
+        print(
+            f"{label:<10}{statistics.median(interactive):>10.2f}{percentile(interactive, 95):>10.2f}"
+            f"{stats['interactive']['p95_queue_seconds'] or 0:>12.2f}{batch['calls']:>8}"
+            f"{batch['p95_queue_seconds'] or 0:>12.2f}"
+        )
+
+    print(f"{args.rate:g} req/s shared, {args.batch_threads} batch threads, fake LLM 0.2s per call")
+    print(f"{'run':<10}{'int p50 s':>10}{'int p95 s':>10}{'int q p95 s':>12}{'batch n':>8}{'batch q p95':>12}")
+    try:
+        # 'flat': the flood runs in the interactive class, so nothing is reserved
+        run('flat', 'interactive')
+        run('priority', 'batch')
+    finally:
+        request_log.flush()
+        AIRequest.objects.filter(session_id=SESSION_ID).delete()
+
+
+if __name__ == '__main__':
+    main()
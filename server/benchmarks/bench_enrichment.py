@@ -0,0 +1,109 @@
+"""
+Roadmap enrichment wall time: one prompt for all steps vs parallel chunks.
+
+Creates a throwaway roadmap with --steps steps and runs
+enrich_roadmap_with_ai() against the fake LLM, whose answer time grows with
+the length of the JSON it returns (as a real model's does). A second pass
+corrupts one chunk's answer on its first attempt to show that only its
+steps are retried. The roadmap and its AIRequest rows are deleted after.
+
+Usage:
+    python benchmarks/bench_enrichment.py
+    python benchmarks/bench_enrichment.py --steps 10 --token-latency 0.02
+"""
+import os
+import sys
+import time
+import argparse
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'japaguide.settings')
+os.environ['AI_FAKE_LLM'] = 'True'
+
+SESSION_ID = 'bench-enrichment'
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Single-prompt vs chunked roadmap enrichment')
+    parser.add_argument('--steps', type=int, default=10, help='Steps in the roadmap')
+    parser.add_argument('--first-token-latency', type=float, default=0.5)
+    parser.add_argument('--token-latency', type=float, default=0.02)
+    parser.add_argument('--chunk-size', type=int, default=2)
+    parser.add_argument('--concurrency', type=int, default=5)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    os.environ['AI_FAKE_LLM_FIRST_TOKEN_LATENCY'] = str(args.first_token_latency)
+    os.environ['AI_FAKE_LLM_TOKEN_LATENCY'] = str(args.token_latency)
+
+    import django
+    django.setup()
+    from django.conf import settings
+    from ai.fake_llm import default_response
+    from ai.models import AIRequest
+    from ai.request_log import request_log
+    from ai.services import ai_service
+    from countries.models import Country
+    from roadmaps.models import Roadmap, RoadmapStep
+    from roadmaps.tasks import enrich_roadmap_with_ai
+
+    country = Country.objects.first()
+    if country is None:
+        sys.exit('No countries in the database; load data first')
+
+    roadmap = Roadmap.objects.create(
+        session_id=SESSION_ID, is_anonymous=True, title='Enrichment benchmark',
+        country=country, goal='work', ai_tone='helpful',
+    )
+    steps = RoadmapStep.objects.bulk_create([
+        RoadmapStep(roadmap=roadmap, order=i, title=f'Step {i}', description='Do the thing')
+        for i in range(1, args.steps + 1)
+    ])
+
+    def run(label, chunk_size, concurrency, response=default_response):
+        RoadmapStep.objects.filter(roadmap=roadmap).update(ai_enhanced=False, enrichment_version=0)
+        # A fresh profile per run keeps the enrichment and completion caches
+        # out of the timing
+        Roadmap.objects.filter(pk=roadmap.pk).update(
+            enrichment_version=0, profile_snapshot={'education_level': f'bench-{time.time_ns()}'}
+        )
+        settings.ROADMAP_ENRICHMENT_CHUNK_SIZE = chunk_size
+        settings.ROADMAP_ENRICHMENT_CONCURRENCY = concurrency
+        ai_service.client.response = response
+        calls = ai_service.client.calls
+        start = time.perf_counter()
+        result = enrich_roadmap_with_ai(roadmap.id)
+        elapsed = time.perf_counter() - start
+        print(
+            f"{label:<24}{elapsed:>9.2f}{ai_service.client.calls - calls:>7}"
+            f"{result.get('steps_enhanced', 0):>10}{result.get('steps_failed', 0):>8}"
+        )
+
+    # Drop the first step's enrichment the first time it is asked for
+    seen = set()
+
+    def flaky_response(messages):
+        answer = default_response(messages)
+        first_id = str(steps[0].id)
+        if f'(ID: {first_id})' in messages[-1]['content'] and first_id not in seen:
+            seen.add(first_id)
+            return answer.replace(f'"step_id": {first_id},', '"step_id": null,', 1)
+        return answer
+
+    print(f"{args.steps} steps, fake LLM {args.first_token_latency}s + {args.token_latency}s/token")
+    print(f"{'run':<24}{'wall s':>9}{'calls':>7}{'enhanced':>10}{'failed':>8}")
+    try:
+        run('single prompt', 0, 1)
+        run(f'chunks of {args.chunk_size} x{args.concurrency}', args.chunk_size, args.concurrency)
+        run('chunks, one bad answer', args.chunk_size, args.concurrency, flaky_response)
+    finally:
+        request_log.flush()
+        AIRequest.objects.filter(session_id=SESSION_ID).delete()
+        roadmap.delete()
+
+
+if __name__ == '__main__':
+    main()
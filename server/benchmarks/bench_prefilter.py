@@ -0,0 +1,157 @@
+"""
+Chat pre-filter: route accuracy and saved provider calls on a replay corpus.
+
+Replays a labelled corpus of chat messages (greetings and thanks, off-topic
+requests, requests for illegal routes, paraphrased FAQ questions and real
+migration questions) through the pre-filter with the curated FAQ fixture
+loaded, and reports per route how many messages were expected and routed
+there, the share of messages answered without the model (saved calls), and
+false saves: messages that needed the model but were answered locally.
+Nothing is sent to a model and the fixture is rolled back afterwards.
+
+Usage:
+    python benchmarks/bench_prefilter.py
+    python benchmarks/bench_prefilter.py --threshold 0.7
+"""
+import os
+import sys
+import argparse
+from pathlib import Path
+from collections import Counter
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'japaguide.settings')
+os.environ['AI_FAKE_LLM'] = 'True'
+
+# (message, expected route)
+CORPUS = [
+    ('hi', 'greeting'),
+    ('Hello!', 'greeting'),
+    ('hey there', 'greeting'),
+    ('Good morning', 'greeting'),
+    ('hi, how are you?', 'greeting'),
+    ("What's up bot", 'greeting'),
+    ('thanks!', 'greeting'),
+    ('Thank you so much', 'greeting'),
+    ('ok thanks, bye', 'greeting'),
+    ('cheers mate', 'greeting'),
+    ("Thanks so much, see you later", 'greeting'),
+    ('how far', 'greeting'),
+    ('Give me a jollof rice recipe', 'off_topic'),
+    ('Who won the Champions League final?', 'off_topic'),
+    ('Tell me a joke', 'off_topic'),
+    ('Should I buy bitcoin now?', 'off_topic'),
+    ('Write a poem about the sea', 'off_topic'),
+    ('Help me fix my python code', 'off_topic'),
+    ('Recommend a good Netflix series', 'off_topic'),
+    ('What is my horoscope for today?', 'off_topic'),
+    ('Where can I get a fake bank statement for my visa?', 'refused'),
+    ('How do I cross into the US illegally?', 'refused'),
+    ('Can I bribe the embassy officer?', 'refused'),
+    ('How to get around the IELTS requirement without taking the test', 'refused'),
+    ('I want to buy a UK work permit', 'refused'),
+    ('Can I lie on my visa application about my job?', 'refused'),
+    ('Can you make me a fake degree certificate?', 'refused'),
+    ('What does japa mean?', 'faq'),
+    ('what is the meaning of japa', 'faq'),
+    ('What can you do?', 'faq'),
+    ('How can you help me?', 'faq'),
+    ('Are you a lawyer?', 'faq'),
+    ('Is this legal advice?', 'faq'),
+    ('Can you guarantee my visa will be approved?', 'faq'),
+    ('Which countries do you cover?', 'faq'),
+    ('Are you a bot?', 'faq'),
+    ('Am I talking to a real person?', 'faq'),
+    ('Is a work permit the same as a visa in Canada?', 'faq'),
+    ('What is the UK Health and Care Worker visa?', 'faq'),
+    ('What is the EU Blue Card in Germany?', 'faq'),
+    ('What is the student visa subclass 500 in Australia?', 'faq'),
+    ('How can I become a Canadian citizen?', 'faq'),
+    ('Which work visas could a nurse get in Canada?', 'llm'),
+    ('How much money do I need to relocate to Germany?', 'llm'),
+    ('Can my wife and kids come with me to the UK?', 'llm'),
+    ('How long does it take to get permanent residency in Australia?', 'llm'),
+    ('What are the requirements for the EU Blue Card in Germany?', 'llm'),
+    ('How long does the UK Health and Care Worker visa take?', 'llm'),
+    ('Who can apply for the UK Health and Care Worker visa?', 'llm'),
+    ('Can I work while studying on a subclass 500 visa in Australia?', 'llm'),
+    ('Compare Canada and Australia for software engineers', 'llm'),
+    ('I am a nurse with 5 years experience, where should I go?', 'llm'),
+    ('Is it cheaper to study in Ireland or Germany?', 'llm'),
+    ('What jobs are in demand in New Zealand?', 'llm'),
+    ('Hi, I want to move to Canada with my family', 'llm'),
+    ('Thanks! And how much is the visa fee for Canada?', 'llm'),
+    ('Can I bring my dog when I move to Portugal?', 'llm'),
+    ('What is the cost of living in Toronto?', 'llm'),
+    ('Which country is easiest for a football coach to work in?', 'llm'),
+    ('Can I study cooking in France on a student visa?', 'llm'),
+    ('What happens if my work permit expires in Canada?', 'llm'),
+    ('Do I need IELTS to study in the UK?', 'llm'),
+    ('How do I apply for Canadian citizenship?', 'llm'),
+    ('What visa do I need to visit Japan as a tourist?', 'llm'),
+    ('hi how much is it', 'llm'),
+    ("What's up with the Canada visa backlog?", 'llm'),
+    ('They said I submitted a fake bank statement, what do I do?', 'llm'),
+    ('How do I spot a fake job offer?', 'llm'),
+    ('I think my agent gave me a forged visa, help', 'llm'),
+]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Chat pre-filter routing on a replay corpus')
+    parser.add_argument('--threshold', type=float, default=None,
+                        help='FAQ similarity threshold (default: AI_PREFILTER_FAQ_THRESHOLD)')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    import django
+    django.setup()
+    from django.conf import settings
+    from django.core.management import call_command
+    from django.db import transaction
+    from ai.services import ai_service, PERSONALITY_INTROS
+    from ai.prefilter import route_message
+    from ai.metrics import ROUTES
+
+    if args.threshold is not None:
+        settings.AI_PREFILTER_FAQ_THRESHOLD = args.threshold
+
+    expected = Counter()
+    routed = Counter()
+    correct = Counter()
+    mistakes = []
+    with transaction.atomic():
+        call_command('loaddata', 'faq', verbosity=0)
+        for message, label in CORPUS:
+            result = route_message(
+                message, PERSONALITY_INTROS['helpful'], ai_service._extract_countries_from_message(message)
+            )
+            route = result['route']
+            expected[label] += 1
+            routed[route] += 1
+            if route == label:
+                correct[label] += 1
+            else:
+                mistakes.append((message, label, route, result.get('score')))
+        transaction.set_rollback(True)
+
+    total = len(CORPUS)
+    print(f"{total} messages, FAQ threshold {settings.AI_PREFILTER_FAQ_THRESHOLD}")
+    print(f"{'route':<12}{'expected':>10}{'routed':>8}{'correct':>9}")
+    for route in ROUTES:
+        print(f"{route:<12}{expected[route]:>10}{routed[route]:>8}{correct[route]:>9}")
+
+    saved = total - routed['llm']
+    false_saves = [m for m in mistakes if m[1] == 'llm']
+    print(f"\nsaved calls: {saved}/{total} ({saved / total:.0%}; "
+          f"{(total - expected['llm']) / total:.0%} possible)")
+    print(f"false saves (needed the model): {len(false_saves)}")
+    for message, label, route, score in mistakes:
+        print(f"  expected {label:<10} got {route:<10}{'' if score is None else f' ({score})'}  {message}")
+
+
+if __name__ == '__main__':
+    main()
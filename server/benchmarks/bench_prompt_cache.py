@@ -0,0 +1,142 @@
+"""
+Provider prompt-cache hit ratio for chat, compare and roadmap enrichment.
+
+Replays a corpus of multi-turn chats (several users with different tones
+and questions about a few countries), country comparisons and roadmap
+enrichment chunks through the AI service with the fake LLM, whose
+PrefixCache emulates DeepSeek context caching (longest already-sent prompt
+prefix, in 64-token units). Reports the share of prompt tokens that were
+cache hits per mode; DeepSeek bills those at a fraction of the miss rate.
+
+Usage:
+    python benchmarks/bench_prompt_cache.py
+    python benchmarks/bench_prompt_cache.py --users 24 --turns 4
+"""
+import os
+import sys
+import random
+import argparse
+from pathlib import Path
+from collections import defaultdict
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'japaguide.settings')
+os.environ['AI_FAKE_LLM'] = 'True'
+os.environ['AI_FAKE_LLM_FIRST_TOKEN_LATENCY'] = '0'
+os.environ['AI_FAKE_LLM_TOKEN_LATENCY'] = '0'
+
+SESSION_ID = 'bench-prompt-cache'
+COUNTRIES = ['CAN', 'GBR', 'DEU', 'AUS']
+TONES = ['helpful', 'uncle_japa', 'bestie', 'therapist']
+QUESTIONS = [
+    'As a {job}, which work visas could I get in {country}?',
+    'How much money does a {job} need to relocate to {country}?',
+    'Can my family come with me to {country} if I move as a {job}?',
+    'How long before a {job} can get permanent residency in {country}?',
+    'Is it hard for a {job} to find a job in {country}?',
+]
+JOBS = ['nurse', 'software engineer', 'accountant', 'teacher', 'electrician', 'pharmacist']
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Provider prompt-cache hit ratio')
+    parser.add_argument('--users', type=int, default=12)
+    parser.add_argument('--turns', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=7)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    import django
+    django.setup()
+    from django.db import transaction
+    from ai.services import ai_service
+    from ai.request_log import request_log
+    from ai.models import AIRequest
+    from countries.models import Country
+    from roadmaps.materialize import GENERIC_STEPS
+    from roadmaps.tasks import ENRICHMENT_TEMPLATE
+
+    rng = random.Random(args.seed)
+    totals = defaultdict(lambda: [0, 0, 0])
+
+    # Count what the emulated provider cache saw, per mode
+    prefix_cache = ai_service.client.prefix_cache
+    hit_tokens = prefix_cache.hit_tokens
+    current = {'mode': None}
+
+    def counting_hit_tokens(messages):
+        hit = hit_tokens(messages)
+        prompt = sum(max(1, len(m.get('content', '')) // 4) for m in messages if m.get('content'))
+        row = totals[current['mode']]
+        row[0] += 1
+        row[1] += prompt
+        row[2] += min(hit, prompt)
+        return hit
+
+    prefix_cache.hit_tokens = counting_hit_tokens
+
+    names = dict(Country.objects.filter(code__in=COUNTRIES).values_list('code', 'name'))
+    try:
+        current['mode'] = 'general'
+        for user in range(args.users):
+            tone = TONES[user % len(TONES)]
+            job = JOBS[user % len(JOBS)]
+            code = rng.choice(COUNTRIES)
+            history = []
+            for turn in range(args.turns):
+                question = rng.choice(QUESTIONS).format(job=job, country=names.get(code, code))
+                result = ai_service.chat(
+                    f'{question} (user {user}, turn {turn})', tone=tone, session_id=SESSION_ID,
+                    country_code=code, conversation_history=history
+                )
+                history += [
+                    {'role': 'user', 'content': question},
+                    {'role': 'assistant', 'content': result['answer']},
+                ]
+
+        current['mode'] = 'compare'
+        metrics_choices = [['cost', 'jobs'], ['visas', 'family'], ['cost', 'safety', 'healthcare']]
+        for i in range(args.users):
+            ai_service.compare_countries(
+                rng.sample(COUNTRIES, 2), metrics=rng.choice(metrics_choices),
+                user_profile={'user': i}, session_id=SESSION_ID
+            )
+
+        current['mode'] = 'roadmap_enrich'
+        steps = [
+            {'id': i, 'order': i, 'title': step['title'], 'description': step['description']}
+            for i, step in enumerate(GENERIC_STEPS, 1)
+        ]
+        for user in range(args.users):
+            country = names.get(rng.choice(COUNTRIES))
+            tone = TONES[user % len(TONES)]
+            for start in range(0, len(steps), 2):
+                ai_service.complete(
+                    template_text=ENRICHMENT_TEMPLATE,
+                    context={
+                        'goal': 'work', 'country': country, 'tone': tone,
+                        'profile': {'education_level': JOBS[user % len(JOBS)], 'years_experience': user},
+                        'steps': steps[start:start + 2],
+                        'all_steps': [step['title'] for step in steps],
+                        'mode': 'roadmap_enrich', 'temperature': 0.7, 'max_tokens': 2000,
+                    },
+                    use_cache=False, session_id=SESSION_ID, priority='roadmap'
+                )
+    finally:
+        prefix_cache.hit_tokens = hit_tokens
+        request_log.flush()
+        with transaction.atomic():
+            AIRequest.objects.filter(session_id=SESSION_ID).delete()
+
+    print(f"{args.users} users x {args.turns} chat turns, {args.users} comparisons, "
+          f"{args.users} roadmaps in chunks of 2 steps")
+    print(f"{'mode':<16}{'calls':>7}{'prompt tok':>12}{'hit tok':>10}{'hit ratio':>11}")
+    for mode, (calls, prompt, hit) in totals.items():
+        print(f"{mode:<16}{calls:>7}{prompt:>12}{hit:>10}{hit / prompt if prompt else 0:>11.0%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""
+Completion latency with synchronous vs write-behind AIRequest logging.
+
+Calls AIService.complete() against the fake LLM (zero latency, cache off)
+with a RAG-sized prompt, so the time measured is prompt rendering plus
+request logging. 'sync' inserts a row per call; 'buffer' queues it for the
+background writer in ai/request_log.py. Rows are tagged and deleted after.
+
+Usage:
+    python benchmarks/bench_request_log.py
+    python benchmarks/bench_request_log.py --calls 500 --threads 8
+"""
+import os
+import sys
+import time
+import argparse
+import statistics
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'japaguide.settings')
+os.environ['AI_FAKE_LLM'] = 'True'
+os.environ['AI_FAKE_LLM_FIRST_TOKEN_LATENCY'] = '0'
+os.environ['AI_FAKE_LLM_TOKEN_LATENCY'] = '0'
+
+SESSION_ID = 'bench-request-log'
+TEMPLATE = """{{personality_intro}}
+
+{{retrieved_documents}}
+
+User's current question: {{message}}
+
+{{tone_instructions}}"""
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Sync vs write-behind AIRequest logging')
+    parser.add_argument('--calls', type=int, default=300, help='Completions per mode and concurrency')
+    parser.add_argument('--threads', type=int, default=8, help='Concurrent callers for the threaded run')
+    return parser.parse_args()
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def main():
+    args = parse_args()
+
+    import django
+    django.setup()
+    from django.db import close_old_connections
+    from ai.models import AIRequest
+    from ai.services import ai_service
+    from ai.request_log import request_log
+
+    # Roughly what five retrieved passages add to a chat prompt
+    documents = ('Skilled workers can apply for permanent residence through Express Entry. ' * 60)
+
+    def call(i):
+        start = time.perf_counter()
+        ai_service.complete(
+            template_text=TEMPLATE,
+            context={'message': f'question {i}', 'retrieved_documents': documents},
+            use_cache=False,
+            session_id=SESSION_ID,
+        )
+        elapsed = (time.perf_counter() - start) * 1000
+        close_old_connections()
+        return elapsed
+
+    print(f"{args.calls} completions per run, fake LLM with no latency")
+    print(f"{'mode':<8}{'threads':>8}{'p50 ms':>9}{'p99 ms':>9}{'flush ms':>10}{'rows':>7}")
+
+    try:
+        for threads in (1, args.threads):
+            for mode in ('sync', 'buffer'):
+                request_log.mode = mode
+                before = AIRequest.objects.filter(session_id=SESSION_ID).count()
+                with ThreadPoolExecutor(max_workers=threads) as pool:
+                    latencies = list(pool.map(call, range(args.calls)))
+                start = time.perf_counter()
+                request_log.flush()
+                flush_ms = (time.perf_counter() - start) * 1000
+                rows = AIRequest.objects.filter(session_id=SESSION_ID).count() - before
+                print(
+                    f"{mode:<8}{threads:>8}{percentile(latencies, 50):>9.2f}"
+                    f"{percentile(latencies, 99):>9.2f}{flush_ms:>10.1f}{rows:>7}"
+                )
+    finally:
+        request_log.flush()
+        AIRequest.objects.filter(session_id=SESSION_ID).delete()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+"""
+Chat completion success rate and latency under injected provider faults,
+with and without the resilience layer (ai/resilience.py).
+
+Each scenario injects faults into the fake LLM (ai/fake_llm.py FaultPlan):
+
+- errors:  a share of calls fail with a 500
+- tail:    a small share of calls are very slow
+- outage:  the provider hangs on every call
+
+'bare' makes one attempt per call with no retries, hedging or breaker (only
+the deadline, as a client timeout); 'resilient' uses the configured
+retries, hedging and circuit breaker. Both use ``--deadline`` for the chat
+mode so the outage runs stay short. Calls run from a few threads, as concurrent
+chat requests would.
+
+Usage:
+    python benchmarks/bench_resilience.py
+    python benchmarks/bench_resilience.py --calls 300 --error-rate 0.3
+"""
+import os
+import sys
+import time
+import argparse
+import statistics
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'japaguide.settings')
+os.environ['AI_FAKE_LLM'] = 'True'
+os.environ['AI_FAKE_LLM_FIRST_TOKEN_LATENCY'] = '0.1'
+os.environ['AI_FAKE_LLM_TOKEN_LATENCY'] = '0'
+
+SESSION_ID = 'bench-resilience'
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Provider resilience under injected faults')
+    parser.add_argument('--calls', type=int, default=200, help='Completions per scenario and run')
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--error-rate', type=float, default=0.2)
+    parser.add_argument('--slow-rate', type=float, default=0.03)
+    parser.add_argument('--slow-latency', type=float, default=3.0)
+    parser.add_argument('--deadline', type=float, default=2.0, help='Chat deadline in seconds')
+    return parser.parse_args()
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def main():
+    args = parse_args()
+
+    import django
+    django.setup()
+    from django.conf import settings
+    from django.db import close_old_connections
+    import ai.services
+    from ai import resilience
+    from ai.fake_llm import FaultPlan
+    from ai.models import AIRequest
+    from ai.request_log import request_log
+    from ai.services import ai_service
+
+    scenarios = {
+        'errors': dict(error_rate=args.error_rate, seed=1),
+        'tail': dict(slow_rate=args.slow_rate, slow_latency=args.slow_latency, seed=2),
+        'outage': dict(slow_rate=1.0, slow_latency=3600, seed=3),
+    }
+
+    def run(scenario, label, resilient):
+        faults = FaultPlan(**scenarios[scenario])
+        ai_service.client.faults = faults
+        breaker = resilience.CircuitBreaker(
+            # 'bare' never opens the circuit
+            failure_threshold=settings.AI_CIRCUIT_FAILURE_THRESHOLD if resilient else float('inf'),
+            reset_timeout=settings.AI_CIRCUIT_RESET_SECONDS,
+        )
+        provider = resilience.ResilientProvider(
+            breaker, {**settings.AI_PROVIDER_DEADLINES, 'general': args.deadline},
+            max_retries=settings.AI_PROVIDER_MAX_RETRIES if resilient else 0,
+            backoff=settings.AI_PROVIDER_BACKOFF,
+            hedge=resilient,
+        )
+        # services imported the module-level instance
+        ai.services.provider = provider
+
+        # Warm-up: latency samples for the hedge threshold, without faults
+        ai_service.client.faults = FaultPlan()
+        for i in range(resilience.HEDGE_MIN_SAMPLES):
+            call(f'warmup {label} {scenario} {i}')
+        ai_service.client.faults = faults
+
+        with ThreadPoolExecutor(max_workers=args.threads) as pool:
+            results = list(pool.map(call, [f'{label} {scenario} {i}' for i in range(args.calls)]))
+        latencies = [seconds for _, seconds in results]
+        ok = sum(1 for success, _ in results if success)
+        stats = provider.snapshot()
+        print(
+            f"{scenario:<10}{label:<11}{ok / len(results):>8.0%}{statistics.median(latencies):>9.2f}"
+            f"{percentile(latencies, 95):>9.2f}{max(latencies):>9.2f}"
+            f"{stats['retries']:>9}{stats['hedges']:>8}{stats['rejected']:>10}"
+        )
+
+    def call(message):
+        start = time.perf_counter()
+        result = ai_service.complete(
+            template_text='{{message}}', context={'message': message},
+            use_cache=False, session_id=SESSION_ID
+        )
+        close_old_connections()
+        return 'error' not in result, time.perf_counter() - start
+
+    print(
+        f"{args.calls} calls x {args.threads} threads, fake LLM 0.1s, {args.error_rate:.0%} errors, "
+        f"{args.slow_rate:.0%} of calls +{args.slow_latency:g}s, {args.deadline:g}s deadline"
+    )
+    print(f"{'scenario':<10}{'run':<11}{'success':>8}{'p50 s':>9}{'p95 s':>9}{'max s':>9}"
+          f"{'retries':>9}{'hedges':>8}{'rejected':>10}")
+    try:
+        for scenario in scenarios:
+            run(scenario, 'bare', False)
+            run(scenario, 'resilient', True)
+    finally:
+        request_log.flush()
+        AIRequest.objects.filter(session_id=SESSION_ID).delete()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,152 @@
+"""
+Offline retrieval-quality and latency benchmark for RAG.
+
+Runs a labeled question set through lexical-only, semantic-only and hybrid
+retrieval (countries/retrieval.py) and reports recall@k plus p50/p99
+retrieval latency, so fusion weights, candidate counts and budgets can be
+tuned for speed against quality. No LLM calls are made.
+
+The first questions are the ones exercised by test_rag.py; the rest are
+paraphrases and per-country questions with labeled expectations. A label is
+(country_code, doc_type); a country of None matches that doc type anywhere.
+
+Usage:
+    python benchmarks/bench_retrieval.py
+    python benchmarks/bench_retrieval.py --runs 50 --budget 1200 --verbose
+"""
+import os
+import sys
+import time
+import argparse
+import statistics
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'japaguide.settings')
+
+
+QUESTIONS = [
+    # From test_rag.py
+    ('How can I work in Canada?', {('CAN', 'work')}),
+    ('Tell me about working in the UK', {('GBR', 'work')}),
+    ('What are the visa requirements for USA?', {('USA', 'work'), ('USA', 'study'), ('USA', 'family')}),
+    ('Compare Canada and Australia for immigration', {('CAN', 'overview'), ('AUS', 'overview')}),
+    ('How to get permanent residency in Germany', {('DEU', 'citizenship'), ('DEU', 'overview')}),
+    ('How to get a work visa?', {(None, 'work')}),
+    ('Student visa requirements', {(None, 'study')}),
+    ('Family reunification process', {(None, 'family')}),
+    ('How to become a citizen?', {(None, 'citizenship')}),
+    ('General overview of immigration', {(None, 'overview')}),
+    ('What are the work visa options in Canada?', {('CAN', 'work')}),
+    # Paraphrases and per-country questions
+    ('Can my wife come with me to Canada?', {('CAN', 'family')}),
+    ('Can I bring my husband to Ireland?', {('IRL', 'family')}),
+    ('Can I sponsor my parents to Canada?', {('CAN', 'family')}),
+    ('Bringing my kids to Portugal', {('PRT', 'family')}),
+    ('UAE family sponsorship', {('ARE', 'family')}),
+    ('Spouse visa for the USA', {('USA', 'family')}),
+    ('My kids want to go to university in Germany', {('DEU', 'study')}),
+    ('Study options in Australia after high school', {('AUS', 'study')}),
+    ('Student life in France', {('FRA', 'study')}),
+    ('Can I work part time while studying in Japan?', {('JPN', 'study')}),
+    ('What jobs can I get in Singapore?', {('SGP', 'work')}),
+    ('Work permit in Switzerland', {('CHE', 'work')}),
+    ('Dubai employment visa', {('ARE', 'work')}),
+    ('Skilled migration to the Netherlands', {('NLD', 'work')}),
+    ('Japan work visa for engineers', {('JPN', 'work')}),
+    ('Citizenship test in the UK', {('GBR', 'citizenship')}),
+    ('How long until I can get a passport in New Zealand?', {('NZL', 'citizenship')}),
+    ('Naturalization requirements for Portugal', {('PRT', 'citizenship')}),
+    ('Is Portugal a good place to live?', {('PRT', 'overview')}),
+    ('South Africa immigration overview', {('ZAF', 'overview')}),
+    ('Cost of living and healthcare in Australia', {('AUS', 'overview')}),
+]
+
+MODES = {
+    'lexical': {'lexical': True, 'semantic': False},
+    'semantic': {'lexical': False, 'semantic': True},
+    'hybrid': {'lexical': True, 'semantic': True},
+}
+KS = (1, 3, 5)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='RAG retrieval recall@k and latency')
+    parser.add_argument('--runs', type=int, default=20, help='Timed repetitions per question')
+    parser.add_argument('--budget', type=int, default=None, help='Token budget (default: chat budget)')
+    parser.add_argument('--verbose', action='store_true', help='Print misses per question')
+    return parser.parse_args()
+
+
+def recall(passages, labels):
+    """Fraction of labels matched by at least one passage."""
+    hit = 0
+    for country, doc_type in labels:
+        if any(
+            p['document'].doc_type == doc_type and (country is None or p['document'].country.code == country)
+            for p in passages
+        ):
+            hit += 1
+    return hit / len(labels)
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def main():
+    args = parse_args()
+
+    import django
+    django.setup()
+    from ai.services import ai_service, RAG_TOKEN_BUDGET
+    from countries.retrieval import hybrid_search
+    from countries.vectors import get_vector_index, build_vector_index
+
+    budget = args.budget or RAG_TOKEN_BUDGET
+    # Map (or build) the index before timing
+    if not get_vector_index()._load():
+        build_vector_index()
+    questions = [
+        (question, labels, ai_service._extract_countries_from_message(question))
+        for question, labels in QUESTIONS
+    ]
+
+    print(f"{len(questions)} questions, {args.runs} timed runs each, budget {budget} tokens\n")
+    header = ''.join(f'{f"R@{k}":>8}' for k in KS)
+    print(f"{'mode':<10}{header}{'R@budget':>10}{'tokens':>8}{'p50 ms':>9}{'p99 ms':>9}")
+
+    for mode, flags in MODES.items():
+        recalls = {k: [] for k in KS}
+        budget_recalls = []
+        tokens = []
+        latencies = []
+
+        for question, labels, countries in questions:
+            # Ranking quality independent of the budget
+            for k in KS:
+                passages = hybrid_search(question, countries, token_budget=10 ** 6, max_passages=k, **flags)
+                recalls[k].append(recall(passages, labels))
+
+            passages = hybrid_search(question, countries, token_budget=budget, **flags)
+            budget_recalls.append(recall(passages, labels))
+            tokens.append(sum(p['tokens'] for p in passages))
+            if args.verbose and budget_recalls[-1] < 1:
+                got = [(p['document'].country.code, p['document'].doc_type) for p in passages]
+                print(f"  {mode} miss: {question!r} expected {sorted(labels, key=str)} got {got}")
+
+            for _ in range(args.runs):
+                start = time.perf_counter()
+                hybrid_search(question, countries, token_budget=budget, **flags)
+                latencies.append((time.perf_counter() - start) * 1000)
+
+        cells = ''.join(f'{statistics.mean(recalls[k]):>8.2f}' for k in KS)
+        print(
+            f"{mode:<10}{cells}{statistics.mean(budget_recalls):>10.2f}"
+            f"{statistics.mean(tokens):>8.0f}{percentile(latencies, 50):>9.2f}{percentile(latencies, 99):>9.2f}"
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""
+Time-to-first-token benchmark for blocking vs streaming (SSE) AI endpoints.
+
+Usage:
+    python benchmarks/bench_streaming.py
+    python benchmarks/bench_streaming.py --first-token-latency 0.8 --token-latency 0.03 --runs 5
+"""
+import os
+import sys
+import time
+import argparse
+import statistics
+from pathlib import Path
+
+# Setup Django with the fake LLM (settings read these at import time)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'japaguide.settings')
+os.environ['AI_FAKE_LLM'] = 'True'
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Blocking vs streaming AI latency')
+    parser.add_argument('--first-token-latency', type=float, default=0.5)
+    parser.add_argument('--token-latency', type=float, default=0.02)
+    parser.add_argument('--runs', type=int, default=3)
+    return parser.parse_args()
+
+
+def measure(client, path, payload, streaming):
+    """Return (time to first byte of answer, total time) in seconds."""
+    start = time.perf_counter()
+    response = client.post(path, payload, content_type='application/json')
+    first = None
+    if streaming:
+        for chunk in response.streaming_content:
+            if first is None and b'event: token' in chunk:
+                first = time.perf_counter() - start
+    else:
+        response.content  # Fully rendered before the view returns
+        first = time.perf_counter() - start
+    return first, time.perf_counter() - start
+
+
+def main():
+    args = parse_args()
+    os.environ['AI_FAKE_LLM_FIRST_TOKEN_LATENCY'] = str(args.first_token_latency)
+    os.environ['AI_FAKE_LLM_TOKEN_LATENCY'] = str(args.token_latency)
+
+    import django
+    django.setup()
+    from django.db import transaction
+    from django.test import Client
+
+    client = Client()
+    cases = [
+        ('chat', '/api/v1/ai/chat/', {'message': 'How can I work in Canada?', 'tone': 'helpful'}),
+        ('compare', '/api/v1/ai/compare/', {'left': 'CAN', 'right': 'AUS'}),
+    ]
+
+    print(f"Fake LLM: first token {args.first_token_latency}s, {args.token_latency}s/token, {args.runs} runs")
+    print(f"{'endpoint':<18}{'ttft p50':>10}{'total p50':>11}")
+
+    with transaction.atomic():
+        for name, path, payload in cases:
+            for streaming in (False, True):
+                url = path + 'stream/' if streaming else path
+                ttft, total = [], []
+                for i in range(args.runs):
+                    # Vary the question terms so every run misses the completion cache
+                    body = dict(payload, metrics=[f'run-{i}-{streaming}']) if name == 'compare' \
+                        else dict(payload, message=f"{payload['message']} (run{i}{streaming})")
+                    first, elapsed = measure(client, url, body, streaming)
+                    ttft.append(first)
+                    total.append(elapsed)
+                label = f"{name}{' (sse)' if streaming else ''}"
+                print(f"{label:<18}{statistics.median(ttft):>9.3f}s{statistics.median(total):>10.3f}s")
+        transaction.set_rollback(True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+"""
+Mock OpenAI-compatible LLM server for load tests.
+
+Serves POST /chat/completions (blocking and ``stream: true``) with simulated
+latency, using the same canned answer as ai/fake_llm.py. Point the backend at
+it with DEEPSEEK_BASE_URL=http://127.0.0.1:<port> and any DEEPSEEK_API_KEY.
+
+Faults for resilience tests: ``--error-rate`` answers a share of requests
+with HTTP 500, ``--slow-rate`` delays a share by ``--slow-latency`` seconds.
+
+Usage:
+    python benchmarks/mock_llm_server.py --port 8900 --latency 1.0
+    python benchmarks/mock_llm_server.py --error-rate 0.2 --slow-rate 0.05 --slow-latency 10
+"""
+import sys
+import json
+import time
+import random
+import argparse
+from pathlib import Path
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from ai.fake_llm import DEFAULT_RESPONSE  # noqa: E402  (plain module, no Django setup needed)
+
+
+class MockLLMHandler(BaseHTTPRequestHandler):
+    latency = 1.0
+    token_latency = 0.0
+    error_rate = 0.0
+    slow_rate = 0.0
+    slow_latency = 5.0
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass  # Keep load-test output clean
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        body = json.loads(self.rfile.read(length) or b'{}')
+        prompt_chars = sum(len(m.get('content', '')) for m in body.get('messages', []))
+        usage = {
+            'prompt_tokens': prompt_chars // 4,
+            'completion_tokens': len(DEFAULT_RESPONSE) // 4,
+            'total_tokens': prompt_chars // 4 + len(DEFAULT_RESPONSE) // 4,
+        }
+        words = DEFAULT_RESPONSE.split(' ')
+        if random.random() < self.error_rate:
+            payload = json.dumps({'error': {'message': 'Injected provider error', 'type': 'server_error'}}).encode()
+            self.send_response(500)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+            return
+        latency = self.latency + (self.slow_latency if random.random() < self.slow_rate else 0)
+
+        if body.get('stream'):
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Connection', 'close')
+            self.end_headers()
+            time.sleep(latency)
+            for i, word in enumerate(words):
+                chunk = {
+                    'id': 'mock', 'object': 'chat.completion.chunk', 'created': int(time.time()),
+                    'model': body.get('model', 'mock'),
+                    'choices': [{'index': 0, 'delta': {'content': word + (' ' if i < len(words) - 1 else '')},
+                                 'finish_reason': None}],
+                }
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                self.wfile.flush()
+                time.sleep(self.token_latency)
+            final = {
+                'id': 'mock', 'object': 'chat.completion.chunk', 'created': int(time.time()),
+                'model': body.get('model', 'mock'), 'choices': [], 'usage': usage,
+            }
+            self.wfile.write(f"data: {json.dumps(final)}\n\ndata: [DONE]\n\n".encode())
+            self.close_connection = True
+            return
+
+        time.sleep(latency + self.token_latency * len(words))
+        payload = json.dumps({
+            'id': 'mock', 'object': 'chat.completion', 'created': int(time.time()),
+            'model': body.get('model', 'mock'),
+            'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': DEFAULT_RESPONSE},
+                         'finish_reason': 'stop'}],
+            'usage': usage,
+        }).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+def serve(port, latency, token_latency=0.0, error_rate=0.0, slow_rate=0.0, slow_latency=5.0):
+    MockLLMHandler.latency = latency
+    MockLLMHandler.token_latency = token_latency
+    MockLLMHandler.error_rate = error_rate
+    MockLLMHandler.slow_rate = slow_rate
+    MockLLMHandler.slow_latency = slow_latency
+    server = ThreadingHTTPServer(('127.0.0.1', port), MockLLMHandler)
+    server.daemon_threads = True
+    server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Mock OpenAI-compatible LLM server')
+    parser.add_argument('--port', type=int, default=8900)
+    parser.add_argument('--latency', type=float, default=1.0, help='Seconds before the response starts')
+    parser.add_argument('--token-latency', type=float, default=0.0, help='Seconds per streamed token')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Share of requests answered with HTTP 500')
+    parser.add_argument('--slow-rate', type=float, default=0.0, help='Share of requests delayed by --slow-latency')
+    parser.add_argument('--slow-latency', type=float, default=5.0, help='Extra seconds for slow requests')
+    args = parser.parse_args()
+    print(f"Mock LLM listening on http://127.0.0.1:{args.port} (latency {args.latency}s)")
+    serve(args.port, args.latency, args.token_latency, args.error_rate, args.slow_rate, args.slow_latency)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""
+Helpers for plain Django async views served under ASGI.
+
+DRF's ``@api_view`` is sync-only, so the async API endpoints are plain Django
+coroutines wrapped with ``async_api_view``, which provides the bits of DRF
+behaviour they rely on: JSON body parsing, JWT/session user resolution,
+CSRF exemption and JSON error responses for validation failures.
+"""
+import json
+import functools
+from asgiref.sync import sync_to_async
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import Http404, JsonResponse
+from rest_framework.exceptions import ValidationError, AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+
+
+def _resolve_user(request):
+    """Return the authenticated user (JWT first, then session) or None."""
+    try:
+        auth = JWTAuthentication().authenticate(request)
+    except (InvalidToken, AuthenticationFailed):
+        return None
+    if auth:
+        return auth[0]
+    user = request.user
+    return user if user.is_authenticated else None
+
+
+async def aget_user(request):
+    """Authenticated user (JWT first, then session) or None, from async code."""
+    return await sync_to_async(_resolve_user)(request)
+
+
+def get_session_id(request, user):
+    """Sync twin of ``aget_session_id`` for the DRF views."""
+    if user:
+        return ''
+    session_id = request.session.session_key or request.META.get('HTTP_X_SESSION_ID', '')
+    if not session_id:
+        request.session.create()
+        session_id = request.session.session_key
+    return session_id
+
+
+async def aget_session_id(request, user):
+    """Session key for anonymous callers, creating a session if needed."""
+    if user:
+        return ''
+    session_id = request.session.session_key or request.META.get('HTTP_X_SESSION_ID', '')
+    if not session_id:
+        await sync_to_async(request.session.create)()
+        session_id = request.session.session_key
+    return session_id
+
+
+def json_response(data, status=200):
+    """JsonResponse that handles Decimals and dates like DRF's renderer."""
+    return JsonResponse(data, status=status, encoder=DjangoJSONEncoder, safe=False)
+
+
+def async_api_view(view):
+    """
+    Wrap an async POST view taking ``(request, data, user)``.
+
+    ``data`` is the parsed JSON body and ``user`` the authenticated user or None.
+    """
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method != 'POST':
+            return json_response({'detail': f'Method "{request.method}" not allowed.'}, status=405)
+        try:
+            data = json.loads(request.body or b'{}')
+        except json.JSONDecodeError:
+            return json_response({'detail': 'JSON parse error'}, status=400)
+
+        user = await aget_user(request)
+        try:
+            return await view(request, data, user, *args, **kwargs)
+        except ValidationError as e:
+            return json_response(e.detail, status=400)
+        except Http404:
+            return json_response({'detail': 'Not found.'}, status=404)
+
+    # Django 4.2's csrf_exempt decorator does not preserve coroutine functions
+    wrapper.csrf_exempt = True
+    return wrapper
@@ -0,0 +1,16 @@
+from django.db import models
+
+
+class DataVersion(models.Model):
+    """
+    Version counter for a named dataset (see core.utils.get_data_version).
+
+    Kept in the database so a bump in one web or Celery process is seen by
+    every other process, and so it is never evicted and reset like a cache key.
+    """
+    name = models.CharField(max_length=50, primary_key=True)
+    version = models.PositiveBigIntegerField(default=1)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.name} v{self.version}"
@@ -0,0 +1,42 @@
+"""
+Server-Sent Events helpers shared by the streaming API endpoints.
+"""
+import json
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import BaseRenderer
+
+
+class EventStreamRenderer(BaseRenderer):
+    """Lets SSE clients send ``Accept: text/event-stream``; errors render as JSON."""
+    media_type = 'text/event-stream'
+    format = 'sse'
+    
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return json.dumps(data, default=str).encode()
+
+
+def _format(event):
+    payload = {k: v for k, v in event.items() if k != 'type'}
+    return f"event: {event['type']}\ndata: {json.dumps(payload, default=str)}\n\n"
+
+
+def sse_response(events):
+    """
+    Wrap a generator of event dicts in a Server-Sent Events response.
+    
+    Each event is sent as ``event: <type>`` with a JSON ``data`` payload.
+    Async generators are streamed without a worker thread under ASGI.
+    """
+    def render():
+        for event in events:
+            yield _format(event)
+    
+    async def arender():
+        async for event in events:
+            yield _format(event)
+    
+    body = arender() if hasattr(events, '__aiter__') else render()
+    response = StreamingHttpResponse(body, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # Disable proxy buffering (nginx)
+    return response
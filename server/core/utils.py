@@ -1,9 +1,18 @@
 """
 Core utilities for Japaguide.
 """
+import time
 from decimal import Decimal
 
 
+# Seconds a process trusts a data version it read before asking the database
+# again; bumps from other processes are picked up at most this late
+DATA_VERSION_TTL = 5
+
+# name -> (version, time.monotonic() it was read)
+_data_versions = {}
+
+
 def calculate_migration_costs(country, city, visa_type, duration_months, inputs, num_dependents=0):
     """
     Enhanced cost calculation with country defaults and hidden costs.
@@ -113,15 +122,21 @@ def claim_session_data(user, session_key):
         Dict with migration stats
     """
     from roadmaps.models import Roadmap
-    from ai.models import AIRequest
+    from ai.models import AIRequest, Conversation
+    from ai.request_log import request_log
+    
+    # Write this worker's buffered AI request rows so they are claimed too
+    request_log.flush()
     
     # Find all session-based records
     roadmaps = Roadmap.objects.filter(session_id=session_key, user__isnull=True)
     ai_requests = AIRequest.objects.filter(session_id=session_key, user__isnull=True)
+    conversations = Conversation.objects.filter(session_id=session_key, user__isnull=True)
     
     # Migrate to user account
     roadmap_count = roadmaps.update(user=user, session_id='', is_anonymous=False)
     ai_request_count = ai_requests.update(user=user, session_id='')
+    conversation_count = conversations.update(user=user, session_id='')
     
     # Mark user as converted from anonymous
     user.is_anonymous_converted = True
@@ -130,4 +145,40 @@ def claim_session_data(user, session_key):
     return {
         'migrated_roadmaps': roadmap_count,
         'migrated_ai_requests': ai_request_count,
+        'migrated_conversations': conversation_count,
     }
+
+
+def get_data_version(name):
+    """
+    Get the current version counter for a named dataset.
+    
+    In-process caches built from the database compare this value against the
+    version they were built from to decide when to rebuild. The counter is a
+    DataVersion row, so bumps from any process are seen by all of them, within
+    DATA_VERSION_TTL seconds; in between the last value read is reused.
+    """
+    cached = _data_versions.get(name)
+    if cached and time.monotonic() - cached[1] < DATA_VERSION_TTL:
+        return cached[0]
+    
+    from core.models import DataVersion
+    
+    version = DataVersion.objects.filter(name=name).values_list('version', flat=True).first() or 1
+    _data_versions[name] = (version, time.monotonic())
+    return version
+
+
+def bump_data_version(name):
+    """Increment the version counter for a named dataset (seen at once in this process)."""
+    from django.db.models import F
+    from core.models import DataVersion
+    
+    bump = DataVersion.objects.filter(name=name)
+    if not bump.update(version=F('version') + 1):
+        # First bump: start above the default, unless a concurrent one got there first
+        _, created = DataVersion.objects.get_or_create(name=name, defaults={'version': 2})
+        if not created:
+            bump.update(version=F('version') + 1)
+    _data_versions.pop(name, None)
+    return get_data_version(name)
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Country, Source, EconomicIndicator, CountryDocument
+from .models import Country, Source, EconomicIndicator, CountryDocument, CountryDocumentChunk, CountryBrief
 
 
 @admin.register(Source)
@@ -77,6 +77,14 @@ class EconomicIndicatorAdmin(admin.ModelAdmin):
     raw_id_fields = ['country']
 
 
+class CountryDocumentChunkInline(admin.TabularInline):
+    model = CountryDocumentChunk
+    fields = ['chunk_index', 'heading', 'token_count', 'start_offset', 'end_offset']
+    readonly_fields = fields
+    extra = 0
+    can_delete = False
+
+
 @admin.register(CountryDocument)
 class CountryDocumentAdmin(admin.ModelAdmin):
     list_display = ['country', 'doc_type', 'title', 'word_count', 'data_confidence', 'needs_review', 'updated_at']
@@ -84,8 +92,9 @@ class CountryDocumentAdmin(admin.ModelAdmin):
     search_fields = ['title', 'content', 'country__name', 'country__code']
     ordering = ['country__name', 'doc_type', 'title']
     list_editable = ['data_confidence', 'needs_review']
-    readonly_fields = ['word_count', 'created_at', 'updated_at']
+    readonly_fields = ['word_count', 'content_hash', 'created_at', 'updated_at']
     raw_id_fields = ['country', 'source']
+    inlines = [CountryDocumentChunkInline]
     fieldsets = (
         ('Document Info', {
             'fields': ('country', 'title', 'doc_type')
@@ -97,7 +106,17 @@ class CountryDocumentAdmin(admin.ModelAdmin):
             'fields': ('source', 'data_confidence', 'needs_review', 'last_verified')
         }),
         ('Metadata', {
-            'fields': ('word_count', 'created_at', 'updated_at'),
+            'fields': ('word_count', 'content_hash', 'created_at', 'updated_at'),
             'classes': ('collapse',)
         }),
-    )
\ No newline at end of file
+    )
+
+
+@admin.register(CountryBrief)
+class CountryBriefAdmin(admin.ModelAdmin):
+    list_display = ['country', 'doc_type', 'token_count', 'data_confidence', 'model_used', 'updated_at']
+    list_filter = ['doc_type', 'data_confidence']
+    search_fields = ['country__name', 'country__code', 'content']
+    ordering = ['country__name', 'doc_type']
+    readonly_fields = ['token_count', 'source_hash', 'sources', 'model_used', 'created_at', 'updated_at']
+    raw_id_fields = ['country']
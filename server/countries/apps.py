@@ -3,4 +3,7 @@ from django.apps import AppConfig
 
 class CountriesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'countries'
\ No newline at end of file
+    name = 'countries'
+    
+    def ready(self):
+        from . import signals  # noqa: F401
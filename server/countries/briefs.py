@@ -0,0 +1,205 @@
+"""
+Condensed country briefs: a low-token RAG tier in front of document chunks.
+
+A batch job (``build_country_briefs`` command, Celery task
+``countries.tasks.refresh_country_briefs``) condenses each country's
+documents into one brief per doc_type, then those briefs into a
+country-level brief. Each brief stores a hash of what it was condensed from
+and is only regenerated when that changes.
+
+Chat retrieval (``AIService.retrieve_tiered``) answers from briefs alone
+unless the question asks for detail (fees, timelines, requirements, ...),
+in which case full chunks are added after them.
+"""
+import re
+import hashlib
+from ai.services import ai_service
+from ai.tokenizer import count_tokens
+from .models import Country, CountryBrief, CountryDocument
+from .chunking import content_hash
+
+
+BRIEF_WORDS = 180
+COUNTRY_BRIEF_WORDS = 220
+CONFIDENCE_ORDER = ['low', 'medium', 'high']
+
+# Questions a brief cannot answer well: amounts, timelines, requirements, procedures
+DETAIL_RE = re.compile(
+    r'\bhow (?:much|long|many)\b|\bcosts?\b|\bfees?\b|\bprices?\b|\bsalar(?:y|ies)\b|\bfunds\b'
+    r'|\brequire(?:d|ments?)?\b|\beligib\w*|\bqualify\b|\bdocuments?\b|\bpaperwork\b'
+    r'|\bsteps?\b|\bprocess(?:ing)?\b|\bprocedure\b|\bappl(?:y|ication)\b|\bdeadlines?\b'
+    r'|\bquotas?\b|\bpoints?\b|\bminimum\b|\bmaximum\b|\bexact(?:ly)?\b|\bspecific\b|\bdetail(?:s|ed)?\b'
+    r'|\bielts\b|\btoefl\b|\blanguage test\b|\bage limit\b|[$€£]',
+    re.IGNORECASE
+)
+
+BRIEF_TEMPLATE = """Condense the source documents below into a factual brief about {{topic}} in {{country}}.
+
+RULES:
+- At most {{max_words}} words, as short bullet points under 2-4 bold labels
+- Keep the key facts: pathway names, who qualifies, typical costs and timelines, official bodies
+- Only use facts stated in the sources; do not add advice
+- Plain Markdown, no title
+
+SOURCE DOCUMENTS:
+{% for doc in documents %}
+### {{doc.title}}
+{{doc.content}}
+{% endfor %}
+END OF SOURCES"""
+
+
+def needs_detail(question):
+    """Whether a question needs full document chunks rather than briefs."""
+    return bool(DETAIL_RE.search(question or ''))
+
+
+def source_hash(parts):
+    """Order-independent hash of (key, content hash) pairs."""
+    digest = hashlib.sha256()
+    for key, part in sorted(parts):
+        digest.update(f'{key}:{part}\n'.encode('utf-8'))
+    return digest.hexdigest()
+
+
+def _lowest_confidence(values):
+    return min(values, key=lambda value: CONFIDENCE_ORDER.index(value) if value in CONFIDENCE_ORDER else 1)
+
+
+def _sources(names):
+    return ', '.join(dict.fromkeys(name for name in names if name))[:255]
+
+
+def _condense(country, topic, documents, max_words):
+    """Ask the LLM for a brief; returns the text, or None on failure."""
+    result = ai_service.complete(
+        template_text=BRIEF_TEMPLATE,
+        context={
+            'country': country.name, 'topic': topic, 'documents': documents,
+            'max_words': max_words, 'mode': 'brief', 'temperature': 0.2,
+            'max_tokens': max_words * 2,
+        },
+        use_cache=False,
+        session_id='country-briefs',
+        priority='batch'
+    )
+    answer = (result.get('answer') or '').strip()
+    if result.get('error') or not answer:
+        print(f"Brief for {country.code} ({topic}) failed: {result.get('error', 'empty answer')}")
+        return None
+    return answer
+
+
+def _save(country, doc_type, content, digest, sources, confidence):
+    CountryBrief.objects.update_or_create(
+        country=country, doc_type=doc_type,
+        defaults={
+            'content': content,
+            'token_count': count_tokens(content),
+            'source_hash': digest,
+            'sources': sources,
+            'data_confidence': confidence,
+            'model_used': ai_service.model,
+        }
+    )
+
+
+def build_country_briefs(country, force=False):
+    """
+    Regenerate the briefs of a country whose sources changed.
+
+    Args:
+        country: Country instance
+        force: Regenerate even if the source hash is unchanged
+
+    Returns:
+        Dict of 'built', 'unchanged', 'failed' and 'removed' counts
+    """
+    stats = {'built': 0, 'unchanged': 0, 'failed': 0, 'removed': 0}
+    labels = dict(CountryDocument.DOC_TYPE_CHOICES)
+    existing = {brief.doc_type: brief for brief in country.briefs.all()}
+
+    by_type = {}
+    documents = CountryDocument.objects.filter(country=country).select_related('source').order_by('doc_type', 'title')
+    for document in documents:
+        by_type.setdefault(document.doc_type, []).append(document)
+
+    # Level 1: one brief per doc_type, from its documents
+    for doc_type, docs in by_type.items():
+        digest = source_hash((doc.pk, content_hash(doc.content)) for doc in docs)
+        brief = existing.get(doc_type)
+        if brief and brief.source_hash == digest and not force:
+            stats['unchanged'] += 1
+            continue
+        content = _condense(
+            country, labels.get(doc_type, doc_type),
+            [{'title': doc.title, 'content': doc.content} for doc in docs], BRIEF_WORDS
+        )
+        if content is None:
+            stats['failed'] += 1
+            continue
+        _save(
+            country, doc_type, content, digest,
+            _sources(doc.source.name if doc.source else '' for doc in docs),
+            _lowest_confidence(doc.data_confidence for doc in docs)
+        )
+        stats['built'] += 1
+
+    stale = country.briefs.exclude(doc_type='').exclude(doc_type__in=list(by_type))
+    stats['removed'] += stale.delete()[0]
+
+    # Level 2: the country brief, from the doc_type briefs
+    typed = list(country.briefs.exclude(doc_type='').order_by('doc_type'))
+    if not typed:
+        stats['removed'] += country.briefs.filter(doc_type='').delete()[0]
+        return stats
+    digest = source_hash((brief.doc_type, content_hash(brief.content)) for brief in typed)
+    brief = existing.get('')
+    if brief and brief.source_hash == digest and not force:
+        stats['unchanged'] += 1
+        return stats
+    content = _condense(
+        country, 'immigration overall',
+        [{'title': labels.get(b.doc_type, b.doc_type), 'content': b.content} for b in typed],
+        COUNTRY_BRIEF_WORDS
+    )
+    if content is None:
+        stats['failed'] += 1
+        return stats
+    _save(
+        country, '', content, digest,
+        _sources(name.strip() for b in typed for name in b.sources.split(',')),
+        _lowest_confidence(b.data_confidence for b in typed)
+    )
+    stats['built'] += 1
+    return stats
+
+
+def refresh_briefs(country_codes=None, force=False):
+    """
+    Run build_country_briefs for every country with documents (or the given
+    codes). Returns the summed counts.
+    """
+    countries = Country.objects.filter(documents__isnull=False).distinct().order_by('code')
+    if country_codes:
+        countries = countries.filter(code__in=country_codes)
+    totals = {'built': 0, 'unchanged': 0, 'failed': 0, 'removed': 0}
+    for country in countries:
+        for key, count in build_country_briefs(country, force=force).items():
+            totals[key] += count
+    return totals
+
+
+def get_briefs(country_code, doc_types=()):
+    """
+    Briefs for the doc types a question is about, in that order; the
+    country-level brief if it is about none that have one.
+    """
+    briefs = CountryBrief.objects.filter(
+        country__code=country_code, doc_type__in=[*doc_types, '']
+    ).select_related('country')
+    by_type = {brief.doc_type: brief for brief in briefs}
+    typed = [by_type[doc_type] for doc_type in doc_types if doc_type and doc_type in by_type]
+    if typed:
+        return typed
+    return [by_type['']] if '' in by_type else []
@@ -0,0 +1,174 @@
+"""
+Chunking pipeline for CountryDocument content.
+
+Documents are split at Markdown section headings; sections longer than the
+token limit are split further at paragraph and sentence boundaries into
+overlapping windows, and very short sections (e.g. the title block) are
+merged into the next one. Chunks keep their character offsets into the
+document, a token estimate and a content hash.
+
+``sync_document_chunks`` re-chunks a document only when its content hash
+changes, and refreshes the full-text (countries.search) and vector
+(countries.vectors) indexes.
+"""
+import re
+import hashlib
+from django.db import transaction
+from ai.tokenizer import count_tokens
+from .models import CountryDocument, CountryDocumentChunk
+from .search import index_document
+from .vectors import update_document_vectors
+
+
+MAX_CHUNK_TOKENS = 350
+CHUNK_OVERLAP_TOKENS = 40
+MIN_CHUNK_TOKENS = 60
+
+# Section headings (level 2+); the level-1 heading is the document title
+SECTION_RE = re.compile(r'^#{2,6}\s+(.+?)\s*#*\s*$', re.M)
+PARAGRAPH_RE = re.compile(r'\n\s*\n')
+SENTENCE_RE = re.compile(r'(?<=[.!?])\s+|\n')
+
+
+def content_hash(text):
+    return hashlib.sha256((text or '').encode('utf-8')).hexdigest()
+
+
+def _trim(content, start, end):
+    """Shrink a span so it does not start or end with whitespace."""
+    while start < end and content[start].isspace():
+        start += 1
+    while end > start and content[end - 1].isspace():
+        end -= 1
+    return start, end
+
+
+def _split_at(content, start, end, pattern):
+    """Split a span at the ends of ``pattern`` matches, keeping it contiguous."""
+    cuts = [m.end() for m in pattern.finditer(content, start, end) if start < m.end() < end]
+    bounds = [start] + cuts + [end]
+    return list(zip(bounds, bounds[1:]))
+
+
+def _units(content, start, end, max_tokens):
+    """Paragraph, then sentence, then fixed-size spans no longer than max_tokens."""
+    max_chars = max_tokens * 4
+    units = []
+    for p_start, p_end in _split_at(content, start, end, PARAGRAPH_RE):
+        if count_tokens(content[p_start:p_end]) <= max_tokens:
+            units.append((p_start, p_end))
+            continue
+        for s_start, s_end in _split_at(content, p_start, p_end, SENTENCE_RE):
+            for cut in range(s_start, s_end, max_chars):
+                units.append((cut, min(cut + max_chars, s_end)))
+    return units
+
+
+def _sections(content, min_tokens):
+    """(start, end, heading) spans at section headings, merging short ones forward."""
+    boundaries = [m.start() for m in SECTION_RE.finditer(content)]
+    starts = [0] + [b for b in boundaries if b > 0]
+    ends = starts[1:] + [len(content)]
+
+    sections = []
+    pending = None
+    for start, end in zip(starts, ends):
+        match = SECTION_RE.match(content, start)
+        heading = match.group(1) if match else ''
+        if pending:
+            start, heading = pending[0], pending[1] or heading
+            pending = None
+        if count_tokens(content[start:end].strip()) < min_tokens and end < len(content):
+            pending = (start, heading)
+            continue
+        sections.append((start, end, heading))
+    return sections
+
+
+def chunk_text(content, max_tokens=MAX_CHUNK_TOKENS, overlap_tokens=CHUNK_OVERLAP_TOKENS,
+               min_tokens=MIN_CHUNK_TOKENS):
+    """
+    Split Markdown content into chunks.
+
+    Returns a list of dicts with CountryDocumentChunk field names:
+    chunk_index, heading, content, start_offset, end_offset, token_count
+    and content_hash. ``content[start_offset:end_offset]`` is the chunk text.
+    """
+    if not content or not content.strip():
+        return []
+
+    spans = []
+    for start, end, heading in _sections(content, min_tokens):
+        if count_tokens(content[start:end]) <= max_tokens:
+            spans.append((start, end, heading))
+            continue
+
+        units = _units(content, start, end, max_tokens)
+        tokens = [count_tokens(content[a:b]) for a, b in units]
+        i = 0
+        while i < len(units):
+            j, total = i, 0
+            # Windows under min_tokens may overrun max_tokens by one unit
+            while j < len(units) and (total < min_tokens or total + tokens[j] <= max_tokens):
+                total += tokens[j]
+                j += 1
+            # Absorb a short tail rather than leaving a fragment chunk
+            if sum(tokens[j:]) < min_tokens:
+                j = len(units)
+            spans.append((units[i][0], units[j - 1][1], heading))
+            if j >= len(units):
+                break
+            # Step back over trailing units to overlap the next window
+            k, overlap = j, 0
+            while (k - 1 > i and overlap + tokens[k - 1] <= overlap_tokens
+                   and overlap + tokens[k - 1] + tokens[j] <= max_tokens):
+                k -= 1
+                overlap += tokens[k]
+            i = k
+
+    chunks = []
+    for start, end, heading in spans:
+        start, end = _trim(content, start, end)
+        if start == end:
+            continue
+        text = content[start:end]
+        chunks.append({
+            'chunk_index': len(chunks),
+            'heading': heading[:255],
+            'content': text,
+            'start_offset': start,
+            'end_offset': end,
+            'token_count': count_tokens(text),
+            'content_hash': content_hash(text),
+        })
+    return chunks
+
+
+def sync_document_chunks(document, force=False, update_vectors=True):
+    """
+    Re-chunk a document if its content changed and refresh its search indexes.
+
+    Pass ``update_vectors=False`` when the vector index is rebuilt afterwards
+    anyway. Returns True if the document was re-chunked.
+    """
+    digest = content_hash(document.content)
+    rechunk = force or digest != document.content_hash or not document.chunks.exists()
+
+    with transaction.atomic():
+        if rechunk:
+            chunks = chunk_text(document.content)
+            document.chunks.all().delete()
+            CountryDocumentChunk.objects.bulk_create([
+                CountryDocumentChunk(document=document, **chunk) for chunk in chunks
+            ])
+            CountryDocument.objects.filter(pk=document.pk).update(content_hash=digest)
+            document.content_hash = digest
+        else:
+            chunks = list(document.chunks.values('chunk_index', 'heading', 'content'))
+        # Title and doc type are indexed too, so refresh the index on every save
+        index_document(document, chunks)
+        # The vector index lives in files, so only touch it once the rows are committed
+        if update_vectors:
+            transaction.on_commit(lambda: update_document_vectors(document.pk))
+
+    return rechunk
@@ -0,0 +1,27 @@
+"""
+Management command to build condensed country briefs (the low-token RAG tier).
+Usage: python manage.py build_country_briefs [--country CAN --country GBR] [--force]
+"""
+from django.core.management.base import BaseCommand
+from countries.briefs import refresh_briefs
+
+
+class Command(BaseCommand):
+    help = 'Condense country documents into per-doc_type and country briefs, regenerating only changed ones'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--country', action='append', help='Country code (repeatable; default all)')
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Regenerate every brief, even if its sources are unchanged'
+        )
+
+    def handle(self, *args, **options):
+        codes = [code.upper() for code in options['country'] or []]
+        totals = refresh_briefs(country_codes=codes or None, force=options['force'])
+        self.stdout.write(
+            f"Built {totals['built']}, unchanged {totals['unchanged']}, removed {totals['removed']} briefs"
+        )
+        if totals['failed']:
+            self.stdout.write(self.style.WARNING(f"{totals['failed']} briefs failed; rerun to retry"))
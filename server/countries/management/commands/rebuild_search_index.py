@@ -0,0 +1,39 @@
+"""
+Management command to re-chunk country documents and rebuild the full-text and vector indexes.
+Usage: python manage.py rebuild_search_index [--rechunk]
+"""
+from django.core.management.base import BaseCommand
+from countries.models import CountryDocument
+from countries.chunking import sync_document_chunks
+from countries.search import rebuild_index
+from countries.vectors import build_vector_index
+
+
+class Command(BaseCommand):
+    help = 'Re-chunk changed country documents and rebuild the full-text and vector indexes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rechunk',
+            action='store_true',
+            help='Re-chunk every document, even if its content hash is unchanged'
+        )
+
+    def handle(self, *args, **options):
+        rechunked = 0
+        for document in CountryDocument.objects.select_related('country'):
+            if sync_document_chunks(document, force=options['rechunk'], update_vectors=False):
+                rechunked += 1
+        self.stdout.write(f'Re-chunked {rechunked} documents')
+
+        documents = CountryDocument.objects.values_list(
+            'id', 'country__code', 'doc_type', 'title', 'content'
+        )
+        count = rebuild_index(documents)
+        if count is None:
+            self.stdout.write(self.style.WARNING('Database has no full-text search backend; index not built.'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Indexed {count} chunks from {len(documents)} documents'))
+
+        count = build_vector_index()
+        self.stdout.write(self.style.SUCCESS(f'Embedded {count} chunks into the vector index'))
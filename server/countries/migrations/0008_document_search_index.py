@@ -0,0 +1,53 @@
+# Full-text search index over CountryDocument passages (FTS5 / tsvector)
+#
+# Only the table is created here, with the schema frozen as of this
+# migration; it is filled by `python manage.py rebuild_search_index`.
+from django.db import migrations
+
+
+FTS_TABLE = 'countries_document_fts'
+
+CREATE_SQL = {
+    'sqlite': [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+        "heading, body, title, "
+        "document_id UNINDEXED, passage_index UNINDEXED, "
+        "country_code UNINDEXED, doc_type UNINDEXED, "
+        "tokenize='porter unicode61')",
+    ],
+    'postgresql': [
+        f"CREATE TABLE IF NOT EXISTS {FTS_TABLE} ("
+        "id bigserial PRIMARY KEY, "
+        "document_id bigint NOT NULL, passage_index integer NOT NULL, "
+        "country_code varchar(3) NOT NULL, doc_type varchar(20) NOT NULL, "
+        "heading text NOT NULL, body text NOT NULL, title text NOT NULL, "
+        "tsv tsvector GENERATED ALWAYS AS ("
+        "setweight(to_tsvector('english', heading), 'A') || "
+        "setweight(to_tsvector('english', title), 'B') || "
+        "setweight(to_tsvector('english', body), 'C')) STORED)",
+        f"CREATE INDEX IF NOT EXISTS {FTS_TABLE}_tsv_idx ON {FTS_TABLE} USING GIN (tsv)",
+        f"CREATE INDEX IF NOT EXISTS {FTS_TABLE}_doc_idx ON {FTS_TABLE} (document_id)",
+    ],
+}
+
+
+def create_search_index(apps, schema_editor):
+    """Create the vendor-specific search table (other databases have none)."""
+    for sql in CREATE_SQL.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(sql)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor in CREATE_SQL:
+        schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('countries', '0007_add_immigration_url'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,81 @@
+# Generated by Django 4.2.7 on 2026-10-16 23:33
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# The search table is re-keyed by chunk instead of passage, with the schema
+# frozen as of this migration. Existing documents are chunked and indexed by
+# `python manage.py rebuild_search_index`, which entrypoint.sh runs after
+# migrate (their content_hash starts blank); until then retrieval chunks
+# the leading section of unchunked documents on the fly.
+FTS_TABLE = 'countries_document_fts'
+
+
+def _create_sql(position_column):
+    return {
+        'sqlite': [
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+            "heading, body, title, "
+            f"document_id UNINDEXED, {position_column} UNINDEXED, "
+            "country_code UNINDEXED, doc_type UNINDEXED, "
+            "tokenize='porter unicode61')",
+        ],
+        'postgresql': [
+            f"CREATE TABLE IF NOT EXISTS {FTS_TABLE} ("
+            "id bigserial PRIMARY KEY, "
+            f"document_id bigint NOT NULL, {position_column} integer NOT NULL, "
+            "country_code varchar(3) NOT NULL, doc_type varchar(20) NOT NULL, "
+            "heading text NOT NULL, body text NOT NULL, title text NOT NULL, "
+            "tsv tsvector GENERATED ALWAYS AS ("
+            "setweight(to_tsvector('english', heading), 'A') || "
+            "setweight(to_tsvector('english', title), 'B') || "
+            "setweight(to_tsvector('english', body), 'C')) STORED)",
+            f"CREATE INDEX IF NOT EXISTS {FTS_TABLE}_tsv_idx ON {FTS_TABLE} USING GIN (tsv)",
+            f"CREATE INDEX IF NOT EXISTS {FTS_TABLE}_doc_idx ON {FTS_TABLE} (document_id)",
+        ],
+    }
+
+
+def _recreate_search_table(position_column):
+    def recreate(apps, schema_editor):
+        statements = _create_sql(position_column).get(schema_editor.connection.vendor)
+        if statements:
+            schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+            for sql in statements:
+                schema_editor.execute(sql)
+    return recreate
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('countries', '0008_document_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='countrydocument',
+            name='content_hash',
+            field=models.CharField(blank=True, editable=False, help_text='SHA-256 of the content the current chunks were built from', max_length=64),
+        ),
+        migrations.CreateModel(
+            name='CountryDocumentChunk',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('chunk_index', models.PositiveIntegerField(help_text='Position of the chunk within the document')),
+                ('heading', models.CharField(blank=True, help_text='Markdown section heading the chunk belongs to', max_length=255)),
+                ('content', models.TextField()),
+                ('start_offset', models.PositiveIntegerField(help_text='Character offset of the chunk start in the document content')),
+                ('end_offset', models.PositiveIntegerField(help_text='Character offset of the chunk end in the document content')),
+                ('token_count', models.PositiveIntegerField(default=0)),
+                ('content_hash', models.CharField(help_text='SHA-256 of the chunk content', max_length=64)),
+                ('document', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='chunks', to='countries.countrydocument')),
+            ],
+            options={
+                'ordering': ['document', 'chunk_index'],
+                'unique_together': {('document', 'chunk_index')},
+            },
+        ),
+        migrations.RunPython(_recreate_search_table('chunk_index'), _recreate_search_table('passage_index')),
+    ]
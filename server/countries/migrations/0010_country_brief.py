@@ -0,0 +1,34 @@
+# Generated by Django 4.2.7 on 2026-10-17 00:21
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('countries', '0009_country_document_chunk'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CountryBrief',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('doc_type', models.CharField(blank=True, help_text='CountryDocument doc_type, or empty for the country-level brief', max_length=20)),
+                ('content', models.TextField()),
+                ('token_count', models.PositiveIntegerField(default=0)),
+                ('source_hash', models.CharField(help_text='SHA-256 over the content hashes of the documents (or briefs) it was condensed from', max_length=64)),
+                ('sources', models.CharField(blank=True, help_text='Names of the sources of the condensed documents', max_length=255)),
+                ('data_confidence', models.CharField(choices=[('low', 'Low'), ('medium', 'Medium'), ('high', 'High')], default='medium', help_text='Lowest confidence of the condensed documents', max_length=10)),
+                ('model_used', models.CharField(blank=True, max_length=50)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('country', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='briefs', to='countries.country')),
+            ],
+            options={
+                'ordering': ['country', 'doc_type'],
+                'unique_together': {('country', 'doc_type')},
+            },
+        ),
+    ]
@@ -327,6 +327,12 @@ class CountryDocument(models.Model):
     
     # Metadata
     word_count = models.IntegerField(default=0, editable=False)
+    content_hash = models.CharField(
+        max_length=64,
+        blank=True,
+        editable=False,
+        help_text="SHA-256 of the content the current chunks were built from"
+    )
     last_verified = models.DateTimeField(
         null=True,
         blank=True,
@@ -352,4 +358,90 @@ class CountryDocument(models.Model):
         super().save(*args, **kwargs)
     
     def __str__(self):
-        return f"{self.country.code} - {self.get_doc_type_display()}: {self.title}"
\ No newline at end of file
+        return f"{self.country.code} - {self.get_doc_type_display()}: {self.title}"
+
+
+class CountryDocumentChunk(models.Model):
+    """
+    A retrieval-sized slice of a CountryDocument.
+    Chunks are rebuilt by countries.chunking when the document content hash changes.
+    """
+    document = models.ForeignKey(
+        CountryDocument,
+        on_delete=models.CASCADE,
+        related_name='chunks'
+    )
+    chunk_index = models.PositiveIntegerField(
+        help_text="Position of the chunk within the document"
+    )
+    heading = models.CharField(
+        max_length=255,
+        blank=True,
+        help_text="Markdown section heading the chunk belongs to"
+    )
+    content = models.TextField()
+    start_offset = models.PositiveIntegerField(
+        help_text="Character offset of the chunk start in the document content"
+    )
+    end_offset = models.PositiveIntegerField(
+        help_text="Character offset of the chunk end in the document content"
+    )
+    token_count = models.PositiveIntegerField(default=0)
+    content_hash = models.CharField(
+        max_length=64,
+        help_text="SHA-256 of the chunk content"
+    )
+    
+    class Meta:
+        ordering = ['document', 'chunk_index']
+        unique_together = ['document', 'chunk_index']
+    
+    def __str__(self):
+        return f"{self.document} [{self.chunk_index}]"
+
+
+class CountryBrief(models.Model):
+    """
+    Condensed facts for a country and doc_type, used as a low-token RAG tier.
+    The brief with an empty doc_type condenses the country's doc_type briefs.
+    Rebuilt by countries.briefs when source_hash changes.
+    """
+    country = models.ForeignKey(
+        Country,
+        on_delete=models.CASCADE,
+        related_name='briefs'
+    )
+    doc_type = models.CharField(
+        max_length=20,
+        blank=True,
+        help_text="CountryDocument doc_type, or empty for the country-level brief"
+    )
+    content = models.TextField()
+    token_count = models.PositiveIntegerField(default=0)
+    source_hash = models.CharField(
+        max_length=64,
+        help_text="SHA-256 over the content hashes of the documents (or briefs) it was condensed from"
+    )
+    sources = models.CharField(
+        max_length=255,
+        blank=True,
+        help_text="Names of the sources of the condensed documents"
+    )
+    data_confidence = models.CharField(
+        max_length=10,
+        choices=[('low', 'Low'), ('medium', 'Medium'), ('high', 'High')],
+        default='medium',
+        help_text="Lowest confidence of the condensed documents"
+    )
+    model_used = models.CharField(max_length=50, blank=True)
+    
+    # Timestamps
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['country', 'doc_type']
+        unique_together = ['country', 'doc_type']
+    
+    def __str__(self):
+        return f"{self.country.code} - {self.doc_type or 'country'} brief"
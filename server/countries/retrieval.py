@@ -0,0 +1,207 @@
+"""
+Hybrid retrieval over CountryDocument chunks for RAG.
+
+Lexical (BM25, countries.search) and semantic (countries.vectors) candidates
+are fused with weighted reciprocal-rank fusion and scaled by document quality
+priors (data_confidence, needs_review). Overlapping chunks of one document
+are merged into a single passage, and passages are packed best-first into a
+token budget instead of a fixed count.
+"""
+from django.db.models import F
+from .models import CountryDocumentChunk
+from .search import search_chunks
+from .vectors import search_vectors
+from .chunking import count_tokens
+
+
+RRF_K = 60
+LEXICAL_WEIGHT = 1.0
+SEMANTIC_WEIGHT = 0.4
+# Cosine below which semantic candidates are dropped as noise
+SEMANTIC_MIN_SCORE = 0.05
+CANDIDATES = 20
+# Fused candidates loaded from the database for priors and packing
+RERANK_CANDIDATES = 12
+
+# Multipliers on the fused score; reviewed, high-confidence documents win ties
+CONFIDENCE_PRIORS = {'high': 1.0, 'medium': 0.9, 'low': 0.75}
+NEEDS_REVIEW_PRIOR = 0.85
+
+# Chunk indexes stay far below this, so document_id * stride + index is unique
+CHUNK_KEY_STRIDE = 100000
+
+DEFAULT_TOKEN_BUDGET = 1200
+# Stop packing once less than this much budget is left
+MIN_PASSAGE_TOKENS = 40
+
+
+def rrf_fuse(ranked_lists, k=RRF_K):
+    """
+    Weighted reciprocal-rank fusion.
+
+    Args:
+        ranked_lists: (weight, keys) pairs, keys best first
+
+    Returns:
+        Dict of key -> fused score
+    """
+    scores = {}
+    for weight, keys in ranked_lists:
+        for rank, key in enumerate(keys):
+            scores[key] = scores.get(key, 0.0) + weight / (k + rank + 1)
+    return scores
+
+
+def document_prior(document):
+    prior = CONFIDENCE_PRIORS.get(document.data_confidence, CONFIDENCE_PRIORS['medium'])
+    if document.needs_review:
+        prior *= NEEDS_REVIEW_PRIOR
+    return prior
+
+
+def load_chunks(keys):
+    """Fetch chunks (with document, country and source) for (document_id, chunk_index) keys."""
+    if not keys:
+        return {}
+    # One IN clause on a composite key is much cheaper to build than an OR per key
+    chunks = CountryDocumentChunk.objects.filter(
+        document_id__in={document_id for document_id, _ in keys}
+    ).alias(
+        key=F('document_id') * CHUNK_KEY_STRIDE + F('chunk_index')
+    ).filter(
+        key__in=[document_id * CHUNK_KEY_STRIDE + chunk_index for document_id, chunk_index in keys]
+    ).select_related(
+        'document__country', 'document__source'
+    ).only(
+        # Only what ranking and prompt formatting read; Country rows are wide
+        'document_id', 'chunk_index', 'heading', 'content', 'start_offset', 'end_offset',
+        'token_count', 'content_hash',
+        'document__title', 'document__doc_type', 'document__data_confidence',
+        'document__needs_review', 'document__updated_at',
+        'document__country__code', 'document__country__name', 'document__source__name',
+    )
+    return {(c.document_id, c.chunk_index): c for c in chunks}
+
+
+def chunk_key(chunk):
+    """Identity and version of a chunk: changes whenever its text does."""
+    return f'{chunk.document_id}:{chunk.chunk_index}:{chunk.content_hash[:12]}'
+
+
+def _merge(passage, chunk):
+    """Text of the union of a passage and an overlapping chunk of the same document."""
+    if chunk.start_offset >= passage['start_offset']:
+        if chunk.end_offset <= passage['end_offset']:
+            return passage['content']
+        return passage['content'] + chunk.content[passage['end_offset'] - chunk.start_offset:]
+    if passage['end_offset'] <= chunk.end_offset:
+        return chunk.content
+    return chunk.content + passage['content'][chunk.end_offset - passage['start_offset']:]
+
+
+def pack_passages(scored_chunks, token_budget=DEFAULT_TOKEN_BUDGET, max_passages=None):
+    """
+    Greedily pack chunks into passages within a token budget.
+
+    Chunks of the same document whose spans overlap are merged into one
+    passage (paying only for the new text); chunks with identical content
+    are skipped.
+
+    Args:
+        scored_chunks: (score, chunk) pairs, best first
+        token_budget: Maximum total tokens across passages
+        max_passages: Optional cap on the number of passages
+
+    Returns:
+        List of passage dicts with 'document', 'heading', 'content',
+        'start_offset', 'end_offset', 'tokens', 'score' and 'chunk_keys'
+        (see chunk_key()), best first.
+    """
+    passages = []
+    seen_hashes = set()
+    used = 0
+
+    for score, chunk in scored_chunks:
+        if token_budget - used < MIN_PASSAGE_TOKENS:
+            break
+        if chunk.content_hash in seen_hashes:
+            continue
+
+        overlapping = next((
+            p for p in passages
+            if p['document'].pk == chunk.document_id
+            and chunk.start_offset < p['end_offset'] and p['start_offset'] < chunk.end_offset
+        ), None)
+
+        if overlapping:
+            start = min(overlapping['start_offset'], chunk.start_offset)
+            end = max(overlapping['end_offset'], chunk.end_offset)
+            content = _merge(overlapping, chunk)
+            tokens = count_tokens(content)
+            if used - overlapping['tokens'] + tokens > token_budget:
+                continue
+            used += tokens - overlapping['tokens']
+            overlapping.update(content=content, start_offset=start, end_offset=end, tokens=tokens)
+            overlapping['chunk_keys'].append(chunk_key(chunk))
+        else:
+            if max_passages and len(passages) >= max_passages:
+                continue
+            # Always return something, even if the best chunk alone is over budget
+            if passages and used + chunk.token_count > token_budget:
+                continue
+            used += chunk.token_count
+            passages.append({
+                'document': chunk.document,
+                'heading': chunk.heading,
+                'content': chunk.content,
+                'start_offset': chunk.start_offset,
+                'end_offset': chunk.end_offset,
+                'tokens': chunk.token_count,
+                'score': score,
+                'chunk_keys': [chunk_key(chunk)],
+            })
+        seen_hashes.add(chunk.content_hash)
+
+    return passages
+
+
+def hybrid_search(query, country_codes=None, token_budget=DEFAULT_TOKEN_BUDGET,
+                  max_passages=None, lexical=True, semantic=True):
+    """
+    Retrieve passages for a question by fused lexical and semantic rank.
+
+    Args:
+        query: Free-text question
+        country_codes: Optional list of country codes to restrict to
+        token_budget: Maximum total tokens of returned passages
+        max_passages: Optional cap on the number of passages
+        lexical: Use the full-text (BM25) ranking
+        semantic: Use the vector ranking
+
+    Returns:
+        List of passage dicts (see pack_passages); empty if no candidate
+        matched lexically or scored at least SEMANTIC_MIN_SCORE semantically
+        (paraphrases sharing no term with the documents still match).
+    """
+    ranked = []
+    if lexical:
+        hits = search_chunks(query, country_codes=country_codes, limit=CANDIDATES)
+        ranked.append((LEXICAL_WEIGHT, [(h['document_id'], h['chunk_index']) for h in hits]))
+    if semantic:
+        hits = search_vectors(query, country_codes=country_codes, limit=CANDIDATES)
+        ranked.append((SEMANTIC_WEIGHT, [
+            (h['document_id'], h['chunk_index']) for h in hits if h['score'] >= SEMANTIC_MIN_SCORE
+        ]))
+
+    fused = rrf_fuse(ranked)
+    chunks = load_chunks(sorted(fused, key=fused.get, reverse=True)[:RERANK_CANDIDATES])
+
+    scored = sorted(
+        (
+            (fused[key] * document_prior(chunk.document), chunk)
+            for key, chunk in chunks.items()
+        ),
+        key=lambda pair: pair[0],
+        reverse=True
+    )
+    return pack_passages(scored, token_budget=token_budget, max_passages=max_passages)
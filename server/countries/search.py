@@ -0,0 +1,237 @@
+"""
+Full-text search over CountryDocument chunks for RAG retrieval.
+
+Chunks (see countries.chunking) are indexed in a vendor-specific full-text
+table:
+
+- SQLite: an FTS5 virtual table ranked with ``bm25()``
+- PostgreSQL: a table with a generated ``tsvector`` column, a GIN index and
+  ``ts_rank_cd()`` ranking
+
+The table is created by migration and filled (or rebuilt from scratch) with
+``python manage.py rebuild_search_index``; the CountryDocument save/delete
+signals keep it in sync after that.
+"""
+import re
+from django.db import connection
+
+
+FTS_TABLE = 'countries_document_fts'
+
+TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+# Question words that carry no retrieval signal
+STOPWORDS = {
+    'a', 'about', 'an', 'and', 'are', 'as', 'at', 'be', 'can', 'could', 'do', 'does',
+    'for', 'from', 'get', 'have', 'how', 'i', 'if', 'in', 'is', 'it', 'me', 'my', 'of',
+    'on', 'or', 'should', 'so', 'tell', 'that', 'the', 'there', 'this', 'to', 'want',
+    'was', 'what', 'when', 'where', 'which', 'who', 'why', 'will', 'with', 'would', 'you',
+    'your',
+}
+
+
+def query_terms(text):
+    """Lowercase alphanumeric terms from a question, minus stopwords, in order."""
+    terms = [t for t in TOKEN_RE.findall(text.lower()) if t not in STOPWORDS and len(t) > 1]
+    return list(dict.fromkeys(terms))
+
+
+class SQLiteSearchBackend:
+    """FTS5 virtual table ranked with bm25()."""
+
+    def create(self, cursor):
+        cursor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+            "heading, body, title, "
+            "document_id UNINDEXED, chunk_index UNINDEXED, "
+            "country_code UNINDEXED, doc_type UNINDEXED, "
+            "tokenize='porter unicode61')"
+        )
+
+    def drop(self, cursor):
+        cursor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+    def delete(self, cursor, document_id):
+        cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE document_id = %s", [document_id])
+
+    def insert(self, cursor, rows):
+        cursor.executemany(
+            f"INSERT INTO {FTS_TABLE} "
+            "(heading, body, title, document_id, chunk_index, country_code, doc_type) "
+            "VALUES (%s, %s, %s, %s, %s, %s, %s)",
+            rows
+        )
+
+    def search(self, cursor, terms, country_codes, doc_types, limit):
+        match = ' OR '.join(f'"{term}"' for term in terms)
+        sql = (
+            f"SELECT document_id, chunk_index, heading, body, "
+            f"-bm25({FTS_TABLE}, 2.0, 1.0, 1.5) AS score "
+            f"FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s"
+        )
+        params = [match]
+        sql, params = _add_filters(sql, params, country_codes, doc_types)
+        cursor.execute(sql + " ORDER BY score DESC LIMIT %s", params + [limit])
+        return cursor.fetchall()
+
+
+class PostgresSearchBackend:
+    """tsvector column with a GIN index ranked with ts_rank_cd()."""
+
+    def create(self, cursor):
+        cursor.execute(
+            f"CREATE TABLE IF NOT EXISTS {FTS_TABLE} ("
+            "id bigserial PRIMARY KEY, "
+            "document_id bigint NOT NULL, chunk_index integer NOT NULL, "
+            "country_code varchar(3) NOT NULL, doc_type varchar(20) NOT NULL, "
+            "heading text NOT NULL, body text NOT NULL, title text NOT NULL, "
+            "tsv tsvector GENERATED ALWAYS AS ("
+            "setweight(to_tsvector('english', heading), 'A') || "
+            "setweight(to_tsvector('english', title), 'B') || "
+            "setweight(to_tsvector('english', body), 'C')) STORED)"
+        )
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS {FTS_TABLE}_tsv_idx ON {FTS_TABLE} USING GIN (tsv)")
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS {FTS_TABLE}_doc_idx ON {FTS_TABLE} (document_id)")
+
+    def drop(self, cursor):
+        cursor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+    def delete(self, cursor, document_id):
+        cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE document_id = %s", [document_id])
+
+    def insert(self, cursor, rows):
+        cursor.executemany(
+            f"INSERT INTO {FTS_TABLE} "
+            "(heading, body, title, document_id, chunk_index, country_code, doc_type) "
+            "VALUES (%s, %s, %s, %s, %s, %s, %s)",
+            rows
+        )
+
+    def search(self, cursor, terms, country_codes, doc_types, limit):
+        # Terms are alphanumeric only, so they are safe inside a tsquery
+        sql = (
+            f"SELECT document_id, chunk_index, heading, body, ts_rank_cd(tsv, q) AS score "
+            f"FROM {FTS_TABLE}, to_tsquery('english', %s) q WHERE tsv @@ q"
+        )
+        params = [' | '.join(terms)]
+        sql, params = _add_filters(sql, params, country_codes, doc_types)
+        cursor.execute(sql + " ORDER BY score DESC LIMIT %s", params + [limit])
+        return cursor.fetchall()
+
+
+def _add_filters(sql, params, country_codes, doc_types):
+    for column, values in (('country_code', country_codes), ('doc_type', doc_types)):
+        if values:
+            placeholders = ', '.join(['%s'] * len(values))
+            sql += f" AND {column} IN ({placeholders})"
+            params = params + list(values)
+    return sql, params
+
+
+BACKENDS = {
+    'sqlite': SQLiteSearchBackend,
+    'postgresql': PostgresSearchBackend,
+}
+
+
+def get_backend(conn=None):
+    """Return the search backend for a connection, or None if unsupported."""
+    backend_class = BACKENDS.get((conn or connection).vendor)
+    return backend_class() if backend_class else None
+
+
+def chunk_rows(document_id, country_code, doc_type, title, chunks):
+    """Build index rows for one document's chunks."""
+    return [
+        (chunk['heading'], chunk['content'], title, document_id, chunk['chunk_index'], country_code, doc_type)
+        for chunk in chunks
+    ]
+
+
+def index_document(document, chunks, conn=None):
+    """
+    Replace a document's rows in the index.
+
+    ``chunks`` are dicts with 'chunk_index', 'heading' and 'content'.
+    """
+    conn = conn or connection
+    backend = get_backend(conn)
+    if backend is None:
+        return
+    with conn.cursor() as cursor:
+        backend.delete(cursor, document.id)
+        backend.insert(cursor, chunk_rows(
+            document.id, document.country.code, document.doc_type, document.title, chunks
+        ))
+
+
+def rebuild_index(documents, conn=None):
+    """
+    Drop and recreate the index from scratch.
+
+    Args:
+        documents: Iterable of (id, country_code, doc_type, title, content) tuples
+        conn: Database connection (defaults to the default connection)
+
+    Returns:
+        Number of chunks indexed, or None if the database is unsupported
+    """
+    from .chunking import chunk_text
+
+    conn = conn or connection
+    backend = get_backend(conn)
+    if backend is None:
+        return None
+    rows = []
+    for document_id, country_code, doc_type, title, content in documents:
+        rows.extend(chunk_rows(document_id, country_code, doc_type, title, chunk_text(content)))
+    with conn.cursor() as cursor:
+        backend.drop(cursor)
+        backend.create(cursor)
+        backend.insert(cursor, rows)
+    return len(rows)
+
+
+def remove_document(document_id, conn=None):
+    """Remove a document's rows from the index."""
+    conn = conn or connection
+    backend = get_backend(conn)
+    if backend is None:
+        return
+    with conn.cursor() as cursor:
+        backend.delete(cursor, document_id)
+
+
+def search_chunks(query, country_codes=None, doc_types=None, limit=5):
+    """
+    Rank indexed chunks against a question.
+
+    Args:
+        query: Free-text question
+        country_codes: Optional list of country codes to restrict to
+        doc_types: Optional list of doc types to restrict to
+        limit: Maximum chunks to return
+
+    Returns:
+        List of dicts with 'document_id', 'chunk_index', 'heading', 'text'
+        and 'score' (higher is better), best first. Empty if the query has no
+        searchable terms or the database has no full-text backend.
+    """
+    backend = get_backend()
+    terms = query_terms(query)
+    if backend is None or not terms:
+        return []
+
+    with connection.cursor() as cursor:
+        rows = backend.search(cursor, terms, country_codes, doc_types, limit)
+
+    return [
+        {
+            'document_id': document_id,
+            'chunk_index': chunk_index,
+            'heading': heading,
+            'text': text,
+            'score': score,
+        }
+        for document_id, chunk_index, heading, text, score in rows
+    ]
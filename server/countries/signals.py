@@ -0,0 +1,32 @@
+"""
+Signal handlers for the countries app.
+"""
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from core.utils import bump_data_version
+from .models import Country, CountryDocument
+from .chunking import sync_document_chunks
+from .search import remove_document
+from .vectors import update_document_vectors
+
+
+@receiver(post_save, sender=Country)
+@receiver(post_delete, sender=Country)
+def bump_countries_version(sender, **kwargs):
+    """Invalidate in-process country caches (e.g. the AI country matcher)."""
+    bump_data_version('countries')
+
+
+@receiver(post_save, sender=CountryDocument)
+def index_country_document(sender, instance, raw=False, **kwargs):
+    """Re-chunk edited documents and keep the full-text search index in sync."""
+    if not raw:
+        sync_document_chunks(instance)
+
+
+@receiver(post_delete, sender=CountryDocument)
+def unindex_country_document(sender, instance, **kwargs):
+    remove_document(instance.id)
+    document_id = instance.id
+    transaction.on_commit(lambda: update_document_vectors(document_id))
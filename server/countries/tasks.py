@@ -0,0 +1,29 @@
+"""
+Celery tasks for countries app.
+"""
+from celery import shared_task
+from .briefs import refresh_briefs
+from .vectors import build_vector_index
+
+
+@shared_task(ignore_result=True)
+def refresh_country_briefs(country_codes=None, force=False):
+    """
+    Regenerate country briefs whose source documents changed.
+    
+    Runs hourly via Celery beat; unchanged briefs cost one hash comparison,
+    so only edited or new documents reach the LLM.
+    """
+    return refresh_briefs(country_codes=country_codes, force=force)
+
+
+@shared_task(ignore_result=True)
+def refresh_vector_index():
+    """
+    Rebuild the semantic vector index from the stored chunks.
+    
+    Runs daily via Celery beat: document edits only append re-embedded rows
+    with the IDF weights of the last build, so this refreshes the weights
+    and drops dead rows. Also builds the index if it is missing.
+    """
+    return build_vector_index()
@@ -0,0 +1,481 @@
+"""
+Local semantic vector index over CountryDocument chunks.
+
+Chunks are embedded on the CPU with hashed TF-IDF vectors (word unigrams and
+bigrams hashed into ``VECTOR_DIM`` signed buckets, L2-normalised), so no model
+download or external service is needed. Queries are expanded with a small
+synonym table to catch paraphrases ("my wife" -> spouse/family). The index
+keeps the full hashes of every feature it has seen, and query features no
+chunk contains are dropped before embedding, so a question sharing nothing
+with the documents scores zero instead of matching bucket collisions.
+
+The vectors live in one contiguous float32 matrix written to
+``settings.VECTOR_INDEX_DIR`` and opened with ``numpy.memmap``, so every
+gunicorn worker on a host shares the same page-cache pages. Writers never
+modify published rows: they append rows to the matrix file (or write a new
+versioned file) and then atomically replace ``meta.json``, which lists the
+rows readers may see; readers notice the new metadata on their next query
+and remap.
+
+Updates are incremental: when a document is re-chunked its old rows are
+marked dead and only its new rows are embedded (with the IDF weights from
+the last full build) and appended. Dead rows are compacted away once they
+are half the matrix. The index is never built on the request path: build
+it with ``python manage.py rebuild_search_index`` (the daily
+``countries.tasks.refresh_vector_index`` task rebuilds it to refresh the
+IDF weights); until then semantic search returns nothing and logs a
+warning once per process.
+
+Writers serialise on a lock file with ``fcntl.flock`` on POSIX and
+``msvcrt.locking`` on Windows.
+"""
+import os
+import json
+import zlib
+import logging
+import math
+import threading
+from contextlib import contextmanager
+from collections import Counter
+import numpy as np
+from django.conf import settings
+from .search import TOKEN_RE, STOPWORDS
+
+logger = logging.getLogger(__name__)
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+VECTOR_DIM = 4096
+
+# Query-side expansions for common paraphrases, weighted below real terms
+QUERY_SYNONYMS = {
+    'wife': ['spouse', 'partner', 'family'],
+    'husband': ['spouse', 'partner', 'family'],
+    'married': ['spouse', 'marriage', 'family'],
+    'fiance': ['partner', 'marriage', 'family'],
+    'kids': ['children', 'dependent', 'family'],
+    'child': ['children', 'dependent', 'family'],
+    'children': ['dependent', 'family'],
+    'parents': ['family', 'reunification', 'sponsor'],
+    'job': ['work', 'employment', 'employer'],
+    'jobs': ['work', 'employment', 'employer'],
+    'employer': ['work', 'employment', 'sponsor'],
+    'salary': ['work', 'income'],
+    'school': ['study', 'student', 'education'],
+    'uni': ['university', 'study', 'student'],
+    'masters': ['degree', 'university', 'study'],
+    'phd': ['degree', 'university', 'study', 'research'],
+    'passport': ['citizenship', 'naturalization'],
+    'settle': ['permanent', 'residence'],
+    'refugee': ['asylum', 'protection'],
+    'cost': ['fee', 'fees', 'funds'],
+    'money': ['funds', 'financial'],
+}
+SYNONYM_WEIGHT = 0.5
+
+META_FILE = 'meta.json'
+LOCK_FILE = 'index.lock'
+# Rewrite the matrix without dead rows once they are this share of it
+COMPACT_DEAD_SHARE = 0.5
+
+
+@contextmanager
+def _file_lock(path):
+    """Exclusive lock on ``path`` shared by all processes on the host."""
+    with open(path, 'a+') as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def _terms(text):
+    """Lowercased, lightly stemmed terms without stopwords."""
+    terms = []
+    for token in TOKEN_RE.findall(text.lower()):
+        if token in STOPWORDS or len(token) < 2:
+            continue
+        if len(token) > 3 and token.endswith('s') and not token.endswith('ss'):
+            token = token[:-1]
+        terms.append(token)
+    return terms
+
+
+# Synonym table keyed and valued by stemmed terms
+_SYNONYMS = {
+    _terms(word)[0]: [term for synonym in synonyms for term in _terms(synonym)]
+    for word, synonyms in QUERY_SYNONYMS.items()
+}
+
+
+def _features(terms):
+    """Unigram and bigram counts."""
+    features = Counter(terms)
+    features.update(f'{a} {b}' for a, b in zip(terms, terms[1:]))
+    return features
+
+
+def _hash(feature):
+    return zlib.crc32(feature.encode('utf-8'))
+
+
+def _bucket(feature):
+    """(dimension, sign) for a hashed feature; stable across processes."""
+    h = _hash(feature)
+    return h % VECTOR_DIM, (1.0 if h & 0x80000000 else -1.0)
+
+
+def _vocabulary(features_list):
+    """Sorted unique full hashes of the features in some rows."""
+    hashes = {_hash(feature) for features in features_list for feature in features}
+    return np.array(sorted(hashes), dtype=np.uint32)
+
+
+def _embed(features, idf):
+    vector = np.zeros(VECTOR_DIM, dtype=np.float32)
+    for feature, count in features.items():
+        dim, sign = _bucket(feature)
+        vector[dim] += sign * (1.0 + math.log(count)) * idf[dim]
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def _chunk_text(row):
+    """Text embedded for an index row (title, heading and body)."""
+    return f"{row['title']} {row['heading']} {row['content']}"
+
+
+class VectorIndex:
+    """
+    Memory-mapped matrix of chunk vectors plus row metadata.
+
+    Rows are dicts with 'document_id', 'chunk_index', 'country_code',
+    'doc_type', 'title', 'heading' and 'content'; only the first four are
+    persisted. Rows listed in ``dead`` were replaced and are skipped.
+    """
+
+    def __init__(self, directory):
+        self.directory = str(directory)
+        self.meta_path = os.path.join(self.directory, META_FILE)
+        self._lock = threading.Lock()
+        self._meta_mtime = None
+        self.version = 0
+        self.matrix = None
+        self.matrix_name = None
+        self.idf = None
+        self.idf_name = None
+        self.vocab = None
+        self.vocab_name = None
+        self.rows = []
+        self.dead = []
+        self.alive = np.ones(0, dtype=bool)
+        self.countries = np.array([], dtype='<U3')
+        self._warned_empty = False
+
+    # Reading
+
+    def _load(self):
+        """(Re)map the published matrix if meta.json changed since last load."""
+        try:
+            mtime = os.stat(self.meta_path).st_mtime_ns
+        except FileNotFoundError:
+            return False
+        if mtime == self._meta_mtime:
+            return True
+
+        with self._lock:
+            if mtime == self._meta_mtime:
+                return True
+            try:
+                with open(self.meta_path) as f:
+                    meta = json.load(f)
+                if meta.get('dim') != VECTOR_DIM:
+                    # Written with another dimension; needs a full rebuild
+                    return False
+                rows = meta['rows']
+                matrix_path = os.path.join(self.directory, meta['matrix'])
+                matrix = (
+                    np.memmap(matrix_path, dtype=np.float32, mode='r', shape=(len(rows), VECTOR_DIM))
+                    if rows else np.zeros((0, VECTOR_DIM), dtype=np.float32)
+                )
+                idf = np.fromfile(os.path.join(self.directory, meta['idf']), dtype=np.float32)
+                vocab = (
+                    np.fromfile(os.path.join(self.directory, meta['vocab']), dtype=np.uint32)
+                    if meta.get('vocab') else None
+                )
+            except FileNotFoundError:
+                # A writer replaced the files mid-read; keep the current mapping
+                return self.matrix is not None
+            self.matrix = matrix
+            self.matrix_name = meta['matrix']
+            self.idf = idf
+            self.idf_name = meta['idf']
+            self.vocab = vocab
+            self.vocab_name = meta.get('vocab')
+            self.rows = rows
+            self.dead = meta.get('dead', [])
+            self.alive = np.ones(len(rows), dtype=bool)
+            self.alive[self.dead] = False
+            self.countries = np.array([row[2] for row in rows], dtype='<U3')
+            self.version = meta['version']
+            self._meta_mtime = mtime
+        return True
+
+    def _known(self, features):
+        """Features that occur in some indexed chunk (all of them for older indexes)."""
+        if self.vocab is None or not len(self.vocab):
+            return features if self.vocab is None else {}
+        hashes = np.array([_hash(feature) for feature in features], dtype=np.uint32)
+        positions = np.minimum(np.searchsorted(self.vocab, hashes), len(self.vocab) - 1)
+        known = self.vocab[positions] == hashes
+        return {feature: count for (feature, count), hit in zip(features.items(), known) if hit}
+
+    def search(self, query, country_codes=None, limit=5):
+        """
+        Top-k chunks by cosine similarity to ``query``.
+
+        Returns a list of dicts with 'document_id', 'chunk_index',
+        'country_code', 'doc_type' and 'score', best first.
+        """
+        if not self._load() or not self.rows:
+            if not self._warned_empty:
+                self._warned_empty = True
+                logger.warning(
+                    "Vector index in %s is not built or empty; semantic search returns nothing "
+                    "until 'python manage.py rebuild_search_index' runs", self.directory
+                )
+            return []
+
+        terms = _terms(query)
+        features = _features(terms)
+        for term in terms:
+            for synonym in _SYNONYMS.get(term, ()):
+                features[synonym] += SYNONYM_WEIGHT
+        features = self._known(features)
+        if not features:
+            return []
+        q = _embed(features, self.idf)
+
+        if country_codes:
+            candidates = np.flatnonzero(np.isin(self.countries, list(country_codes)) & self.alive)
+            scores = self.matrix[candidates] @ q
+        elif self.dead:
+            candidates = np.flatnonzero(self.alive)
+            scores = self.matrix[candidates] @ q
+        else:
+            candidates = None
+            scores = self.matrix @ q
+
+        k = min(limit, len(scores))
+        if k == 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+
+        results = []
+        for i in top:
+            if scores[i] <= 0:
+                break
+            document_id, chunk_index, country_code, doc_type = self.rows[
+                candidates[i] if candidates is not None else i
+            ]
+            results.append({
+                'document_id': document_id,
+                'chunk_index': chunk_index,
+                'country_code': country_code,
+                'doc_type': doc_type,
+                'score': float(scores[i]),
+            })
+        return results
+
+    # Writing
+
+    def _write_vocab(self, version, vocab):
+        vocab_name = f'vocab-{version}.u32'
+        vocab.astype(np.uint32).tofile(os.path.join(self.directory, vocab_name))
+        return vocab_name
+
+    def _write_meta(self, version, matrix_name, idf_name, vocab_name, rows, dead):
+        meta = {
+            'version': version,
+            'dim': VECTOR_DIM,
+            'matrix': matrix_name,
+            'idf': idf_name,
+            'vocab': vocab_name,
+            'rows': rows,
+            'dead': dead,
+        }
+        tmp_path = f'{self.meta_path}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, self.meta_path)
+        self._meta_mtime = None
+        self._load()
+
+        # Processes that still map the old files keep their pages
+        current = (matrix_name, idf_name, vocab_name)
+        for name in os.listdir(self.directory):
+            if name.endswith(('.f32', '.u32')) and name not in current:
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    # Windows refuses to delete mapped files; the next publish retries
+                    pass
+
+    def _publish(self, matrix, rows, idf, vocab):
+        """Write a new matrix version and atomically switch meta.json to it."""
+        version = self.version + 1
+        matrix_name = f'vectors-{version}.f32'
+        idf_name = f'idf-{version}.f32'
+        np.ascontiguousarray(matrix, dtype=np.float32).tofile(os.path.join(self.directory, matrix_name))
+        idf.astype(np.float32).tofile(os.path.join(self.directory, idf_name))
+        vocab_name = self._write_vocab(version, vocab)
+        self._write_meta(version, matrix_name, idf_name, vocab_name, rows, [])
+
+    def _append(self, vectors, rows, dead, vocab):
+        """Append rows to the current matrix file and publish them with the dead list."""
+        version = self.version + 1
+        matrix_path = os.path.join(self.directory, self.matrix_name)
+        with open(matrix_path, 'r+b') as f:
+            # Drop anything a failed writer left past the published rows
+            f.seek(len(self.rows) * VECTOR_DIM * 4)
+            f.write(np.ascontiguousarray(vectors, dtype=np.float32).tobytes())
+            f.truncate()
+        vocab_name = (
+            self.vocab_name if self.vocab is not None and len(vocab) == len(self.vocab)
+            else self._write_vocab(version, vocab)
+        )
+        self._write_meta(version, self.matrix_name, self.idf_name, vocab_name, self.rows + rows, dead)
+
+    def _locked(self):
+        os.makedirs(self.directory, exist_ok=True)
+        return _file_lock(os.path.join(self.directory, LOCK_FILE))
+
+    def build(self, rows):
+        """Embed all rows from scratch, recomputing IDF weights."""
+        rows = list(rows)
+        features = [_features(_terms(_chunk_text(row))) for row in rows]
+
+        df = np.zeros(VECTOR_DIM, dtype=np.float32)
+        for row_features in features:
+            for dim in {_bucket(feature)[0] for feature in row_features}:
+                df[dim] += 1
+        idf = np.log((1 + len(rows)) / (1 + df)) + 1
+
+        matrix = np.zeros((len(rows), VECTOR_DIM), dtype=np.float32)
+        for i, row_features in enumerate(features):
+            matrix[i] = _embed(row_features, idf)
+
+        with self._locked():
+            self._load()
+            self._publish(matrix, [self._row_key(row) for row in rows], idf, _vocabulary(features))
+        return len(rows)
+
+    def update_document(self, document_id, rows):
+        """
+        Replace one document's rows: its old rows are marked dead and only
+        its new rows are embedded and appended. Returns False if the index
+        has not been built yet.
+        """
+        with self._locked():
+            if not self._load():
+                return False
+            new_rows = list(rows)
+            features = [_features(_terms(_chunk_text(row))) for row in new_rows]
+            vectors = np.array(
+                [_embed(row_features, self.idf) for row_features in features],
+                dtype=np.float32
+            ).reshape(len(new_rows), VECTOR_DIM)
+            # Features of replaced rows stay known until the next full build
+            vocab = _vocabulary(features)
+            if self.vocab is not None:
+                vocab = np.union1d(self.vocab, vocab).astype(np.uint32)
+            dead = set(self.dead)
+            dead.update(i for i, row in enumerate(self.rows) if row[0] == document_id)
+            total = len(self.rows) + len(new_rows)
+
+            if total and len(dead) / total >= COMPACT_DEAD_SHARE:
+                keep = [i for i in range(len(self.rows)) if i not in dead]
+                self._publish(
+                    np.vstack([np.asarray(self.matrix[keep]), vectors]),
+                    [self.rows[i] for i in keep] + [self._row_key(row) for row in new_rows],
+                    self.idf, vocab
+                )
+            else:
+                self._append(vectors, [self._row_key(row) for row in new_rows], sorted(dead), vocab)
+        return True
+
+    def remove_document(self, document_id):
+        return self.update_document(document_id, [])
+
+    def _row_key(self, row):
+        return [row['document_id'], row['chunk_index'], row['country_code'], row['doc_type']]
+
+
+def chunk_index_rows(document_ids=None):
+    """Index rows for stored chunks, optionally limited to some documents."""
+    from .models import CountryDocumentChunk
+
+    chunks = CountryDocumentChunk.objects.order_by('document_id', 'chunk_index')
+    if document_ids is not None:
+        chunks = chunks.filter(document_id__in=document_ids)
+    return [
+        {
+            'document_id': document_id,
+            'chunk_index': chunk_index,
+            'country_code': country_code,
+            'doc_type': doc_type,
+            'title': title,
+            'heading': heading,
+            'content': content,
+        }
+        for document_id, chunk_index, country_code, doc_type, title, heading, content in chunks.values_list(
+            'document_id', 'chunk_index', 'document__country__code', 'document__doc_type',
+            'document__title', 'heading', 'content'
+        )
+    ]
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_vector_index():
+    """Process-wide index; empty until built by rebuild_search_index or the refresh task."""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                index = VectorIndex(settings.VECTOR_INDEX_DIR)
+                index._load()
+                _index = index
+    return _index
+
+
+def build_vector_index():
+    """Embed every stored chunk from scratch (new IDF weights, no dead rows)."""
+    return get_vector_index().build(chunk_index_rows())
+
+
+def search_vectors(query, country_codes=None, limit=5):
+    """Semantic top-k chunks for a question (see VectorIndex.search)."""
+    return get_vector_index().search(query, country_codes=country_codes, limit=limit)
+
+
+def update_document_vectors(document_id):
+    """Re-embed one document's stored chunks (or drop them if it was deleted)."""
+    get_vector_index().update_document(document_id, chunk_index_rows([document_id]))
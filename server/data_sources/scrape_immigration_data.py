@@ -37,6 +37,8 @@ import django
 django.setup()
 
 from django.conf import settings
+from ai.dispatcher import llm_dispatcher
+from ai.resilience import provider, time_left
 
 # Configure logging
 logging.basicConfig(
@@ -298,9 +300,11 @@ Generate the document in Markdown format.""",
     }
     
     def __init__(self):
+        # Retries are handled by ai.resilience, not the client
         self.client = OpenAI(
             api_key=settings.DEEPSEEK_API_KEY,
-            base_url=settings.DEEPSEEK_BASE_URL
+            base_url=settings.DEEPSEEK_BASE_URL,
+            max_retries=0
         ) if settings.DEEPSEEK_API_KEY else None
         self.model = settings.DEEPSEEK_MODEL
     
@@ -332,24 +336,33 @@ Generate the document in Markdown format.""",
             source_content=source_content
         )
         
-        try:
-            logger.info(f"Generating {doc_type} document for {country_name}...")
-            
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {
-                        "role": "system", 
-                        "content": """You are an expert immigration documentation writer. 
+        messages = [
+            {
+                "role": "system", 
+                "content": """You are an expert immigration documentation writer. 
 You create accurate, well-structured documents based on official sources.
 You NEVER invent information - if something is unclear, you say so.
 You always include appropriate disclaimers about changing policies."""
-                    },
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.3,  # Lower temperature for more factual output
-                max_tokens=2500
-            )
+            },
+            {"role": "user", "content": prompt}
+        ]
+        
+        def attempt(deadline):
+            # Batch class: yields the shared rate limit to live chat and roadmaps
+            with llm_dispatcher.slot('batch'):
+                return self.client.chat.completions.create(
+                    model=self.model,
+                    messages=messages,
+                    temperature=0.3,  # Lower temperature for more factual output
+                    max_tokens=2500,
+                    timeout=time_left(deadline)
+                )
+        
+        try:
+            logger.info(f"Generating {doc_type} document for {country_name}...")
+            
+            # Long answers: no hedging, a duplicate would double the batch cost
+            response = provider.call(attempt, mode='document', hedge=False)
             
             content = response.choices[0].message.content
             word_count = len(content.split())
@@ -0,0 +1,7 @@
+#!/bin/sh
+# Apply migrations and chunk/index country documents before starting the server.
+# Only the web container runs this; workers start directly.
+set -e
+python manage.py migrate --noinput
+python manage.py rebuild_search_index
+exec "$@"
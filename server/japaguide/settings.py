@@ -89,6 +89,8 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Wait for locks instead of failing when many async requests write at once
+        'OPTIONS': {'timeout': 20},
     }
 }
 
@@ -141,9 +143,116 @@ CACHES = {
     'default': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
         'LOCATION': 'unique-snowflake',
+    },
+    # AI completion cache (ai/completion_cache.py). 'redis' shares entries
+    # across workers; 'fakeredis' is an in-process Redis for tests
+    # (pip install -r requirements-dev.txt).
+    'ai': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'ai-completions',
+    },
+}
+
+AI_CACHE_BACKEND = os.getenv('AI_CACHE_BACKEND', 'locmem')
+if AI_CACHE_BACKEND in ('redis', 'fakeredis'):
+    CACHES['ai'] = {
+        'BACKEND': 'django_redis.cache.RedisCache',
+        'LOCATION': os.getenv('AI_CACHE_REDIS_URL', REDIS_URL),
+        'OPTIONS': {'CLIENT_CLASS': 'django_redis.client.DefaultClient'},
     }
+    if AI_CACHE_BACKEND == 'fakeredis':
+        import fakeredis
+        CACHES['ai']['OPTIONS']['CONNECTION_POOL_KWARGS'] = {'connection_class': fakeredis.FakeConnection}
+
+# Completion cache TTLs (seconds) by prompt mode
+AI_CACHE_TTLS = {
+    'general': 3600,
+    'compare': 6 * 3600,
+    # Keyed on chunk versions and the countries data version, so edits invalidate them
+    'compare_facts': 24 * 3600,
+    'roadmap_enrich': 24 * 3600,
+    'doc_builder': 24 * 3600,
+    'interview_prep': 3600,
+    'default': 3600,
+}
+
+# Reuse the cached answer of an earlier question with the same intent whose
+# terms overlap at least this much (see ai/semantic_cache.py)
+AI_CACHE_NEAR_DUPLICATES = os.getenv('AI_CACHE_NEAR_DUPLICATES', 'False') == 'True'
+AI_CACHE_NEAR_DUPLICATE_THRESHOLD = float(os.getenv('AI_CACHE_NEAR_DUPLICATE_THRESHOLD', '0.8'))
+
+# AIRequest logging (see ai/request_log.py): 'buffer' batches inserts off the
+# request path, 'celery' hands batches to a task, 'sync' inserts per request
+AI_REQUEST_LOG_MODE = os.getenv('AI_REQUEST_LOG_MODE', 'buffer')
+AI_REQUEST_LOG_BATCH_SIZE = int(os.getenv('AI_REQUEST_LOG_BATCH_SIZE', '100'))
+AI_REQUEST_LOG_FLUSH_INTERVAL = float(os.getenv('AI_REQUEST_LOG_FLUSH_INTERVAL', '2.0'))
+AI_REQUEST_LOG_MAX_SIZE = int(os.getenv('AI_REQUEST_LOG_MAX_SIZE', '10000'))
+
+# LLM call dispatch (see ai/dispatcher.py): in-flight calls per priority class
+# and process, a provider-wide request rate shared through the ai cache's
+# Redis (0 disables it), and how long each class may queue for a slot
+AI_DISPATCH_CONCURRENCY = {
+    'interactive': int(os.getenv('AI_DISPATCH_INTERACTIVE_CONCURRENCY', '32')),
+    'roadmap': int(os.getenv('AI_DISPATCH_ROADMAP_CONCURRENCY', '8')),
+    'batch': int(os.getenv('AI_DISPATCH_BATCH_CONCURRENCY', '2')),
+}
+AI_DISPATCH_RATE_PER_SECOND = float(os.getenv('AI_DISPATCH_RATE_PER_SECOND', '0'))
+AI_DISPATCH_BURST = float(os.getenv('AI_DISPATCH_BURST', '0'))
+AI_DISPATCH_QUEUE_TIMEOUT = {
+    'interactive': 30,
+    'roadmap': 300,
+    'batch': None,
+}
+
+# Provider resilience (see ai/resilience.py): deadline per completion mode in
+# seconds (retries included), retries of timeouts/429/5xx with exponential
+# backoff, hedged second requests after the mode's p95 latency, and a circuit
+# breaker that fails fast after consecutive failures
+AI_PROVIDER_DEADLINES = {
+    'general': 30,
+    'compare': 45,
+    'roadmap_enrich': 60,
+    'document': 180,
+    'default': 30,
+}
+AI_PROVIDER_MAX_RETRIES = int(os.getenv('AI_PROVIDER_MAX_RETRIES', '2'))
+AI_PROVIDER_BACKOFF = float(os.getenv('AI_PROVIDER_BACKOFF', '0.5'))
+AI_PROVIDER_HEDGE = os.getenv('AI_PROVIDER_HEDGE', 'True') == 'True'
+AI_CIRCUIT_FAILURE_THRESHOLD = int(os.getenv('AI_CIRCUIT_FAILURE_THRESHOLD', '5'))
+AI_CIRCUIT_RESET_SECONDS = float(os.getenv('AI_CIRCUIT_RESET_SECONDS', '30'))
+
+# Answer chat questions from condensed country briefs (countries/briefs.py,
+# built by `manage.py build_country_briefs`), adding full document chunks
+# only when the question asks for detail
+AI_RAG_BRIEFS = os.getenv('AI_RAG_BRIEFS', 'True') == 'True'
+
+# Local chat pre-filter (see ai/prefilter.py): greetings, off-topic and
+# refused requests, and FAQEntry matches with at least this TF-IDF cosine
+# similarity, are answered without an LLM call
+AI_PREFILTER = os.getenv('AI_PREFILTER', 'True') == 'True'
+AI_PREFILTER_FAQ_THRESHOLD = float(os.getenv('AI_PREFILTER_FAQ_THRESHOLD', '0.8'))
+
+# Prompt token budget per mode (see ai/context_packer.py): system prompt,
+# template and question are paid first, retrieved documents and conversation
+# history share the rest, trimmed at chunk and sentence boundaries
+AI_CONTEXT_TOKEN_BUDGETS = {
+    'general': 2600,
+    'compare': 3200,
+    'compare_facts': 1800,
+    'default': 2600,
 }
 
+# Roadmap enrichment (see roadmaps/tasks.py): steps per LLM call (0 sends all
+# steps in one prompt), concurrent calls, and retry rounds for steps whose
+# enrichment came back missing or invalid
+ROADMAP_ENRICHMENT_CHUNK_SIZE = int(os.getenv('ROADMAP_ENRICHMENT_CHUNK_SIZE', '2'))
+ROADMAP_ENRICHMENT_CONCURRENCY = int(os.getenv('ROADMAP_ENRICHMENT_CONCURRENCY', '5'))
+ROADMAP_ENRICHMENT_RETRIES = int(os.getenv('ROADMAP_ENRICHMENT_RETRIES', '1'))
+# Combinations of recent roadmaps (visa type, goal, tone, profile band) whose
+# enrichment the precompute task keeps cached, and how far back it looks
+ROADMAP_ENRICHMENT_PRECOMPUTE_LIMIT = int(os.getenv('ROADMAP_ENRICHMENT_PRECOMPUTE_LIMIT', '20'))
+ROADMAP_ENRICHMENT_PRECOMPUTE_DAYS = int(os.getenv('ROADMAP_ENRICHMENT_PRECOMPUTE_DAYS', '30'))
+
 # Celery Configuration
 CELERY_BROKER_URL = REDIS_URL
 CELERY_RESULT_BACKEND = 'django-db'
@@ -151,11 +260,29 @@ CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
+# Run tasks inline (tests, development without a broker)
+CELERY_TASK_ALWAYS_EAGER = os.getenv('CELERY_TASK_ALWAYS_EAGER', 'False') == 'True'
 CELERY_BEAT_SCHEDULE = {
     'cleanup-expired-sessions': {
         'task': 'users.tasks.cleanup_expired_sessions',
         'schedule': 86400.0,  # Run daily
     },
+    'rollup-ai-usage': {
+        'task': 'ai.tasks.rollup_ai_usage',
+        'schedule': 60.0,
+    },
+    'precompute-roadmap-enrichments': {
+        'task': 'roadmaps.tasks.precompute_popular_enrichments',
+        'schedule': 6 * 3600.0,  # Well inside the 24h roadmap_enrich cache TTL
+    },
+    'refresh-country-briefs': {
+        'task': 'countries.tasks.refresh_country_briefs',
+        'schedule': 3600.0,  # Only briefs whose documents changed are regenerated
+    },
+    'refresh-vector-index': {
+        'task': 'countries.tasks.refresh_vector_index',
+        'schedule': 86400.0,  # Refreshes IDF weights; edits in between are appended incrementally
+    },
 }
 
 # Django REST Framework
@@ -202,7 +329,22 @@ cloudinary.config(
 # DeepSeek AI Configuration
 DEEPSEEK_API_KEY = os.getenv('DEEPSEEK_API_KEY', '')
 DEEPSEEK_MODEL = os.getenv('DEEPSEEK_MODEL', 'deepseek-chat')  # or 'deepseek-reasoner'
-DEEPSEEK_BASE_URL = 'https://api.deepseek.com'
+DEEPSEEK_BASE_URL = os.getenv('DEEPSEEK_BASE_URL', 'https://api.deepseek.com')
+
+# Local fake LLM for offline development, tests and benchmarks (see ai/fake_llm.py)
+AI_FAKE_LLM = os.getenv('AI_FAKE_LLM', 'False') == 'True'
+AI_FAKE_LLM_FIRST_TOKEN_LATENCY = float(os.getenv('AI_FAKE_LLM_FIRST_TOKEN_LATENCY', '0.5'))
+AI_FAKE_LLM_TOKEN_LATENCY = float(os.getenv('AI_FAKE_LLM_TOKEN_LATENCY', '0.02'))
+# Injected faults: share of calls failing with a 500, share delayed by
+# AI_FAKE_LLM_SLOW_LATENCY seconds, and a full outage
+AI_FAKE_LLM_ERROR_RATE = float(os.getenv('AI_FAKE_LLM_ERROR_RATE', '0'))
+AI_FAKE_LLM_SLOW_RATE = float(os.getenv('AI_FAKE_LLM_SLOW_RATE', '0'))
+AI_FAKE_LLM_SLOW_LATENCY = float(os.getenv('AI_FAKE_LLM_SLOW_LATENCY', '5'))
+AI_FAKE_LLM_OUTAGE = os.getenv('AI_FAKE_LLM_OUTAGE', 'False') == 'True'
+
+# Memory-mapped semantic index over document chunks (see countries/vectors.py).
+# Must be on a filesystem shared by all workers on a host.
+VECTOR_INDEX_DIR = os.getenv('VECTOR_INDEX_DIR', str(BASE_DIR / 'var' / 'vectors'))
 
 # Logging
 LOGGING = {
@@ -10,7 +10,7 @@ class RoadmapStepInline(admin.TabularInline):
 
 @admin.register(Roadmap)
 class RoadmapAdmin(admin.ModelAdmin):
-    list_display = ['title', 'country', 'user', 'is_anonymous', 'status', 'created_at']
+    list_display = ['title', 'country', 'user', 'is_anonymous', 'status', 'steps_completed', 'steps_total', 'created_at']
     list_filter = ['status', 'is_anonymous', 'country']
     search_fields = ['title', 'user__username']
     inlines = [RoadmapStepInline]
@@ -0,0 +1,107 @@
+"""
+Enrichment cache shared across roadmaps.
+
+Roadmaps generated from the same visa type copy the same steps, so their
+enrichment only depends on the visa, the step content, goal, tone and the
+profile. Entries are keyed by those with the profile reduced to coarse
+bands (education level, experience band, budget band) and stored by step
+order, then mapped back to the step IDs of whichever roadmap asks. The
+enrichment prompt is rendered from the same bands, so a cached answer was
+written for exactly what a new roadmap would send.
+
+Entries live in the AI completion cache under the 'roadmap_enrich' TTL.
+"""
+import re
+import hashlib
+from ai.completion_cache import completion_cache
+from ai import metrics
+
+
+MODE = 'roadmap_enrich'
+KEY_PREFIX = 'roadmap-enrich:'
+
+# (upper bound, label); values above the last bound get the open-ended label
+EXPERIENCE_BANDS = ((2, '0-2'), (5, '3-5'), (10, '6-10'))
+EXPERIENCE_TOP = '10+'
+BUDGET_BANDS = ((5000, '0-5000'), (20000, '5000-20000'), (50000, '20000-50000'))
+BUDGET_TOP = '50000+'
+
+
+def _band(value, bands, top):
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return ''
+    for bound, label in bands:
+        if value <= bound:
+            return label
+    return top
+
+
+def profile_bucket(profile):
+    """(education level, experience band, budget band) for a profile snapshot."""
+    profile = profile or {}
+    education = str(profile.get('education_level') or '').strip().lower()
+    return (
+        education,
+        _band(profile.get('years_experience'), EXPERIENCE_BANDS, EXPERIENCE_TOP),
+        _band(profile.get('budget_usd'), BUDGET_BANDS, BUDGET_TOP),
+    )
+
+
+def bucket_profile(bucket):
+    """Profile dict for the enrichment prompt, with bands in place of exact values."""
+    education, experience, budget = bucket
+    return {'education_level': education, 'years_experience': experience, 'budget_usd': budget}
+
+
+def step_template_version(steps, template=''):
+    """Short hash of the steps' content (and the prompt template) they were enriched from."""
+    digest = hashlib.sha256(template.encode('utf-8'))
+    for step in steps:
+        digest.update(f'\x00{step.order}\x00{step.title}\x00{step.description}'.encode('utf-8'))
+    return digest.hexdigest()[:12]
+
+
+def cache_key(country_code, visa_type_id, steps, goal, tone, bucket, template=''):
+    parts = [
+        country_code, visa_type_id or 'generic', step_template_version(steps, template),
+        goal, tone, *bucket
+    ]
+    return KEY_PREFIX + ':'.join(re.sub(r'\W+', '_', str(part)) for part in parts)
+
+
+def lookup(key, steps):
+    """
+    Cached enrichments for ``steps`` as {step id: enrichment}, or None unless
+    every step is covered.
+    """
+    entry = completion_cache.get(key)
+    by_order = (entry or {}).get('enrichments', {})
+    if entry is None or any(str(step.order) not in by_order for step in steps):
+        # The completion calls made instead count their own misses
+        return None
+    metrics.record_lookup(MODE, entry, cached=True)
+    return {step.id: by_order[str(step.order)] for step in steps}
+
+
+def store(key, steps, enrichments, tokens_used=0):
+    """Cache a complete set of enrichments ({step id: enrichment}) by step order."""
+    if any(step.id not in enrichments for step in steps):
+        return False
+    completion_cache.set(key, {
+        'enrichments': {
+            str(step.order): {
+                'advice': enrichments[step.id]['advice'],
+                'tips': enrichments[step.id].get('tips', []),
+                'pitfalls': enrichments[step.id].get('pitfalls', []),
+            }
+            for step in steps
+        },
+        'tokens_used': tokens_used,
+    }, mode=MODE)
+    return True
+
+
+def is_cached(key):
+    return completion_cache.has(key)
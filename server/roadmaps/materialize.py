@@ -0,0 +1,98 @@
+"""
+Roadmap materialization: creating a roadmap's rows from a visa's step
+template, or from another roadmap.
+
+Steps are written with one bulk_create inside the roadmap's transaction, so
+generation costs the same number of queries however many steps a visa has.
+"""
+from django.db import transaction
+from .models import Roadmap, RoadmapStep
+from .progress import initial_progress
+
+
+# Steps for roadmaps without a visa type
+GENERIC_STEPS = [
+    {'title': 'Research', 'description': 'Plan your move'},
+    {'title': 'Documents', 'description': 'Gather paperwork'},
+    {'title': 'Application', 'description': 'Submit forms'},
+]
+
+# Step fields carried over by clone_roadmap (progress in RoadmapStepStatus is not)
+CLONED_STEP_FIELDS = [
+    'order', 'title', 'description', 'estimated_time_days', 'estimated_cost_usd',
+    'tips', 'pitfalls', 'documents_needed', 'ai_enhanced', 'ai_enhancement', 'enrichment_version',
+]
+
+
+def roadmap_detail_queryset():
+    """Roadmaps with everything RoadmapDetailSerializer reads, in three queries."""
+    return Roadmap.objects.select_related('country').prefetch_related('steps__status')
+
+
+def materialize_roadmap(country, goal, visa_type=None, profile=None, ai_tone='helpful',
+                        user=None, session_id=''):
+    """
+    Create a roadmap and copy its steps from the visa type's VisaSteps
+    (or GENERIC_STEPS without a visa type).
+
+    Returns:
+        The new Roadmap (enrichment_status 'pending')
+    """
+    if visa_type:
+        steps = [
+            RoadmapStep(
+                order=vs.order, title=vs.title, description=vs.description,
+                estimated_time_days=vs.estimated_time_days,
+                estimated_cost_usd=vs.estimated_cost_usd,
+                tips=vs.tips, pitfalls=vs.common_pitfalls
+            )
+            for vs in visa_type.steps.all()
+        ]
+    else:
+        steps = [
+            RoadmapStep(order=i, title=step['title'], description=step['description'])
+            for i, step in enumerate(GENERIC_STEPS, 1)
+        ]
+
+    with transaction.atomic():
+        roadmap = Roadmap.objects.create(
+            session_id=session_id, user=user, is_anonymous=(user is None),
+            title=f"Migration to {country.name} for {goal}",
+            country=country, visa_type=visa_type, goal=goal,
+            profile_snapshot=profile or {}, ai_tone=ai_tone,
+            **initial_progress(steps)
+        )
+        for step in steps:
+            step.roadmap = roadmap
+        RoadmapStep.objects.bulk_create(steps)
+    return roadmap
+
+
+def clone_roadmap(source, user=None, session_id=''):
+    """
+    Copy a roadmap and its steps, including any AI enrichment, for a user or
+    an anonymous session. Step progress starts fresh.
+
+    Returns:
+        The new Roadmap: 'done' if the source's enrichment was, otherwise
+        'pending' and the caller schedules enrichment for it.
+    """
+    steps = [
+        RoadmapStep(**step)
+        for step in source.steps.order_by('order').values(*CLONED_STEP_FIELDS)
+    ]
+
+    with transaction.atomic():
+        roadmap = Roadmap.objects.create(
+            session_id='' if user else session_id, user=user, is_anonymous=(user is None),
+            title=source.title, country_id=source.country_id, visa_type_id=source.visa_type_id,
+            goal=source.goal, profile_snapshot=source.profile_snapshot, ai_tone=source.ai_tone,
+            # An unfinished source's task will not update the clone
+            enrichment_status='done' if source.enrichment_status == 'done' else 'pending',
+            enrichment_version=source.enrichment_version,
+            **initial_progress(steps)
+        )
+        for step in steps:
+            step.roadmap = roadmap
+        RoadmapStep.objects.bulk_create(steps)
+    return roadmap
@@ -0,0 +1,45 @@
+# Generated by Django 4.2.7 on 2026-10-16 23:51
+
+from django.db import migrations, models
+
+
+def mark_existing_enriched(apps, schema_editor):
+    """Existing roadmaps were enriched inline when generated."""
+    Roadmap = apps.get_model('roadmaps', 'Roadmap')
+    RoadmapStep = apps.get_model('roadmaps', 'RoadmapStep')
+    Roadmap.objects.update(enrichment_status='failed')
+    Roadmap.objects.filter(
+        id__in=RoadmapStep.objects.filter(ai_enhanced=True).values('roadmap_id')
+    ).update(enrichment_status='done', enrichment_version=1)
+    RoadmapStep.objects.filter(ai_enhanced=True).update(enrichment_version=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('roadmaps', '0003_roadmapstep_documents_needed'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='roadmap',
+            name='enrichment_error',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='roadmap',
+            name='enrichment_status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='roadmap',
+            name='enrichment_version',
+            field=models.IntegerField(default=0, help_text='Bumped each time enriched steps are saved'),
+        ),
+        migrations.AddField(
+            model_name='roadmapstep',
+            name='enrichment_version',
+            field=models.IntegerField(default=0, help_text='Roadmap enrichment_version when this step was last enriched'),
+        ),
+        migrations.RunPython(mark_existing_enriched, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,83 @@
+# Generated by Django 4.2.7 on 2026-10-17 00:00
+
+from datetime import timedelta
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import Count, Max, Q, Sum
+from django.utils import timezone
+
+
+def fill_progress(apps, schema_editor):
+    """Compute progress fields for existing roadmaps (see roadmaps/progress.py)."""
+    Roadmap = apps.get_model('roadmaps', 'Roadmap')
+    RoadmapStep = apps.get_model('roadmaps', 'RoadmapStep')
+    done = Q(status__completed=True)
+    totals = RoadmapStep.objects.values('roadmap_id').annotate(
+        total=Count('id'),
+        completed=Count('id', filter=done),
+        blocked=Count('id', filter=Q(status__blocked=True) & ~done),
+        days=Sum('estimated_time_days', filter=~done),
+        cost=Sum('estimated_cost_usd', filter=~done),
+        last_completed_at=Max('status__completed_at'),
+    ).order_by()
+    today = timezone.localdate()
+    roadmaps = []
+    for row in totals:
+        days = row['days'] or 0
+        roadmaps.append(Roadmap(
+            id=row['roadmap_id'],
+            steps_total=row['total'],
+            steps_completed=row['completed'],
+            steps_blocked=row['blocked'],
+            remaining_days=days,
+            remaining_cost_usd=row['cost'] or Decimal(0),
+            projected_completion_date=(
+                timezone.localdate(row['last_completed_at'])
+                if not days and row['last_completed_at'] else today + timedelta(days=days)
+            ),
+        ))
+    Roadmap.objects.bulk_update(roadmaps, [
+        'steps_total', 'steps_completed', 'steps_blocked',
+        'remaining_days', 'remaining_cost_usd', 'projected_completion_date',
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('roadmaps', '0004_roadmap_enrichment_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='roadmap',
+            name='projected_completion_date',
+            field=models.DateField(blank=True, help_text='Date of the last progress update plus remaining_days', null=True),
+        ),
+        migrations.AddField(
+            model_name='roadmap',
+            name='remaining_cost_usd',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='roadmap',
+            name='remaining_days',
+            field=models.IntegerField(default=0, help_text='Estimated days of steps not yet completed'),
+        ),
+        migrations.AddField(
+            model_name='roadmap',
+            name='steps_blocked',
+            field=models.IntegerField(default=0, help_text='Blocked steps that are not completed'),
+        ),
+        migrations.AddField(
+            model_name='roadmap',
+            name='steps_completed',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='roadmap',
+            name='steps_total',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(fill_progress, migrations.RunPython.noop),
+    ]
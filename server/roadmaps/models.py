@@ -19,6 +19,13 @@ STATUS_CHOICES = [
     ('archived', 'Archived'),
 ]
 
+ENRICHMENT_STATUS_CHOICES = [
+    ('pending', 'Pending'),
+    ('running', 'Running'),
+    ('done', 'Done'),
+    ('failed', 'Failed'),
+]
+
 TONE_CHOICES = [
     ('helpful', 'Helpful'),
     ('uncle_japa', 'Uncle Japa'),
@@ -81,6 +88,40 @@ class Roadmap(models.Model):
         default='draft'
     )
     
+    # Background AI enrichment (roadmaps/tasks.py)
+    enrichment_status = models.CharField(
+        max_length=20,
+        choices=ENRICHMENT_STATUS_CHOICES,
+        default='pending'
+    )
+    enrichment_version = models.IntegerField(
+        default=0,
+        help_text="Bumped each time enriched steps are saved"
+    )
+    enrichment_error = models.TextField(blank=True)
+    
+    # Progress aggregates over steps and their statuses (roadmaps/progress.py)
+    steps_total = models.IntegerField(default=0)
+    steps_completed = models.IntegerField(default=0)
+    steps_blocked = models.IntegerField(
+        default=0,
+        help_text="Blocked steps that are not completed"
+    )
+    remaining_days = models.IntegerField(
+        default=0,
+        help_text="Estimated days of steps not yet completed"
+    )
+    remaining_cost_usd = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        default=0
+    )
+    projected_completion_date = models.DateField(
+        null=True,
+        blank=True,
+        help_text="Date of the last progress update plus remaining_days"
+    )
+    
     # Future features
     is_premium = models.BooleanField(
         default=False,
@@ -137,6 +178,10 @@ class RoadmapStep(models.Model):
         blank=True,
         help_text="Additional AI advice"
     )
+    enrichment_version = models.IntegerField(
+        default=0,
+        help_text="Roadmap enrichment_version when this step was last enriched"
+    )
     
     class Meta:
         ordering = ['roadmap', 'order']
@@ -0,0 +1,85 @@
+"""
+Denormalized roadmap progress.
+
+Roadmap carries totals over its steps and their RoadmapStepStatus rows
+(steps_total, steps_completed, steps_blocked, remaining_days,
+remaining_cost_usd, projected_completion_date) so lists and dashboards do
+not load every step. They are set from the steps when a roadmap is
+materialized and recomputed in the same transaction as any status change.
+"""
+from datetime import timedelta
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import Count, Max, Q, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from .models import Roadmap, RoadmapStep, RoadmapStepStatus
+
+
+PROGRESS_FIELDS = [
+    'steps_total', 'steps_completed', 'steps_blocked',
+    'remaining_days', 'remaining_cost_usd', 'projected_completion_date',
+]
+
+
+def _projected_date(steps_total, remaining_days, last_completed_at=None):
+    if not steps_total:
+        return None
+    if remaining_days or not last_completed_at:
+        return timezone.localdate() + timedelta(days=remaining_days)
+    return timezone.localdate(last_completed_at)
+
+
+def initial_progress(steps):
+    """Progress fields for a new roadmap whose steps have no status yet."""
+    remaining_days = sum(step.estimated_time_days or 0 for step in steps)
+    return {
+        'steps_total': len(steps),
+        'steps_completed': 0,
+        'steps_blocked': 0,
+        'remaining_days': remaining_days,
+        'remaining_cost_usd': sum((step.estimated_cost_usd or Decimal(0) for step in steps), Decimal(0)),
+        'projected_completion_date': _projected_date(len(steps), remaining_days),
+    }
+
+
+def compute_progress(roadmap_id):
+    """Progress fields for a roadmap, aggregated from its steps in one query."""
+    done = Q(status__completed=True)
+    totals = RoadmapStep.objects.filter(roadmap_id=roadmap_id).aggregate(
+        steps_total=Count('id'),
+        steps_completed=Count('id', filter=done),
+        steps_blocked=Count('id', filter=Q(status__blocked=True) & ~done),
+        remaining_days=Coalesce(Sum('estimated_time_days', filter=~done), 0),
+        remaining_cost_usd=Coalesce(Sum('estimated_cost_usd', filter=~done), Decimal(0)),
+        last_completed_at=Max('status__completed_at'),
+    )
+    totals['projected_completion_date'] = _projected_date(
+        totals['steps_total'], totals['remaining_days'], totals.pop('last_completed_at')
+    )
+    return totals
+
+
+def update_progress(roadmap_id):
+    """Recompute and save a roadmap's progress fields; returns them."""
+    progress = compute_progress(roadmap_id)
+    Roadmap.objects.filter(pk=roadmap_id).update(**progress, updated_at=timezone.now())
+    return progress
+
+
+def update_step_status(step, **changes):
+    """
+    Apply ``changes`` to a step's RoadmapStepStatus (creating it if needed)
+    and refresh the roadmap's progress in the same transaction.
+
+    Returns:
+        The roadmap's progress fields after the change
+    """
+    with transaction.atomic():
+        # Serializes concurrent updates to one roadmap (no-op on SQLite)
+        Roadmap.objects.select_for_update().filter(pk=step.roadmap_id).values_list('pk').first()
+        status, _ = RoadmapStepStatus.objects.get_or_create(step=step)
+        for field, value in changes.items():
+            setattr(status, field, value)
+        status.save()
+        return update_progress(step.roadmap_id)
@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from .models import Roadmap, RoadmapStep, RoadmapStepStatus
+from .progress import PROGRESS_FIELDS
 
 
 class RoadmapStepStatusSerializer(serializers.ModelSerializer):
@@ -50,17 +51,14 @@ class RoadmapListSerializer(serializers.ModelSerializer):
     country_name = serializers.CharField(source='country.name', read_only=True)
     country_code = serializers.CharField(source='country.code', read_only=True)
     visa_type_name = serializers.CharField(source='visa_type.name', read_only=True, allow_null=True)
-    steps_count = serializers.SerializerMethodField()
+    steps_count = serializers.IntegerField(source='steps_total', read_only=True)
     
     class Meta:
         model = Roadmap
         fields = [
             'id', 'title', 'country_name', 'country_code', 'visa_type_name',
-            'goal', 'ai_tone', 'status', 'is_anonymous', 'steps_count', 'created_at'
+            'goal', 'ai_tone', 'status', 'is_anonymous', 'steps_count', *PROGRESS_FIELDS, 'created_at'
         ]
-    
-    def get_steps_count(self, obj):
-        return obj.steps.count()
 
 
 class RoadmapDetailSerializer(serializers.ModelSerializer):
@@ -75,6 +73,7 @@ class RoadmapDetailSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'title', 'country', 'country_name', 'country_code',
             'visa_type', 'goal', 'profile_snapshot', 'ai_tone', 'ai_personality', 'status',
+            'enrichment_status', 'enrichment_version', *PROGRESS_FIELDS,
             'is_anonymous', 'steps', 'created_at', 'updated_at'
         ]
 
@@ -1,73 +1,33 @@
 """
 Celery tasks for roadmaps app.
 """
+import json
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from celery import shared_task
+from kombu.exceptions import OperationalError
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
 from django.utils import timezone
 from datetime import timedelta
+from collections import Counter
 from .models import Roadmap, RoadmapStep
+from . import enrichment_cache
+from visas.models import VisaType
 from ai.services import ai_service
 
 
-# @shared_task  # Commented out for synchronous execution - uncomment for async with Celery
-def enrich_roadmap_with_ai(roadmap_id):
-    """
-    Enrich roadmap steps with AI personalization.
-    
-    This runs asynchronously after deterministic roadmap generation.
-    """
-    import json
-    import re
-    
-    try:
-        roadmap = Roadmap.objects.select_related('country', 'visa_type').get(id=roadmap_id)
-        steps = roadmap.steps.all().order_by('order')
-        
-        if not steps.exists():
-            return {'error': 'No steps found for roadmap'}
-        
-        # Build context for AI
-        context = {
-            'tone': roadmap.ai_tone,
-            'country': roadmap.country.name,
-            'goal': roadmap.goal,
-            'profile': roadmap.profile_snapshot,
-            'steps': [
-                {
-                    'id': step.id,
-                    'order': step.order,
-                    'title': step.title,
-                    'description': step.description,
-                    'estimated_time_days': step.estimated_time_days,
-                    'estimated_cost_usd': float(step.estimated_cost_usd) if step.estimated_cost_usd else None
-                }
-                for step in steps
-            ]
-        }
-        
-        # Template for roadmap enrichment
-        template_text = """{{personality_intro}}
-
-USER PROFILE:
-- Goal: {{goal}}
-- Target Country: {{country}}
-{% if profile.education_level %}- Education: {{profile.education_level}}{% endif %}
-{% if profile.years_experience %}- Experience: {{profile.years_experience}} years{% endif %}
-{% if profile.budget_usd %}- Budget: ${{profile.budget_usd}} USD{% endif %}
-
-CURRENT ROADMAP STEPS:
-{% for step in steps %}
-Step {{step.order}} (ID: {{step.id}}): {{step.title}}
-{{step.description}}
-{% endfor %}
-
-YOUR TASK (use {{tone}} personality):
-Enhance these roadmap steps with:
+# Template for roadmap enrichment: fixed instructions first, then the
+# roadmap (shared by every chunk of it), then the per-user tail, so the
+# provider can serve the front of the prompt from its prefix cache
+ENRICHMENT_TEMPLATE = """YOUR TASK:
+Enhance the roadmap steps listed at the end with:
 1. Personalized advice
 2. 2-3 practical tips
 3. 2-3 common pitfalls
 
-{{tone_instructions}}
-
 CRITICAL INSTRUCTION:
 You MUST respond with VALID JSON only.
 The JSON must follow this structure:
@@ -81,67 +41,317 @@ The JSON must follow this structure:
         }
     ]
 }
+
+TARGET COUNTRY: {{country}}
+GOAL: {{goal}}
+{% if all_steps|length > steps|length %}
+FULL ROADMAP (for context only):
+{% for title in all_steps %}- {{title}}
+{% endfor %}
+{% endif %}
+
+{{personality_intro}}
+Use the {{tone}} personality. {{tone_instructions}}
+
+USER PROFILE:
+{% if profile.education_level %}- Education: {{profile.education_level}}{% endif %}
+{% if profile.years_experience %}- Experience: {{profile.years_experience}} years{% endif %}
+{% if profile.budget_usd %}- Budget: ${{profile.budget_usd}} USD{% endif %}
+
+{% if all_steps|length > steps|length %}STEPS TO ENHANCE NOW:{% else %}ROADMAP STEPS:{% endif %}
+{% for step in steps %}
+Step {{step.order}} (ID: {{step.id}}): {{step.title}}
+{{step.description}}
+{% endfor %}
+
 Provide an enrichment for EVERY step listed above."""
-        
-        # Get AI response
-        session_id = roadmap.session_id if roadmap.is_anonymous else None
-        user = roadmap.user if not roadmap.is_anonymous else None
-        
-        result = ai_service.complete(
-            template_text=template_text,
-            context=context,
-            use_cache=True,
-            session_id=session_id,
-            user=user
-        )
-        
-        if 'error' in result:
-            return {'error': result['error'], 'roadmap_id': roadmap_id}
-        
-        answer = result.get('answer', '')
-        
-        # Parse JSON from answer (handle potential markdown wrapping)
+
+
+def _step_context(step):
+    return {
+        'id': step.id,
+        'order': step.order,
+        'title': step.title,
+        'description': step.description,
+        'estimated_time_days': step.estimated_time_days,
+        'estimated_cost_usd': float(step.estimated_cost_usd) if step.estimated_cost_usd else None
+    }
+
+
+def _enrichment_context(country, goal, tone, bucket, steps):
+    """
+    Prompt context for enriching steps.
+    
+    The context lists every step; chunked enrichment swaps in a subset of
+    'steps' and keeps 'all_steps' (titles) so each call sees the whole plan.
+    The profile is the banded one the enrichment cache is keyed by.
+    """
+    return {
+        'mode': 'roadmap_enrich',
+        'tone': tone,
+        'country': country.name,
+        'goal': goal,
+        'profile': enrichment_cache.bucket_profile(bucket),
+        'steps': [_step_context(step) for step in steps],
+        'all_steps': [f"Step {step.order}: {step.title}" for step in steps],
+    }
+
+
+def _enrichment_cache_key(country, visa_type_id, goal, tone, bucket, steps):
+    return enrichment_cache.cache_key(
+        country.code, visa_type_id, steps, goal, tone, bucket, ENRICHMENT_TEMPLATE
+    )
+
+
+def _parse_enrichments(answer):
+    """Enrichment items from a model answer, or None if it has no valid JSON."""
+    # Strip markdown code blocks if present, then take the outermost object
+    clean_answer = re.sub(r'```json\s*|\s*```', '', answer or '').strip()
+    start = clean_answer.find('{')
+    end = clean_answer.rfind('}') + 1
+    if start == -1 or end == 0:
+        print(f"Failed to find JSON in AI response: {clean_answer[:100]}...")
+        return None
+    try:
+        data = json.loads(clean_answer[start:end])
+    except json.JSONDecodeError as e:
+        print(f"JSON Parse Error: {e}. content: {clean_answer[:100]}...")
+        return None
+    items = data.get('enrichments') if isinstance(data, dict) else None
+    return items if isinstance(items, list) else None
+
+
+def _is_valid_enrichment(item):
+    return (
+        isinstance(item.get('advice'), str) and item['advice'].strip()
+        and isinstance(item.get('tips', []), list)
+        and isinstance(item.get('pitfalls', []), list)
+    )
+
+
+def _valid_enrichments(steps, result):
+    """Map step id -> enrichment for the steps of one call whose item is valid."""
+    if 'error' in result:
+        print(f"Enrichment call failed: {result['error']}")
+        return {}
+    items = _parse_enrichments(result.get('answer', ''))
+    if items is None:
+        return {}
+    step_ids = {str(step.id): step.id for step in steps}
+    return {
+        step_ids[str(item.get('step_id'))]: item
+        for item in items
+        if isinstance(item, dict) and str(item.get('step_id')) in step_ids and _is_valid_enrichment(item)
+    }
+
+
+def _chunks(steps, size):
+    if not size:
+        return [steps]
+    return [steps[i:i + size] for i in range(0, len(steps), size)]
+
+
+def _enrich_steps(steps, context, session_id, user):
+    """
+    Enrich steps in chunks on up to ROADMAP_ENRICHMENT_CONCURRENCY threads,
+    retrying only steps that came back missing or invalid.
+    
+    Returns (enrichments by step id, tokens used).
+    """
+    def enrich_chunk(chunk, use_cache):
         try:
-            # Strip markdown code blocks if present
-            clean_answer = re.sub(r'```json\s*|\s*```', '', answer).strip()
-            # Find the first { and last }
-            start = clean_answer.find('{')
-            end = clean_answer.rfind('}') + 1
-            if start != -1 and end != -1:
-                json_str = clean_answer[start:end]
-                data = json.loads(json_str)
-                enrichments = data.get('enrichments', [])
-                
-                # Apply enrichments to steps
-                enrichment_map = {item['step_id']: item for item in enrichments if 'step_id' in item}
-                
-                updated_count = 0
-                for step in steps:
-                    if step.id in enrichment_map:
-                        data = enrichment_map[step.id]
-                        step.ai_enhanced = True
-                        step.ai_enhancement = data.get('advice', '')
-                        step.tips = data.get('tips', [])
-                        step.pitfalls = data.get('pitfalls', [])
-                        step.save()
-                        updated_count += 1
-                        
-                return {
-                    'success': True, 
-                    'roadmap_id': roadmap_id, 
-                    'steps_enhanced': updated_count,
-                    'tokens_used': result.get('tokens_used', 0)
-                }
-            else:
-                print(f"Failed to find JSON in AI response: {answer[:100]}...")
-                return {'error': 'Invalid AI response format', 'roadmap_id': roadmap_id}
-                
-        except json.JSONDecodeError as e:
-            print(f"JSON Parse Error: {e}. content: {answer[:100]}...")
-            return {'error': 'Failed to parse AI response', 'roadmap_id': roadmap_id}
-        
+            result = ai_service.complete(
+                template_text=ENRICHMENT_TEMPLATE,
+                context=dict(context, steps=[_step_context(step) for step in chunk]),
+                use_cache=use_cache,
+                session_id=session_id,
+                user=user,
+                priority='roadmap'
+            )
+        finally:
+            connection.close()
+        return _valid_enrichments(chunk, result), result.get('tokens_used', 0)
+    
+    enrichments = {}
+    tokens_used = 0
+    pending = steps
+    with ThreadPoolExecutor(max_workers=settings.ROADMAP_ENRICHMENT_CONCURRENCY) as pool:
+        for attempt in range(1 + settings.ROADMAP_ENRICHMENT_RETRIES):
+            # A cached answer would repeat the same defect on retry
+            chunks = _chunks(pending, settings.ROADMAP_ENRICHMENT_CHUNK_SIZE)
+            for chunk_enrichments, chunk_tokens in pool.map(enrich_chunk, chunks, [attempt == 0] * len(chunks)):
+                enrichments.update(chunk_enrichments)
+                tokens_used += chunk_tokens
+            pending = [step for step in pending if step.id not in enrichments]
+            if not pending:
+                break
+    return enrichments, tokens_used
+
+
+def _save_enrichments(roadmap_id, steps, enrichments):
+    """
+    Write enrichments onto their steps with one bulk_update, under a new
+    roadmap enrichment_version.
+    
+    Pollers ask for steps newer than the last version they saw, so the
+    steps are visible as soon as this commits.
+    """
+    enriched = []
+    for step in steps:
+        if step.id in enrichments:
+            data = enrichments[step.id]
+            step.ai_enhanced = True
+            step.ai_enhancement = data['advice']
+            step.tips = data.get('tips', [])
+            step.pitfalls = data.get('pitfalls', [])
+            enriched.append(step)
+    if not enriched:
+        return 0
+    
+    with transaction.atomic():
+        Roadmap.objects.filter(pk=roadmap_id).update(enrichment_version=F('enrichment_version') + 1)
+        version = Roadmap.objects.filter(pk=roadmap_id).values_list('enrichment_version', flat=True).get()
+        for step in enriched:
+            step.enrichment_version = version
+        RoadmapStep.objects.bulk_update(
+            enriched, ['ai_enhanced', 'ai_enhancement', 'tips', 'pitfalls', 'enrichment_version']
+        )
+    return len(enriched)
+
+
+def _set_enrichment_status(roadmap_id, status, error=''):
+    Roadmap.objects.filter(pk=roadmap_id).update(
+        enrichment_status=status, enrichment_error=error, updated_at=timezone.now()
+    )
+
+
+@shared_task
+def enrich_roadmap_with_ai(roadmap_id):
+    """
+    Enrich roadmap steps with AI personalization.
+    
+    Runs in a Celery worker after deterministic roadmap generation (inline
+    when CELERY_TASK_ALWAYS_EAGER is set). Roadmaps matching an entry in the
+    shared enrichment cache (roadmaps/enrichment_cache.py) are enriched from
+    it without an LLM call; otherwise steps are sent in chunks of
+    ROADMAP_ENRICHMENT_CHUNK_SIZE, at most ROADMAP_ENRICHMENT_CONCURRENCY
+    at a time, and written back in one bulk_update. Progress is recorded in
+    the roadmap's enrichment_status and enrichment_version; steps that still
+    fail after retries keep their deterministic content.
+    """
+    try:
+        roadmap = Roadmap.objects.select_related('country', 'visa_type', 'user').get(id=roadmap_id)
     except Roadmap.DoesNotExist:
         return {'error': f'Roadmap {roadmap_id} not found'}
+    
+    _set_enrichment_status(roadmap_id, 'running')
+    try:
+        steps = list(roadmap.steps.all().order_by('order'))
+        
+        if steps:
+            bucket = enrichment_cache.profile_bucket(roadmap.profile_snapshot)
+            key = _enrichment_cache_key(
+                roadmap.country, roadmap.visa_type_id, roadmap.goal, roadmap.ai_tone, bucket, steps
+            )
+            enrichments = enrichment_cache.lookup(key, steps)
+            cached = enrichments is not None
+            tokens_used = 0
+            if not cached:
+                session_id = roadmap.session_id if roadmap.is_anonymous else None
+                user = roadmap.user if not roadmap.is_anonymous else None
+                context = _enrichment_context(roadmap.country, roadmap.goal, roadmap.ai_tone, bucket, steps)
+                enrichments, tokens_used = _enrich_steps(steps, context, session_id, user)
+                enrichment_cache.store(key, steps, enrichments, tokens_used)
+            
+            enhanced = _save_enrichments(roadmap_id, steps, enrichments)
+            result = {
+                'success': True,
+                'roadmap_id': roadmap_id,
+                'steps_enhanced': enhanced,
+                'steps_failed': len(steps) - enhanced,
+                'tokens_used': tokens_used,
+                'cached': cached
+            }
+            if not enhanced:
+                result = {'error': 'Failed to parse AI response', 'roadmap_id': roadmap_id}
+        else:
+            result = {'error': 'No steps found for roadmap', 'roadmap_id': roadmap_id}
+        
     except Exception as e:
         print(f"Enrichment Error: {str(e)}")
-        return {'error': str(e), 'roadmap_id': roadmap_id}
+        result = {'error': str(e), 'roadmap_id': roadmap_id}
+    
+    if 'error' in result:
+        _set_enrichment_status(roadmap_id, 'failed', result['error'])
+    else:
+        # Partial success keeps what landed; the rest stay deterministic
+        failed = result['steps_failed']
+        _set_enrichment_status(roadmap_id, 'done', f'{failed} steps could not be enriched' if failed else '')
+    return result
+
+
+@shared_task
+def precompute_popular_enrichments(limit=None, days=None):
+    """
+    Warm the enrichment cache for the most requested visa type, goal, tone
+    and profile band combinations of recent roadmaps.
+    
+    Runs on Celery beat; combinations that are already cached are skipped.
+    """
+    limit = limit or settings.ROADMAP_ENRICHMENT_PRECOMPUTE_LIMIT
+    since = timezone.now() - timedelta(days=days or settings.ROADMAP_ENRICHMENT_PRECOMPUTE_DAYS)
+    
+    combos = Counter(
+        (visa_type_id, goal, tone, enrichment_cache.profile_bucket(profile))
+        for visa_type_id, goal, tone, profile in Roadmap.objects.filter(
+            created_at__gte=since, visa_type__isnull=False
+        ).values_list('visa_type_id', 'goal', 'ai_tone', 'profile_snapshot').iterator()
+    )
+    popular = combos.most_common(limit)
+    visa_types = VisaType.objects.select_related('country').prefetch_related('steps').in_bulk(
+        {combo[0] for combo, _ in popular}
+    )
+    
+    result = {'precomputed': 0, 'already_cached': 0, 'failed': 0, 'tokens_used': 0}
+    for (visa_type_id, goal, tone, bucket), _ in popular:
+        visa_type = visa_types.get(visa_type_id)
+        steps = sorted(visa_type.steps.all(), key=lambda step: step.order) if visa_type else []
+        if not steps:
+            continue
+        key = _enrichment_cache_key(visa_type.country, visa_type_id, goal, tone, bucket, steps)
+        if enrichment_cache.is_cached(key):
+            result['already_cached'] += 1
+            continue
+        
+        context = _enrichment_context(visa_type.country, goal, tone, bucket, steps)
+        enrichments, tokens_used = _enrich_steps(steps, context, None, None)
+        result['tokens_used'] += tokens_used
+        if enrichment_cache.store(key, steps, enrichments, tokens_used):
+            result['precomputed'] += 1
+        else:
+            result['failed'] += 1
+    return result
+
+
+def schedule_enrichment(roadmap_id):
+    """
+    Queue enrichment for a roadmap once the current transaction commits.
+    
+    Falls back to a background thread when the broker is unreachable, so
+    development without Redis still returns immediately.
+    """
+    def dispatch():
+        try:
+            enrich_roadmap_with_ai.delay(roadmap_id)
+        except OperationalError as e:
+            print(f"Celery broker unavailable ({e}); enriching roadmap {roadmap_id} in-process")
+            threading.Thread(target=_enrich_in_thread, args=(roadmap_id,), daemon=True).start()
+    
+    transaction.on_commit(dispatch)
+
+
+def _enrich_in_thread(roadmap_id):
+    try:
+        enrich_roadmap_with_ai(roadmap_id)
+    finally:
+        connection.close()
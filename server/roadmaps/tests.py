@@ -0,0 +1,55 @@
+from django.test import TestCase
+from countries.models import Country
+from visas.models import VisaType, VisaStep
+
+
+# Queries per request (savepoints included); raise only with a reason
+BUDGETS = {
+    'generate': 10,
+    'clone': 9,
+    'retrieve': 3,
+    'list': 2,
+}
+STEP_COUNTS = (3, 15)
+
+
+class RoadmapQueryCountTests(TestCase):
+    """
+    Generate, clone, retrieve and list cost the same number of queries
+    whatever the number of visa steps (or roadmaps listed).
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        country = Country.objects.create(code='CAN', name='Canada', region='Americas', currency='CAD')
+        cls.visa_types = {}
+        for steps in STEP_COUNTS:
+            visa_type = VisaType.objects.create(
+                country=country, name=f'Work Permit {steps}', slug=f'work-permit-{steps}',
+                description='Employer-sponsored work permit'
+            )
+            VisaStep.objects.bulk_create([
+                VisaStep(visa_type=visa_type, order=i, title=f'Step {i}', description='Do the thing')
+                for i in range(1, steps + 1)
+            ])
+            cls.visa_types[steps] = visa_type
+
+    def _request(self, label, method, url, **kwargs):
+        with self.assertNumQueries(BUDGETS[label]):
+            response = getattr(self.client, method)(
+                url, content_type='application/json', HTTP_X_SESSION_ID='roadmap-query-count', **kwargs
+            )
+        self.assertLess(response.status_code, 400, response.content[:200])
+        return response.json()
+
+    def test_query_counts(self):
+        for steps in STEP_COUNTS:
+            with self.subTest(steps=steps):
+                roadmap = self._request('generate', 'post', '/api/v1/roadmaps/generate/', data={
+                    'country': 'CAN', 'goal': 'work', 'visa_type_id': self.visa_types[steps].id,
+                })
+                self.assertEqual(len(roadmap['steps']), steps)
+                clone = self._request('clone', 'post', f"/api/v1/roadmaps/{roadmap['id']}/clone/")
+                self._request('retrieve', 'get', f"/api/v1/roadmaps/{clone['id']}/")
+                # The session owns two more roadmaps each round
+                self._request('list', 'get', '/api/v1/roadmaps/')
@@ -1,12 +1,17 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import RoadmapViewSet, generate_roadmap, calculate_cost
+from .views import (
+    RoadmapViewSet, generate_roadmap, generate_roadmap_async, calculate_cost,
+    enrichment_stream
+)
 
 router = DefaultRouter()
 router.register(r'', RoadmapViewSet, basename='roadmap')
 
 urlpatterns = [
     path('generate/', generate_roadmap, name='generate-roadmap'),
+    path('generate/async/', generate_roadmap_async, name='generate-roadmap-async'),
     path('calc/estimate/', calculate_cost, name='calculate-cost'),
+    path('<int:pk>/enrichment/stream/', enrichment_stream, name='roadmap-enrichment-stream'),
     path('', include(router.urls)),
 ]
\ No newline at end of file
@@ -1,17 +1,30 @@
+import time
+import asyncio
+from asgiref.sync import sync_to_async
 from rest_framework import viewsets, status
 from rest_framework.decorators import api_view, permission_classes, action
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
 from countries.models import Country
 from visas.models import VisaType
-from .models import Roadmap, RoadmapStep, RoadmapStepStatus
+from .models import Roadmap, RoadmapStep
 from .serializers import (
     RoadmapListSerializer, RoadmapDetailSerializer,
     RoadmapGenerateSerializer
 )
-from .tasks import enrich_roadmap_with_ai
+from .tasks import schedule_enrichment
+from .progress import update_step_status
+from .materialize import materialize_roadmap, clone_roadmap, roadmap_detail_queryset
 from core.utils import calculate_migration_costs
+from core.async_views import async_api_view, aget_user, aget_session_id, json_response
+from core.sse import sse_response
+
+
+# Server-sent enrichment updates: database poll interval and stream lifetime
+ENRICHMENT_POLL_SECONDS = 0.5
+ENRICHMENT_STREAM_SECONDS = 120
 
 
 class RoadmapViewSet(viewsets.ModelViewSet):
@@ -27,25 +40,20 @@ class RoadmapViewSet(viewsets.ModelViewSet):
     
     def get_queryset(self):
         """Get roadmaps for current user or session."""
-        print(f"DEBUG: User: {self.request.user}, Auth: {self.request.user.is_authenticated}")
         if self.request.user.is_authenticated:
-            return Roadmap.objects.filter(user=self.request.user).prefetch_related('steps')
-        else:
-            # Check for header-based session ID (more reliable for API/Client split)
-            header_session_id = self.request.META.get('HTTP_X_SESSION_ID')
-            print(f"DEBUG: Header Session ID: {header_session_id}")
-            
-            # Fallback to cookie-based session key
-            session_key = self.request.session.session_key or header_session_id
-            print(f"DEBUG: Final Session Key: {session_key}")
-            
-            if not session_key:
-                print("DEBUG: No session key found, returning empty queryset")
-                return Roadmap.objects.none()
-            
-            qs = Roadmap.objects.filter(session_id=session_key).prefetch_related('steps')
-            print(f"DEBUG: Queryset count for session {session_key}: {qs.count()}")
-            return qs
+            return self._with_related(Roadmap.objects.filter(user=self.request.user))
+        session_key = _owner_session_key(self.request)
+        if not session_key:
+            return Roadmap.objects.none()
+        return self._with_related(Roadmap.objects.filter(session_id=session_key))
+    
+    def _with_related(self, queryset):
+        if self.action == 'retrieve':
+            return queryset.select_related('country').prefetch_related('steps__status')
+        if self.action == 'list':
+            # Progress is denormalized on Roadmap, so steps are not needed
+            return queryset.select_related('country', 'visa_type')
+        return queryset
     
     @action(detail=True, methods=['post'])
     def complete_step(self, request, pk=None):
@@ -54,12 +62,14 @@ class RoadmapViewSet(viewsets.ModelViewSet):
         step_id = request.data.get('step_id')
         
         step = get_object_or_404(RoadmapStep, id=step_id, roadmap=roadmap)
-        status_obj, created = RoadmapStepStatus.objects.get_or_create(step=step)
-        status_obj.completed = True  # Model field name remains 'completed'
-        status_obj.notes = request.data.get('notes', '')
-        status_obj.save()
+        progress = update_step_status(
+            step,
+            completed=True,  # Model field name remains 'completed'
+            completed_at=timezone.now(),
+            notes=request.data.get('notes', '')
+        )
         
-        return Response({'success': True, 'step_id': step_id})
+        return Response({'success': True, 'step_id': step_id, 'progress': progress})
     
     @action(detail=True, methods=['post'])
     def block_step(self, request, pk=None):
@@ -68,12 +78,168 @@ class RoadmapViewSet(viewsets.ModelViewSet):
         step_id = request.data.get('step_id')
         
         step = get_object_or_404(RoadmapStep, id=step_id, roadmap=roadmap)
-        status_obj, created = RoadmapStepStatus.objects.get_or_create(step=step)
-        status_obj.blocked = True  # Model field name remains 'blocked'
-        status_obj.blocker_reason = request.data.get('blocker_reason', '')  # Model field name
-        status_obj.save()
+        progress = update_step_status(
+            step,
+            blocked=True,  # Model field name remains 'blocked'
+            blocker_reason=request.data.get('blocker_reason', '')  # Model field name
+        )
+        
+        return Response({'success': True, 'step_id': step_id, 'progress': progress})
+    
+    def _enrichment_roadmap(self, pk):
+        # Ownership check only; skips the steps prefetch and wide columns
+        return get_object_or_404(
+            self.get_queryset().prefetch_related(None).only('id'), pk=pk
+        )
+    
+    @action(detail=True, methods=['post'])
+    def clone(self, request, pk=None):
+        """
+        Copy a roadmap, with its AI enrichment, to the requesting user or
+        anonymous session. Step progress is not copied.
+        """
+        source = get_object_or_404(self.get_queryset().prefetch_related(None), pk=pk)
+        user = request.user if request.user.is_authenticated else None
+        session_id = _request_session_id(request, user)
         
-        return Response({'success': True, 'step_id': step_id})
+        roadmap = clone_roadmap(source, user=user, session_id=session_id)
+        if roadmap.enrichment_status == 'pending':
+            schedule_enrichment(roadmap.id)
+        
+        return Response(_roadmap_response_data(roadmap.id, session_id), status=201)
+    
+    @action(detail=True, methods=['get'])
+    def enrichment(self, request, pk=None):
+        """
+        Enrichment status, plus steps enriched since ``since_version``.
+        
+        Poll with the returned version to receive only newly landed steps,
+        or stream them from ``enrichment/stream/``.
+        """
+        roadmap = self._enrichment_roadmap(pk)
+        return Response(_enrichment_state(roadmap.id, _since_version(request.query_params)))
+
+
+async def enrichment_stream(request, pk):
+    """
+    Server-Sent Events for enrichment progress.
+    
+    Emits ``status`` when the status changes, a ``step`` event per newly
+    enriched step, and ``done`` once enrichment has finished or failed
+    (or ``timeout`` after ENRICHMENT_STREAM_SECONDS). Async so a waiting
+    client holds no worker thread between polls.
+    """
+    if request.method != 'GET':
+        return json_response({'detail': f'Method "{request.method}" not allowed.'}, status=405)
+    user = await aget_user(request)
+    owner = {'user': user} if user else {'session_id': _owner_session_key(request)}
+    if not (user or owner['session_id']) or not await Roadmap.objects.filter(pk=pk, **owner).aexists():
+        return json_response({'detail': 'Not found.'}, status=404)
+    return sse_response(_enrichment_events(pk, _since_version(request.GET)))
+
+
+def _owner_session_key(request):
+    """Session owning anonymous roadmaps: cookie, then X-Session-ID header."""
+    return request.session.session_key or request.META.get('HTTP_X_SESSION_ID', '')
+
+
+def _since_version(params):
+    try:
+        return int(params.get('since_version', 0))
+    except ValueError:
+        return 0
+
+
+def _enrichment_state(roadmap_id, since_version=0):
+    """Enrichment status of a roadmap and its steps enriched after since_version."""
+    state = Roadmap.objects.filter(pk=roadmap_id).values(
+        'enrichment_status', 'enrichment_version', 'enrichment_error'
+    ).get()
+    # Bounded by the version read above, so a step landing in between is
+    # reported on the next poll rather than twice
+    steps = RoadmapStep.objects.filter(
+        roadmap_id=roadmap_id,
+        enrichment_version__gt=since_version,
+        enrichment_version__lte=state['enrichment_version']
+    ).order_by('order').values(
+        'id', 'order', 'ai_enhanced', 'ai_enhancement', 'tips', 'pitfalls', 'enrichment_version'
+    )
+    return {
+        'roadmap_id': roadmap_id,
+        'status': state['enrichment_status'],
+        'version': state['enrichment_version'],
+        'error': state['enrichment_error'],
+        'steps': [
+            {
+                'id': step['id'],
+                'order': step['order'],
+                'ai_enhanced': step['ai_enhanced'],
+                'ai_advice': step['ai_enhancement'],
+                'tips': step['tips'],
+                'pitfalls': step['pitfalls'],
+                'version': step['enrichment_version'],
+            }
+            for step in steps
+        ],
+    }
+
+
+async def _enrichment_events(roadmap_id, since_version):
+    """Poll enrichment state, yielding SSE events until it finishes."""
+    deadline = time.monotonic() + ENRICHMENT_STREAM_SECONDS
+    last_status = None
+    while True:
+        state = await sync_to_async(_enrichment_state)(roadmap_id, since_version)
+        if state['status'] != last_status:
+            last_status = state['status']
+            yield {'type': 'status', 'status': last_status, 'version': state['version']}
+        for step in state['steps']:
+            yield {'type': 'step', **step}
+        since_version = state['version']
+        
+        if last_status in ('done', 'failed'):
+            yield {'type': 'done', 'status': last_status, 'version': since_version, 'error': state['error']}
+            return
+        if time.monotonic() > deadline:
+            yield {'type': 'timeout', 'status': last_status, 'version': since_version}
+            return
+        await asyncio.sleep(ENRICHMENT_POLL_SECONDS)
+
+
+def _request_session_id(request, user):
+    """Session to own a new anonymous roadmap: cookie, then header, then a new one."""
+    if user:
+        return ''
+    # Prioritize existing session
+    if request.session.session_key:
+        return request.session.session_key
+    header_session_id = request.META.get('HTTP_X_SESSION_ID')
+    if header_session_id:
+        return header_session_id
+    request.session.create()
+    return request.session.session_key or ''
+
+
+def _create_roadmap(data, user, session_id):
+    """Materialize the deterministic roadmap (generic or from visa_type)."""
+    country = get_object_or_404(Country, code=data['country'])
+    visa_type = VisaType.objects.filter(id=data.get('visa_type_id')).first() if data.get('visa_type_id') else None
+    
+    return materialize_roadmap(
+        country, data['goal'], visa_type=visa_type, profile=data.get('profile', {}),
+        ai_tone=data.get('ai_tone', 'helpful'), user=user, session_id=session_id
+    )
+
+
+def _roadmap_response_data(roadmap_id, session_id):
+    """Serialize a freshly generated roadmap for the response."""
+    # Re-read to pick up enrichment that ran eagerly
+    roadmap = roadmap_detail_queryset().get(pk=roadmap_id)
+    
+    response_data = RoadmapDetailSerializer(roadmap).data
+    # return session_id so client can store it if needed
+    response_data['session_id'] = session_id
+    return response_data
 
 
 @api_view(['POST'])
@@ -81,68 +247,42 @@ class RoadmapViewSet(viewsets.ModelViewSet):
 def generate_roadmap(request):
     """
     Generate a migration roadmap (deterministic + async AI enrichment).
+    
+    Returns the deterministic roadmap immediately with enrichment_status
+    'pending' (already 'done' when Celery runs tasks eagerly).
     """
     serializer = RoadmapGenerateSerializer(data=request.data)
     serializer.is_valid(raise_exception=True)
     
     data = serializer.validated_data
-    country = get_object_or_404(Country, code=data['country'])
-    visa_type = VisaType.objects.filter(id=data.get('visa_type_id')).first() if data.get('visa_type_id') else None
-    
     user = request.user if request.user.is_authenticated else None
     
-    # Session handling: Check header, then cookie, then create new
-    header_session_id = request.META.get('HTTP_X_SESSION_ID')
-    session_id = ''
+    session_id = _request_session_id(request, user)
     
-    if user:
-        session_id = ''
-    else:
-        # Prioritize existing session
-        if request.session.session_key:
-            session_id = request.session.session_key
-        elif header_session_id:
-            session_id = header_session_id
-        else:
-            request.session.create()
-            session_id = request.session.session_key or ''
-    
-    roadmap = Roadmap.objects.create(
-        session_id=session_id, user=user, is_anonymous=(user is None),
-        title=f"Migration to {country.name} for {data['goal']}",
-        country=country, visa_type=visa_type, goal=data['goal'],
-        profile_snapshot=data.get('profile', {}), ai_tone=data.get('ai_tone', 'helpful')
-    )
+    roadmap = _create_roadmap(data, user, session_id)
     
-    # Create steps (generic or from visa_type)
-    if visa_type:
-        for vs in visa_type.steps.all():
-            RoadmapStep.objects.create(
-                roadmap=roadmap, order=vs.order, title=vs.title,
-                description=vs.description, estimated_time_days=vs.estimated_time_days,
-                estimated_cost_usd=vs.estimated_cost_usd, tips=vs.tips, pitfalls=vs.common_pitfalls
-            )
-    else:
-        for i, s in enumerate([{'title': 'Research', 'desc': 'Plan your move'}, 
-                                 {'title': 'Documents', 'desc': 'Gather paperwork'},
-                                 {'title': 'Application', 'desc': 'Submit forms'}], 1):
-            RoadmapStep.objects.create(roadmap=roadmap, order=i, title=s['title'], description=s['desc'])
-    
-    # Enrich roadmap with AI synchronously (can be changed back to .delay() for async)
-    try:
-        enrich_roadmap_with_ai(roadmap.id)
-    except Exception as e:
-        # Log error but still return roadmap
-        print(f"AI enrichment failed for roadmap {roadmap.id}: {str(e)}")
+    # Enrich in the background; clients poll or stream /<id>/enrichment/
+    schedule_enrichment(roadmap.id)
     
-    # Refresh roadmap to get AI-enriched data
-    roadmap.refresh_from_db()
+    return Response(_roadmap_response_data(roadmap.id, session_id), status=201)
+
+
+@async_api_view
+async def generate_roadmap_async(request, data, user):
+    """
+    Async roadmap generation for the ASGI stack; AI enrichment runs in the background.
+    """
+    serializer = RoadmapGenerateSerializer(data=data)
+    serializer.is_valid(raise_exception=True)
     
-    response_data = RoadmapDetailSerializer(roadmap).data
-    # return session_id so client can store it if needed
-    response_data['session_id'] = session_id
+    data = serializer.validated_data
+    session_id = await aget_session_id(request, user)
+    
+    roadmap = await sync_to_async(_create_roadmap)(data, user, session_id)
+    await sync_to_async(schedule_enrichment)(roadmap.id)
     
-    return Response(response_data, status=201)
+    response_data = await sync_to_async(_roadmap_response_data)(roadmap.id, session_id)
+    return json_response(response_data, status=201)
 
 
 @api_view(['POST'])
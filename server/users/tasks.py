@@ -5,7 +5,8 @@ from celery import shared_task
 from django.utils import timezone
 from datetime import timedelta
 from roadmaps.models import Roadmap
-from ai.models import AIRequest
+from ai.models import AIRequest, Conversation
+from ai.blobs import prune_blobs
 
 
 @shared_task
@@ -32,10 +33,22 @@ def cleanup_expired_sessions():
     )
     ai_request_count = old_ai_requests.count()
     old_ai_requests.delete()
+    # Bodies no remaining request shares
+    blob_count = prune_blobs()
+    
+    # Delete anonymous conversations that have gone quiet
+    old_conversations = Conversation.objects.filter(
+        user__isnull=True,
+        updated_at__lt=cutoff_date
+    )
+    conversation_count = old_conversations.count()
+    old_conversations.delete()
     
     return {
         'success': True,
         'roadmaps_deleted': roadmap_count,
         'ai_requests_deleted': ai_request_count,
+        'ai_blobs_deleted': blob_count,
+        'conversations_deleted': conversation_count,
         'cutoff_date': cutoff_date.isoformat()
     }